@@ -1,13 +1,109 @@
 import boto3
 import json
 import os
+import random
 import time
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+from ttl_cache import TTLCache
+from config_profiles import DEFAULT_CONFIG, profiles_enabled
 
 ROOM_CONFIG_TABLE = os.environ['ROOM_CONFIG_TABLE']
 OFFICE_TABLE = os.environ.get('OFFICE_TABLE', 'Office')
 iot_client = boto3.client('iot')
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(ROOM_CONFIG_TABLE)
+# Pool certificate dựng sẵn (xem SmartOfficeCertificatePool); để trống = tạo certificate mỗi lần
+CERT_POOL_TABLE = os.environ.get('CERT_POOL_TABLE')
+pool_table = dynamodb.Table(CERT_POOL_TABLE) if CERT_POOL_TABLE else None
+# Khoá bí mật trong pool được mã hoá bằng KMS, chỉ giải mã sau khi đã nhận certificate
+kms_client = boto3.client('kms') if CERT_POOL_TABLE else None
+CERT_POOL_READY_INDEX = os.environ.get('CERT_POOL_READY_INDEX', 'poolStatus-createdAt-index')
+READY_STATUS = 'READY'
+# Chọn ngẫu nhiên trong vài certificate cũ nhất để các request đồng thời ít tranh nhau
+CLAIM_CANDIDATES = 10
+CLAIM_ROUNDS = 3
+POLICY_NAME = os.environ.get('IOT_POLICY_NAME', 'SmartOffice-DevicePolicy')
+# Tên office theo (orgAlias, officeId), giữ trong container ấm
+office_name_cache = TTLCache('officeName', ttl_seconds=int(os.environ.get('OFFICE_NAME_CACHE_TTL_SECONDS', '300')))
+
+def load_office_name(key):
+    org_alias, office_id = key
+    office_table = dynamodb.Table(OFFICE_TABLE)
+    
+    # Query Office table with OFFICE# prefix in entityId
+    office_response = office_table.get_item(
+        Key={
+            'orgAlias': org_alias,
+            'entityId': f'OFFICE#{office_id}'
+        },
+        ProjectionExpression='#name',
+        ExpressionAttributeNames={'#name': 'name'}
+    )
+    return office_response.get('Item', {}).get('name')
+
+def claim_pool_certificate():
+    """
+    Take one ready certificate out of the pool; None when the pool is disabled, empty or unavailable
+    Xoá có điều kiện nên mỗi certificate chỉ được một request nhận; item trả về vẫn mang khoá đã mã hoá
+    """
+    if pool_table is None:
+        return None
+    try:
+        for _ in range(CLAIM_ROUNDS):
+            response = pool_table.query(
+                IndexName=CERT_POOL_READY_INDEX,
+                KeyConditionExpression=Key('poolStatus').eq(READY_STATUS),
+                ProjectionExpression='certificateId',
+                Limit=CLAIM_CANDIDATES
+            )
+            candidates = [item['certificateId'] for item in response.get('Items', [])]
+            if not candidates:
+                return None
+            random.shuffle(candidates)
+            for certificate_id in candidates:
+                try:
+                    return pool_table.delete_item(
+                        Key={'certificateId': certificate_id},
+                        ConditionExpression=Attr('poolStatus').eq(READY_STATUS),
+                        ReturnValues='ALL_OLD'
+                    )['Attributes']
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+    except ClientError as e:
+        print(f"Warning: could not claim a pooled certificate: {e}")
+    return None
+
+def decrypt_private_key(certificate):
+    """Plaintext private key of a claimed pool certificate"""
+    response = kms_client.decrypt(
+        CiphertextBlob=bytes(certificate['encryptedPrivateKey']),
+        EncryptionContext={'certificateId': certificate['certificateId']}
+    )
+    return response['Plaintext'].decode('utf-8')
+
+def release_pool_certificate(certificate):
+    """Put a claimed certificate (still encrypted) back when the room could not be created"""
+    try:
+        pool_table.put_item(Item=certificate)
+    except ClientError as e:
+        print(f"Warning: could not return certificate {certificate['certificateId']} to the pool: {e}")
+
+def create_certificate():
+    """Create an active certificate and attach the device policy (pool disabled or empty)"""
+    cert_response = iot_client.create_keys_and_certificate(setAsActive=True)
+    certificate_arn = cert_response['certificateArn']
+    # Policy phải được tạo trước bằng Stack IoT Core (IOT_POLICY_NAME)
+    try:
+        iot_client.attach_policy(policyName=POLICY_NAME, target=certificate_arn)
+    except Exception as e:
+        print(f"Warning attaching policy: {e}")
+    return {
+        'certificateArn': certificate_arn,
+        'certificatePem': cert_response['certificatePem'],
+        'privateKey': cert_response['keyPair']['PrivateKey']
+    }
 
 def lambda_handler(event, context):
     headers = { 'Access-Control-Allow-Origin': '*', 'Access-Control-Allow-Headers': 'Content-Type,Authorization', 'Access-Control-Allow-Methods': 'POST,OPTIONS' }
@@ -26,17 +122,9 @@ def lambda_handler(event, context):
         office_name = office_id  # Default fallback
         if org_alias:
             try:
-                office_table = dynamodb.Table(OFFICE_TABLE)
-                
-                # Query Office table with OFFICE# prefix in entityId
-                office_response = office_table.get_item(
-                    Key={
-                        'orgAlias': org_alias,
-                        'entityId': f'OFFICE#{office_id}'
-                    }
-                )
-                if 'Item' in office_response:
-                    office_name = office_response['Item'].get('name', office_id)
+                name = office_name_cache.get_or_load((org_alias, office_id), load_office_name)
+                if name:
+                    office_name = name
                     # Remove spaces from office name for Thing name
                     office_name = office_name.replace(' ', '')
                     print(f"Found office name: {office_name}")
@@ -66,44 +154,46 @@ def lambda_handler(event, context):
         except iot_client.exceptions.ResourceAlreadyExistsException:
             pass # Thing đã có thì dùng lại
 
-        # 3. Tạo Keys & Certificate
-        cert_response = iot_client.create_keys_and_certificate(setAsActive=True)
-        certificate_arn = cert_response['certificateArn']
-        certificate_pem = cert_response['certificatePem']
-        private_key = cert_response['keyPair']['PrivateKey']
-        
-        # 4. Attach Policy (Policy phải được tạo trước bằng Stack IoT Core)
-        # Giả sử tên Policy là "SmartOfficeDevicePolicy" (đặt cứng hoặc lấy từ env)
-        # Bạn có thể lấy policy name động nếu truyền qua biến môi trường
-        policy_name = f"SmartOffice-DevicePolicy" # Lưu ý: Cần match với tên trong template IoT Core
-        
-        try:
-            iot_client.attach_policy(policyName=policy_name, target=certificate_arn)
-        except Exception as e:
-            print(f"Warning attaching policy: {e}")
+        # 3. Certificate: nhận từ pool (đã active, đã gắn policy), pool rỗng thì tạo như trước
+        certificate = claim_pool_certificate()
+        pooled = certificate is not None
+        if pooled:
+            try:
+                private_key = decrypt_private_key(certificate)
+            except ClientError as e:
+                print(f"Warning: could not decrypt pooled certificate {certificate['certificateId']}: {e}")
+                release_pool_certificate(certificate)
+                pooled = False
+        if not pooled:
+            print("Certificate pool empty or unavailable, creating a certificate")
+            certificate = create_certificate()
+            private_key = certificate['privateKey']
+        certificate_arn = certificate['certificateArn']
+        certificate_pem = certificate['certificatePem']
 
-        # 5. Attach Thing to Certificate
-        iot_client.attach_thing_principal(thingName=thing_name, principal=certificate_arn)
+        # 4. Attach Thing to Certificate
+        try:
+            iot_client.attach_thing_principal(thingName=thing_name, principal=certificate_arn)
+        except Exception:
+            if pooled:
+                release_pool_certificate(certificate)
+            raise
 
-        # 6. Lưu vào DynamoDB (roomId = PK, officeId = SK)
+        # 5. Lưu vào DynamoDB (roomId = PK, officeId = SK)
         item = {
             'roomId': room_id,
             'officeId': office_id,
             'thingName': thing_name,
             'certificateArn': certificate_arn,
             'createdAt': int(time.time()),
-            # Default config
-            'temperatureMode': 'auto',
-            'targetTemperature': 26,
-            'humidityMode': 'auto',
-            'targetHumidity': 60,
-            'lightMode': 'auto',
-            'targetLight': '300',
             'connectionStatus': 'OFFLINE'
         }
+        # Default config: có profile thì phòng kế thừa từ office/org thay vì giữ bản sao riêng
+        if not profiles_enabled():
+            item.update(DEFAULT_CONFIG)
         table.put_item(Item=item)
 
-        # 7. Trả về Certs để Manager nạp vào Hub (Quan trọng cho Option A)
+        # 6. Trả về Certs để Manager nạp vào Hub (Quan trọng cho Option A)
         return {
             'statusCode': 200,
             'headers': headers,
@@ -0,0 +1,101 @@
+import boto3
+import os
+import time
+from botocore.exceptions import ClientError
+from index_query import query_index
+
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT'))
+iot_client = boto3.client('iot', endpoint_url=os.environ.get('IOT_ENDPOINT'))
+kms_client = boto3.client('kms', endpoint_url=os.environ.get('KMS_ENDPOINT'))
+CERT_POOL_TABLE = os.environ['CERT_POOL_TABLE']
+pool_table = dynamodb.Table(CERT_POOL_TABLE)
+# GSI thưa poolStatus -> createdAt: chỉ certificate chưa được nhận mới có poolStatus
+READY_INDEX_NAME = os.environ.get('CERT_POOL_READY_INDEX', 'poolStatus-createdAt-index')
+READY_STATUS = 'READY'
+# Policy phải được tạo trước bằng Stack IoT Core
+POLICY_NAME = os.environ.get('IOT_POLICY_NAME', 'SmartOffice-DevicePolicy')
+# Khoá KMS mã hoá khoá bí mật của certificate: bảng pool (và backup, stream) không giữ bản rõ
+KMS_KEY_ID = os.environ['CERT_POOL_KMS_KEY_ID']
+
+POOL_TARGET_SIZE = int(os.environ.get('CERT_POOL_TARGET_SIZE', '50'))
+# Giới hạn số certificate tạo mỗi lần chạy và nhịp gọi IoT: pool được lấp dần thay vì dồn vào lúc onboarding
+MAX_CREATE_PER_RUN = int(os.environ.get('CERT_POOL_MAX_CREATE_PER_RUN', '20'))
+CREATE_INTERVAL_SECONDS = float(os.environ.get('CERT_POOL_CREATE_INTERVAL_SECONDS', '0.2'))
+
+def count_ready():
+    """Number of unclaimed certificates in the pool"""
+    return len(query_index(pool_table, READY_INDEX_NAME, 'poolStatus', READY_STATUS, ['certificateId']))
+
+def delete_certificate(certificate_id, certificate_arn):
+    """Remove a certificate that could not be added to the pool"""
+    try:
+        iot_client.detach_policy(policyName=POLICY_NAME, target=certificate_arn)
+    except ClientError as e:
+        print(f"Warning detaching policy from {certificate_id}: {e}")
+    iot_client.update_certificate(certificateId=certificate_id, newStatus='INACTIVE')
+    iot_client.delete_certificate(certificateId=certificate_id)
+
+def encrypt_private_key(certificate_id, private_key):
+    """
+    KMS ciphertext of a private key, bound to its certificate by the encryption context
+    Khoá PEM nhỏ hơn giới hạn 4 KB của Encrypt nên không cần data key riêng
+    """
+    response = kms_client.encrypt(
+        KeyId=KMS_KEY_ID,
+        Plaintext=private_key.encode('utf-8'),
+        EncryptionContext={'certificateId': certificate_id}
+    )
+    return response['CiphertextBlob']
+
+def provision_certificate():
+    """Create an active certificate with the device policy attached and add it to the pool"""
+    cert_response = iot_client.create_keys_and_certificate(setAsActive=True)
+    certificate_id = cert_response['certificateId']
+    certificate_arn = cert_response['certificateArn']
+    try:
+        iot_client.attach_policy(policyName=POLICY_NAME, target=certificate_arn)
+        pool_table.put_item(
+            Item={
+                'certificateId': certificate_id,
+                'certificateArn': certificate_arn,
+                'certificatePem': cert_response['certificatePem'],
+                'encryptedPrivateKey': encrypt_private_key(certificate_id, cert_response['keyPair']['PrivateKey']),
+                'poolStatus': READY_STATUS,
+                'createdAt': int(time.time())
+            },
+            ConditionExpression='attribute_not_exists(certificateId)'
+        )
+    except ClientError:
+        # Không để lại certificate active nào nằm ngoài pool
+        delete_certificate(certificate_id, certificate_arn)
+        raise
+    return certificate_id
+
+def lambda_handler(event, context):
+    """
+    Scheduled job (EventBridge): giữ sẵn CERT_POOL_TARGET_SIZE certificate đã active, đã gắn policy
+    và chưa thuộc phòng nào; CreateRoomConfig nhận một certificate từ pool thay vì tự tạo
+    Có thể truyền {"targetSize": n} để nạp trước một đợt onboarding lớn
+    """
+    target = int((event or {}).get('targetSize') or POOL_TARGET_SIZE)
+    ready = count_ready()
+    missing = max(target - ready, 0)
+    to_create = min(missing, MAX_CREATE_PER_RUN)
+
+    created = 0
+    errors = []
+    for index in range(to_create):
+        if index:
+            time.sleep(CREATE_INTERVAL_SECONDS)
+        try:
+            provision_certificate()
+            created += 1
+        except ClientError as e:
+            print(f"Error provisioning certificate: {e}")
+            errors.append(str(e))
+            if e.response['Error']['Code'] in ('ThrottlingException', 'LimitExceededException'):
+                # Bị giới hạn tốc độ: dừng, lần chạy sau làm tiếp
+                break
+
+    print(f"Certificate pool: {ready} ready, target {target}, created {created}, {len(errors)} errors")
+    return {'ready': ready + created, 'target': target, 'created': created, 'errors': len(errors)}
@@ -0,0 +1,355 @@
+import boto3
+import calendar
+import gzip
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+import numpy as np
+from archive_store import ArchiveStore
+from config_profiles import profiles_enabled, resolve_config
+from index_query import list_office_rooms, projection_kwargs
+from parallel_scan import parallel_scan
+
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT'))
+TABLE_NAME = os.environ.get('SENSOR_LOG_TABLE')
+table = dynamodb.Table(TABLE_NAME)
+BUCKET_TABLE_NAME = os.environ.get('SENSOR_BUCKET_TABLE')
+bucket_table = dynamodb.Table(BUCKET_TABLE_NAME) if BUCKET_TABLE_NAME else None
+BUCKET_SECONDS = int(os.environ.get('SENSOR_BUCKET_SECONDS', '3600'))
+ROOM_CONFIG_TABLE_NAME = os.environ.get('ROOM_CONFIG_TABLE')
+room_config_table = dynamodb.Table(ROOM_CONFIG_TABLE_NAME)
+# PK = roomId, SK = day (YYYY-MM-DD)
+STATS_TABLE_NAME = os.environ.get('COMFORT_STATS_TABLE')
+stats_table = dynamodb.Table(STATS_TABLE_NAME)
+# Archive lạnh do SmartOfficeSensorArchive ghi (tuỳ chọn): ngày đã hết hạn trong bảng nóng vẫn tính lại được
+ARCHIVE_URI = os.environ.get('SENSOR_ARCHIVE_URI', '')
+archive_store = ArchiveStore(ARCHIVE_URI) if ARCHIVE_URI else None
+
+METRICS = ('temperature', 'humidity', 'light')
+TARGET_FIELDS = {'temperature': 'targetTemperature', 'humidity': 'targetHumidity', 'light': 'targetLight'}
+# Sai lệch cho phép quanh target để tính "trong dải" (°C, %, lux)
+TOLERANCES = {
+    'temperature': float(os.environ.get('COMFORT_TEMPERATURE_TOLERANCE', '1')),
+    'humidity': float(os.environ.get('COMFORT_HUMIDITY_TOLERANCE', '10')),
+    'light': float(os.environ.get('COMFORT_LIGHT_TOLERANCE', '50'))
+}
+# Một bản ghi được coi là đại diện tối đa cho chừng này giây; khoảng trống dài hơn tính là mất dữ liệu
+MAX_SAMPLE_SECONDS = int(os.environ.get('COMFORT_MAX_SAMPLE_SECONDS', '300'))
+# Phòng có deadband chỉ lưu bản ghi khi giá trị đổi hoặc sau maxSilenceSeconds (xem SmartOfficeSensorIngest)
+DEFAULT_MAX_SILENCE_SECONDS = 900
+# BatchGetItem: retry UnprocessedKeys với exponential backoff + jitter
+BATCH_GET_SIZE = 100
+MAX_BATCH_ATTEMPTS = 6
+BASE_BACKOFF_SECONDS = 0.05
+MAX_BACKOFF_SECONDS = 2
+PERCENTILES = (5, 50, 95)
+DAY_SECONDS = 86400
+DEFAULT_RANGE_DAYS = 7
+MAX_RANGE_DAYS = 92
+NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+CONFIG_FIELDS = ['roomId', 'officeId', 'targetTemperature', 'targetHumidity', 'targetLight', 'deadband']
+# Số segment quét song song khi job chạy cho mọi phòng (parallel_scan.py được đóng gói cùng Lambda này)
+CONFIG_SCAN_SEGMENTS = int(os.environ.get('COMFORT_SCAN_SEGMENTS', '4'))
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj) if obj % 1 == 0 else float(obj)
+        return super(DecimalEncoder, self).default(obj)
+
+def day_key(day_start):
+    return datetime.fromtimestamp(day_start, tz=timezone.utc).strftime('%Y-%m-%d')
+
+def parse_day(value, name):
+    try:
+        return calendar.timegm(datetime.strptime(value, '%Y-%m-%d').timetuple())
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid {name}: {value}. Expected YYYY-MM-DD')
+
+def to_float(value):
+    """Numeric reading or target as float; legacy '25.68 °C' strings are parsed, NaN if missing"""
+    if value is None or isinstance(value, bool):
+        return float('nan')
+    if isinstance(value, (Decimal, int, float)):
+        return float(value)
+    match = NUMBER_PATTERN.search(str(value))
+    return float(match.group()) if match else float('nan')
+
+def to_decimal(value, digits=3):
+    return Decimal(str(round(float(value), digits)))
+
+def query_all(source_table, key_condition):
+    items = []
+    query_kwargs = {'KeyConditionExpression': key_condition}
+    while True:
+        response = source_table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return items
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+def read_archive_day(room_id, day_start):
+    """(timestamp, [metric values]) of an archived room-day, [] when the day has no segment"""
+    raw = archive_store.get(f'{room_id}/{day_key(day_start)}.json.gz')
+    if not raw:
+        return []
+    segment = json.loads(gzip.decompress(raw))
+    return [
+        (int(timestamp), [to_float(segment[metric][index]) for metric in METRICS])
+        for index, timestamp in enumerate(segment['timestamp'])
+    ]
+
+def read_day_arrays(room_id, day_start):
+    """
+    All readings of one UTC day as arrays: (timestamps, {metric: values})
+    Đọc bảng log, bảng bucket (nếu bật) và segment archive (nếu có); giá trị thiếu là NaN
+    """
+    day_end = day_start + DAY_SECONDS - 1
+    rows = {}
+    for item in query_all(table, Key('roomId').eq(room_id) & Key('timestamp').between(day_start, day_end)):
+        rows.setdefault(int(item['timestamp']), [to_float(item.get(metric)) for metric in METRICS])
+
+    if bucket_table is not None:
+        condition = Key('roomId').eq(room_id) & \
+            Key('bucketStart').between(day_start - day_start % BUCKET_SECONDS, day_end)
+        for bucket in query_all(bucket_table, condition):
+            base = int(bucket['bucketStart'])
+            columns = [bucket.get(metric) or [] for metric in METRICS]
+            for index, offset in enumerate(bucket.get('ts', [])):
+                timestamp = base + int(offset)
+                if day_start <= timestamp <= day_end and timestamp not in rows:
+                    rows[timestamp] = [
+                        to_float(column[index]) if index < len(column) else float('nan')
+                        for column in columns
+                    ]
+
+    if archive_store is not None:
+        # Tính lại một ngày cũ: dòng nóng có thể đã hết TTL, segment archive chứa cả ngày
+        for timestamp, values in read_archive_day(room_id, day_start):
+            rows.setdefault(timestamp, values)
+
+    timestamps = np.array(sorted(rows), dtype=np.int64)
+    values = np.array([rows[timestamp] for timestamp in timestamps], dtype=np.float64).reshape(-1, len(METRICS))
+    return timestamps, {metric: values[:, index] for index, metric in enumerate(METRICS)}
+
+def max_sample_seconds(room_config):
+    """
+    Longest span one stored reading of the room stands for
+    Với deadband, một phòng ổn định chỉ có bản ghi sau maxSilenceSeconds (cộng một chu kỳ gửi của thiết bị)
+    """
+    deadband = room_config.get('deadband')
+    if not deadband:
+        return MAX_SAMPLE_SECONDS
+    return int(deadband.get('maxSilenceSeconds', DEFAULT_MAX_SILENCE_SECONDS)) + MAX_SAMPLE_SECONDS
+
+def sample_weights(timestamps, day_start, max_seconds=MAX_SAMPLE_SECONDS):
+    """
+    Seconds each reading stands for: until the next reading (or end of day), capped at `max_seconds`
+    Return (weights, gap_seconds) - phần vượt ngưỡng, kể cả đầu và cuối ngày, tính là mất dữ liệu
+    """
+    if timestamps.size == 0:
+        return np.zeros(0), DAY_SECONDS
+    following = np.append(timestamps[1:], day_start + DAY_SECONDS)
+    spans = following - timestamps
+    weights = np.minimum(spans, max_seconds)
+    # Trước bản ghi đầu tiên của ngày không có dữ liệu nào
+    gap_seconds = int(np.maximum(spans - max_seconds, 0).sum()) + int(timestamps[0] - day_start)
+    return weights.astype(np.float64), gap_seconds
+
+def metric_stats(values, weights, target, tolerance):
+    """Time-weighted comfort statistics of one metric over one day"""
+    valid = ~np.isnan(values)
+    samples = int(valid.sum())
+    if samples == 0:
+        return {'samples': 0}
+
+    values = values[valid]
+    weights = weights[valid]
+    covered = weights.sum()
+    stats = {
+        'samples': samples,
+        'minutesCovered': covered / 60,
+        'min': values.min(),
+        'max': values.max(),
+        'mean': np.average(values, weights=weights) if covered else values.mean()
+    }
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        stats[f'p{percentile}'] = value
+
+    if not np.isnan(target):
+        deviation = values - target
+        below = deviation < -tolerance
+        above = deviation > tolerance
+        in_band = ~(below | above)
+        stats.update({
+            'target': target,
+            'tolerance': tolerance,
+            'minutesInBand': weights[in_band].sum() / 60,
+            'minutesBelow': weights[below].sum() / 60,
+            'minutesAbove': weights[above].sum() / 60,
+            'percentInBand': 100 * weights[in_band].sum() / covered if covered else 0,
+            'meanDeviation': np.average(deviation, weights=weights) if covered else deviation.mean(),
+            'meanAbsDeviation': np.average(np.abs(deviation), weights=weights) if covered else np.abs(deviation).mean()
+        })
+    return stats
+
+def compute_room_day(room_config, day_start):
+    """Daily comfort/compliance summary of one room, ready to store"""
+    room_id = room_config['roomId']
+    if profiles_enabled() and room_config.get('officeId'):
+        # Target và deadband kế thừa từ profile office/org khi phòng không đặt riêng
+        room_config = resolve_config(room_config, room_config['officeId'], list(TARGET_FIELDS.values()) + ['deadband'])
+    timestamps, series = read_day_arrays(room_id, day_start)
+    weights, gap_seconds = sample_weights(timestamps, day_start, max_sample_seconds(room_config))
+
+    summary = {
+        'roomId': room_id,
+        'day': day_key(day_start),
+        'officeId': room_config.get('officeId'),
+        'samples': int(timestamps.size),
+        'dataGapMinutes': to_decimal(gap_seconds / 60, 1),
+        'computedAt': int(time.time())
+    }
+    for metric in METRICS:
+        target = to_float(room_config.get(TARGET_FIELDS[metric]))
+        stats = metric_stats(series[metric], weights, target, TOLERANCES[metric])
+        summary[metric] = {
+            key: value if key == 'samples' else to_decimal(value)
+            for key, value in stats.items()
+        }
+    if not summary['officeId']:
+        del summary['officeId']
+    return summary
+
+def list_room_configs(room_ids=None, office_id=None):
+    """
+    roomId, officeId, targets and deadband of every room, of `room_ids`, or of one office
+    Phòng chỉ định: query theo partition key roomId; một office: GSI officeId; còn lại: parallel scan
+    """
+    if room_ids:
+        configs = []
+        for room_id in room_ids:
+            configs.extend(room_config_table.query(
+                KeyConditionExpression=Key('roomId').eq(room_id),
+                **projection_kwargs(CONFIG_FIELDS)
+            ).get('Items', []))
+        return configs
+    if office_id:
+        return list_office_rooms(room_config_table, office_id, CONFIG_FIELDS)
+    return parallel_scan(room_config_table, segments=CONFIG_SCAN_SEGMENTS, **projection_kwargs(CONFIG_FIELDS))
+
+def run_daily_job(event):
+    """
+    EventBridge schedule: tính thống kê của ngày hôm qua (UTC) cho mọi phòng
+    Có thể truyền {"day": "YYYY-MM-DD", "roomIds": [...]} hoặc {"day": ..., "officeId": ...} để tính lại
+    """
+    if event.get('day'):
+        day_start = parse_day(event['day'], 'day')
+    else:
+        day_start = int(time.time()) // DAY_SECONDS * DAY_SECONDS - DAY_SECONDS
+
+    stored = 0
+    failed = {}
+    for room_config in list_room_configs(event.get('roomIds'), event.get('officeId')):
+        try:
+            stats_table.put_item(Item=compute_room_day(room_config, day_start))
+            stored += 1
+        except Exception as e:
+            print(f"Error computing comfort stats for {room_config['roomId']}: {e}")
+            failed[room_config['roomId']] = str(e)
+
+    print(f"Comfort stats for {day_key(day_start)}: stored {stored}, failed {len(failed)}")
+    return {'day': day_key(day_start), 'stored': stored, 'failed': failed}
+
+def backoff(attempt):
+    """Exponential backoff with full jitter"""
+    time.sleep(random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)))
+
+def get_room_stats(room_id, params):
+    """Stored daily summaries of one room between `from` and `to` (inclusive days)"""
+    today = int(time.time()) // DAY_SECONDS * DAY_SECONDS
+    end = parse_day(params['to'], 'to') if params.get('to') else today
+    start = parse_day(params['from'], 'from') if params.get('from') else end - (DEFAULT_RANGE_DAYS - 1) * DAY_SECONDS
+    if start > end:
+        raise ValueError('"from" must not be greater than "to"')
+    if (end - start) // DAY_SECONDS >= MAX_RANGE_DAYS:
+        raise ValueError(f'Range too long (max {MAX_RANGE_DAYS} days)')
+
+    days = query_all(stats_table, Key('roomId').eq(room_id) & Key('day').between(day_key(start), day_key(end)))
+    return {'roomId': room_id, 'from': day_key(start), 'to': day_key(end), 'days': days}
+
+def get_office_stats(office_id, params):
+    """Stored summaries of every room of an office for a single day"""
+    day = day_key(parse_day(params['day'], 'day')) if params.get('day') else \
+        day_key(int(time.time()) // DAY_SECONDS * DAY_SECONDS - DAY_SECONDS)
+
+    room_ids = [item['roomId'] for item in list_office_rooms(room_config_table, office_id, ['roomId'])]
+
+    rooms = {}
+    unprocessed = []
+    for index in range(0, len(room_ids), BATCH_GET_SIZE):
+        keys = [{'roomId': room_id, 'day': day} for room_id in room_ids[index:index + BATCH_GET_SIZE]]
+        pending = {STATS_TABLE_NAME: {'Keys': keys}}
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            response = dynamodb.batch_get_item(RequestItems=pending)
+            for item in response.get('Responses', {}).get(STATS_TABLE_NAME, []):
+                rooms[item['roomId']] = item
+            pending = response.get('UnprocessedKeys') or {}
+            if not pending or attempt == MAX_BATCH_ATTEMPTS - 1:
+                break
+            backoff(attempt)
+        if pending:
+            unprocessed.extend(key['roomId'] for key in pending[STATS_TABLE_NAME]['Keys'])
+    body = {
+        'officeId': office_id,
+        'day': day,
+        'rooms': rooms,
+        'missing': sorted(set(room_ids) - set(rooms) - set(unprocessed))
+    }
+    if unprocessed:
+        # Bị throttle quá số lần retry: client gọi lại cho các phòng này
+        body['unprocessed'] = sorted(unprocessed)
+    return body
+
+def lambda_handler(event, context):
+    """
+    GET ?roomId=...&from=YYYY-MM-DD&to=YYYY-MM-DD hoặc ?officeId=...&day=YYYY-MM-DD
+    Gọi từ EventBridge (không có httpMethod) thì chạy job tính thống kê hằng ngày
+    """
+    if 'httpMethod' not in event and 'queryStringParameters' not in event:
+        return run_daily_job(event)
+
+    headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+        'Access-Control-Allow-Methods': 'GET,OPTIONS'
+    }
+
+    if event.get('httpMethod') == 'OPTIONS':
+        return {'statusCode': 200, 'headers': headers, 'body': ''}
+
+    try:
+        params = event.get('queryStringParameters') or {}
+        room_id = params.get('roomId')
+        office_id = params.get('officeId')
+        if not room_id and not office_id:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'message': 'Missing required parameter: roomId or officeId'})
+            }
+
+        body = get_room_stats(room_id, params) if room_id else get_office_stats(office_id, params)
+        return {'statusCode': 200, 'headers': headers, 'body': json.dumps(body, cls=DecimalEncoder)}
+
+    except ValueError as e:
+        return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'message': str(e)})}
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': str(e)})}
@@ -0,0 +1,193 @@
+import boto3
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from config_profiles import (
+    INHERITABLE_FIELDS, inherited_cache, load_inherited_config, normalize_deadband, office_profile_id, org_profile_id
+)
+from index_query import list_office_rooms
+from schedule_buckets import SCHEDULE_FIELDS, normalize_time, settings_buckets
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj) if obj % 1 == 0 else float(obj)
+        return super(DecimalEncoder, self).default(obj)
+
+dynamodb = boto3.resource('dynamodb')
+PROFILE_TABLE_NAME = os.environ['CONFIG_PROFILE_TABLE']
+profile_table = dynamodb.Table(PROFILE_TABLE_NAME)
+ROOM_CONFIG_TABLE_NAME = os.environ.get('ROOM_CONFIG_TABLE')
+room_config_table = dynamodb.Table(ROOM_CONFIG_TABLE_NAME) if ROOM_CONFIG_TABLE_NAME else None
+MAX_WRITE_ATTEMPTS = 5
+RESET_WORKERS = 16
+
+def normalize_settings(settings):
+    """Validate profile settings; None values mean "remove from the profile" """
+    if not isinstance(settings, dict) or not settings:
+        raise ValueError('"settings" must be a non-empty object')
+    normalized = {}
+    for key, value in settings.items():
+        if key not in INHERITABLE_FIELDS:
+            raise ValueError(f'Field cannot be set on a profile: {key}')
+        if key == 'deadband' and value is not None:
+            value = normalize_deadband(value)
+        if key in SCHEDULE_FIELDS and value is not None:
+            value = normalize_time(key, value)
+        normalized[key] = value
+    return normalized
+
+def save_profile(profile_id, changes, extra):
+    """Merge `changes` into the stored profile with optimistic locking on `version`"""
+    for _ in range(MAX_WRITE_ATTEMPTS):
+        item = profile_table.get_item(Key={'profileId': profile_id}, ConsistentRead=True).get('Item') or {
+            'profileId': profile_id,
+            'settings': {},
+            'version': 0
+        }
+        version = int(item['version'])
+        settings = dict(item.get('settings') or {})
+        for key, value in changes.items():
+            if value is None:
+                settings.pop(key, None)
+            else:
+                settings[key] = value
+        item.update(extra)
+        item['settings'] = settings
+        # Bucket lịch ở cấp item: partition key của GSI thưa mà SmartOfficeScheduler truy vấn
+        buckets = settings_buckets(settings)
+        for bucket_attribute in SCHEDULE_FIELDS.values():
+            item.pop(bucket_attribute, None)
+        item.update(buckets)
+        item['version'] = version + 1
+        item['lastUpdate'] = datetime.now(timezone.utc).isoformat()
+        try:
+            profile_table.put_item(
+                Item=item,
+                ConditionExpression='attribute_not_exists(profileId) OR version = :version',
+                ExpressionAttributeValues={':version': version}
+            )
+            return item
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    raise RuntimeError(f'Profile write conflict for {profile_id}')
+
+def list_office_room_ids(office_id):
+    """Room IDs of an office from the officeId GSI"""
+    return [item['roomId'] for item in list_office_rooms(room_config_table, office_id, ['roomId'])]
+
+def reset_room_overrides(office_id, fields):
+    """
+    Remove `fields` from every room of the office so the rooms inherit the profile again
+    Dùng một lần khi chuyển các phòng cũ (mang bản sao cấu hình mặc định) sang profile
+    """
+    if not fields:
+        return 0
+    # Bỏ giờ bật/tắt riêng thì bỏ luôn bucket lịch của phòng
+    fields = list(fields) + [SCHEDULE_FIELDS[field] for field in fields if field in SCHEDULE_FIELDS]
+    names = {f'#f{index}': field for index, field in enumerate(fields)}
+    names['#lastUpdate'] = 'lastUpdate'
+
+    def reset(room_id):
+        room_config_table.update_item(
+            Key={'roomId': room_id, 'officeId': office_id},
+            UpdateExpression='SET #lastUpdate = :lastUpdate REMOVE ' + ', '.join(name for name in names if name != '#lastUpdate'),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues={':lastUpdate': datetime.now(timezone.utc).isoformat()},
+            ConditionExpression='attribute_exists(roomId)'
+        )
+
+    room_ids = list_office_room_ids(office_id)
+    if not room_ids:
+        return 0
+    with ThreadPoolExecutor(max_workers=min(RESET_WORKERS, len(room_ids))) as executor:
+        list(executor.map(reset, room_ids))
+    return len(room_ids)
+
+def lambda_handler(event, context):
+    """
+    GET  ?officeId=... | ?orgAlias=...   -> profile và cấu hình kế thừa hiệu lực (với office)
+    POST {"officeId" | "orgAlias", "settings": {...}, "resetRoomOverrides": false}
+         office profile có thể gắn với org qua "orgAlias"; giá trị null xoá field khỏi profile
+    """
+    headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+        'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+    }
+
+    if event.get('httpMethod') == 'OPTIONS':
+        return {'statusCode': 200, 'headers': headers, 'body': ''}
+
+    try:
+        if event.get('httpMethod') == 'GET' or not event.get('body'):
+            params = event.get('queryStringParameters') or {}
+            office_id = params.get('officeId')
+            org_alias = params.get('orgAlias')
+            if not office_id and not org_alias:
+                return {
+                    'statusCode': 400,
+                    'headers': headers,
+                    'body': json.dumps({'error': 'Missing "officeId" or "orgAlias"'})
+                }
+            profile_id = office_profile_id(office_id) if office_id else org_profile_id(org_alias)
+            profile = profile_table.get_item(Key={'profileId': profile_id}).get('Item') or {'profileId': profile_id, 'settings': {}}
+            body = {'profile': profile}
+            if office_id:
+                body['effective'] = load_inherited_config(office_id)
+            return {'statusCode': 200, 'headers': headers, 'body': json.dumps(body, cls=DecimalEncoder)}
+
+        body = json.loads(event['body'], parse_float=Decimal)
+        office_id = body.get('officeId')
+        org_alias = body.get('orgAlias')
+        if not office_id and not org_alias:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'Missing "officeId" or "orgAlias"'})
+            }
+
+        try:
+            changes = normalize_settings(body.get('settings'))
+        except ValueError as e:
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+
+        # Kiểm tra trước khi ghi: request 4xx không được để lại profile đã lưu
+        reset_overrides = bool(body.get('resetRoomOverrides'))
+        if reset_overrides and not office_id:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': '"resetRoomOverrides" requires "officeId"'})
+            }
+        if reset_overrides and room_config_table is None:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': '"resetRoomOverrides" requires ROOM_CONFIG_TABLE'})
+            }
+
+        if office_id:
+            extra = {'orgAlias': org_alias} if org_alias else {}
+            profile = save_profile(office_profile_id(office_id), changes, extra)
+            inherited_cache.invalidate(office_id)
+        else:
+            profile = save_profile(org_profile_id(org_alias), changes, {})
+            # Các office thuộc org này không biết trước được: cache của chúng hết hạn theo TTL
+            inherited_cache.clear()
+
+        result = {'message': 'Profile updated successfully', 'profile': profile}
+        if reset_overrides:
+            result['roomsReset'] = reset_room_overrides(office_id, list(profile['settings']))
+
+        return {'statusCode': 200, 'headers': headers, 'body': json.dumps(result, cls=DecimalEncoder)}
+
+    except ValueError as e:
+        return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': f'Error while handling: {str(e)}'})}
@@ -0,0 +1,146 @@
+import boto3
+import os
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+from config_profiles import (
+    inherited_cache, list_org_office_ids, profiles_enabled, resolve_config
+)
+from device_shadow import shadow_client
+from index_query import list_office_rooms
+
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT'))
+ROOM_CONFIG_TABLE_NAME = os.environ.get('ROOM_CONFIG_TABLE')
+room_config_table = dynamodb.Table(ROOM_CONFIG_TABLE_NAME) if ROOM_CONFIG_TABLE_NAME else None
+# Các field điều khiển được đẩy xuống thiết bị (deadband chỉ dùng cho ingestion)
+CONTROL_FIELDS = [
+    "temperatureMode",
+    "humidityMode",
+    "lightMode",
+    "targetTemperature",
+    "targetHumidity",
+    "targetLight",
+    "autoOnTime",
+    "autoOffTime"
+]
+
+deserializer = TypeDeserializer()
+
+def image(record, name):
+    raw = record.get('dynamodb', {}).get(name)
+    return {key: deserializer.deserialize(value) for key, value in raw.items()} if raw else None
+
+def control_state(room_config):
+    """Effective control fields of a room (inherited from profiles when enabled)"""
+    if profiles_enabled():
+        room_config = resolve_config(room_config, room_config['officeId'], CONTROL_FIELDS)
+    return {field: room_config.get(field) for field in CONTROL_FIELDS}
+
+def diff(old_state, new_state):
+    """Delta for the shadow: changed fields, with null for fields that disappeared"""
+    return {
+        field: new_state[field]
+        for field in CONTROL_FIELDS
+        if new_state[field] != old_state.get(field)
+    }
+
+def coalesce_room_records(records):
+    """
+    Collapse every stream record of a room in the batch into (first old image, last new image)
+    Cả chuỗi thay đổi khi kéo slider chỉ còn một delta
+    """
+    rooms = {}
+    for record in sorted(records, key=lambda r: int(r.get('dynamodb', {}).get('SequenceNumber', 0))):
+        keys = record.get('dynamodb', {}).get('Keys', {})
+        if 'roomId' not in keys:
+            continue
+        key = (keys['roomId']['S'], keys['officeId']['S'])
+        entry = rooms.setdefault(key, {'old': image(record, 'OldImage'), 'new': None, 'changes': 0})
+        entry['new'] = image(record, 'NewImage')
+        entry['changes'] += 1
+    return rooms
+
+def room_deltas(records):
+    """{thingName: delta} for room config changes in the batch"""
+    deltas = {}
+    for (room_id, office_id), entry in coalesce_room_records(records).items():
+        new = entry['new']
+        # Phòng bị xoá hoặc chưa gắn Thing: không có gì để đẩy
+        if not new or not new.get('thingName'):
+            continue
+        old_state = control_state(entry['old']) if entry['old'] else {}
+        delta = diff(old_state, control_state(new))
+        if delta:
+            print(f"Room {room_id}: {entry['changes']} change(s) coalesced into {sorted(delta)}")
+            deltas[new['thingName']] = delta
+    return deltas
+
+def profile_offices(profile_id):
+    """Offices affected by a profile change"""
+    if profile_id.startswith('OFFICE#'):
+        return [profile_id[len('OFFICE#'):]]
+    # Mọi office của org, kể cả office chưa có profile riêng
+    return list_org_office_ids(profile_id[len('ORG#'):])
+
+def profile_deltas(records):
+    """{thingName: delta} for rooms that inherit a field changed by a profile write"""
+    changed = {}
+    for record in records:
+        keys = record.get('dynamodb', {}).get('Keys', {})
+        if 'profileId' not in keys:
+            continue
+        old = (image(record, 'OldImage') or {}).get('settings') or {}
+        new = (image(record, 'NewImage') or {}).get('settings') or {}
+        fields = {field for field in CONTROL_FIELDS if old.get(field) != new.get(field)}
+        if fields:
+            profile_id = keys['profileId']['S']
+            changed.setdefault(profile_id, set()).update(fields)
+
+    deltas = {}
+    if not changed or room_config_table is None:
+        return deltas
+    offices = {}
+    for profile_id, fields in changed.items():
+        for office_id in profile_offices(profile_id):
+            offices.setdefault(office_id, set()).update(fields)
+
+    for office_id, fields in offices.items():
+        # Profile vừa đổi: bỏ bản gộp cũ trong container này
+        inherited_cache.invalidate(office_id)
+        for room in list_office_rooms(room_config_table, office_id, ['roomId', 'officeId', 'thingName'] + CONTROL_FIELDS):
+            if not room.get('thingName'):
+                continue
+            state = control_state(room)
+            # Field phòng tự đặt thì không đổi theo profile
+            delta = {field: state[field] for field in fields if field not in room}
+            if delta:
+                deltas.setdefault(room['thingName'], {}).update(delta)
+    return deltas
+
+def lambda_handler(event, context):
+    """
+    DynamoDB Stream consumer cho ROOM_CONFIG_TABLE (và CONFIG_PROFILE_TABLE nếu bật profile)
+    Đặt MaximumBatchingWindowInSeconds trên event source mapping làm cửa sổ debounce:
+    mọi thay đổi của một phòng trong cửa sổ được gộp thành một lần cập nhật shadow
+    """
+    records = [
+        record for record in event.get('Records', [])
+        if record.get('eventName') in ('INSERT', 'MODIFY', 'REMOVE')
+    ]
+    deltas = room_deltas(records)
+    for thing_name, delta in profile_deltas(records).items():
+        # Thay đổi của chính phòng (cùng batch) được ưu tiên hơn giá trị kế thừa
+        deltas[thing_name] = {**delta, **deltas.get(thing_name, {})}
+
+    failed = {}
+    for thing_name, delta in deltas.items():
+        try:
+            shadow_client.update_desired(thing_name, delta)
+        except ClientError as e:
+            print(f"Error updating shadow of {thing_name}: {e}")
+            failed[thing_name] = str(e)
+
+    print(f"Processed {len(records)} records, pushed {len(deltas) - len(failed)} shadow updates")
+    if failed:
+        # Desired state là idempotent: để stream gửi lại cả batch
+        raise RuntimeError(f"Failed to update {len(failed)} device shadows")
+    return {'records': len(records), 'shadowUpdates': len(deltas)}
@@ -0,0 +1,111 @@
+import base64
+import boto3
+import gzip
+import hashlib
+import json
+import os
+from decimal import Decimal
+from ttl_cache import TTLCache
+from config_profiles import profiles_enabled, resolve_config
+from index_query import list_office_rooms
+
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT'))
+TABLE_NAME = os.environ['ROOM_CONFIG_TABLE']
+table = dynamodb.Table(TABLE_NAME)
+# Chỉ các field điều khiển: không có certificateArn hay dữ liệu nội bộ khác
+CONTROL_FIELDS = [
+    "temperatureMode",
+    "humidityMode",
+    "lightMode",
+    "targetTemperature",
+    "targetHumidity",
+    "targetLight",
+    "autoOnTime",
+    "autoOffTime"
+]
+MIN_COMPRESS_BYTES = 1024
+
+# Cả fleet khởi động lại cùng lúc sau mất điện: các hub của một office dùng chung một snapshot trong vài giây
+snapshot_cache = TTLCache('configSnapshot', ttl_seconds=int(os.environ.get('SNAPSHOT_CACHE_TTL_SECONDS', '10')))
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj) if obj % 1 == 0 else float(obj)
+        return super(DecimalEncoder, self).default(obj)
+
+def query_office_rooms(office_id):
+    """Room items of an office with only thingName and control fields"""
+    return list_office_rooms(table, office_id, ['roomId', 'thingName'] + CONTROL_FIELDS)
+
+def build_snapshot(office_id):
+    """Compact snapshot {'payload': json, 'etag': ...} of every room's effective control fields"""
+    rooms = {}
+    for room in query_office_rooms(office_id):
+        room_id = room.pop('roomId')
+        if profiles_enabled():
+            room = resolve_config(room, office_id, CONTROL_FIELDS)
+            room.pop('inheritedFrom', None)
+        rooms[room_id] = room
+
+    # sort_keys để cùng nội dung luôn cho cùng ETag
+    payload = json.dumps(
+        {'officeId': office_id, 'roomCount': len(rooms), 'rooms': rooms},
+        cls=DecimalEncoder, separators=(',', ':'), sort_keys=True
+    )
+    etag = '"' + hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32] + '"'
+    return {'payload': payload, 'etag': etag}
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(',')]
+    # Chấp nhận cả weak validator W/"..." và *
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+def lambda_handler(event, context):
+    """
+    GET ?officeId=... -> cấu hình điều khiển của mọi phòng trong office, kèm ETag
+    Hub gửi lại If-None-Match: nhận 304 không có body khi không có gì thay đổi
+    """
+    headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': 'Content-Type,Authorization,If-None-Match',
+        'Access-Control-Allow-Methods': 'GET,OPTIONS',
+        'Access-Control-Expose-Headers': 'ETag'
+    }
+
+    if event.get('httpMethod') == 'OPTIONS':
+        return {'statusCode': 200, 'headers': headers, 'body': ''}
+
+    try:
+        params = event.get('queryStringParameters') or {}
+        office_id = params.get('officeId') or (event.get('pathParameters') or {}).get('officeId')
+        if not office_id:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'Missing required parameter: officeId'})
+            }
+
+        snapshot = snapshot_cache.get_or_load(office_id, build_snapshot)
+        headers = {**headers, 'ETag': snapshot['etag'], 'Cache-Control': 'no-cache'}
+
+        request_headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+        if etag_matches(request_headers.get('if-none-match'), snapshot['etag']):
+            return {'statusCode': 304, 'headers': headers, 'body': ''}
+
+        payload = snapshot['payload']
+        accepts_gzip = 'gzip' in (request_headers.get('accept-encoding') or '').lower()
+        if accepts_gzip and len(payload) >= MIN_COMPRESS_BYTES:
+            return {
+                'statusCode': 200,
+                'headers': {**headers, 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'},
+                'body': base64.b64encode(gzip.compress(payload.encode('utf-8'))).decode('ascii'),
+                'isBase64Encoded': True
+            }
+        return {'statusCode': 200, 'headers': headers, 'body': payload}
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': str(e)})}
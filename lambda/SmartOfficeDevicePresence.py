@@ -0,0 +1,212 @@
+import base64
+import boto3
+import json
+import os
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+from ttl_cache import TTLCache
+
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT'))
+TABLE_NAME = os.environ['ROOM_CONFIG_TABLE']
+table = dynamodb.Table(TABLE_NAME)
+# GSI thingName -> (roomId, officeId); chưa có index thì quét bảng một lần cho cả batch
+THING_INDEX_NAME = os.environ.get('ROOM_CONFIG_THING_INDEX', 'thingName-index')
+
+STATUS_BY_EVENT = {'connected': 'ONLINE', 'disconnected': 'OFFLINE'}
+# Thiết bị kết nối lại với cùng clientId: session cũ bị ngắt nhưng Thing vẫn online
+IGNORED_DISCONNECT_REASONS = {'DUPLICATE_CLIENTID'}
+
+# Thing -> phòng không đổi sau khi tạo phòng
+thing_room_cache = TTLCache('thingRoom', ttl_seconds=int(os.environ.get('THING_ROOM_CACHE_TTL_SECONDS', '3600')))
+# Timestamp lớn nhất đã thấy của từng Thing trong container này: sự kiện đến trễ không tốn lần ghi nào
+presence_cache = TTLCache('presence', ttl_seconds=int(os.environ.get('PRESENCE_CACHE_TTL_SECONDS', '300')))
+
+def parse_messages(event):
+    """
+    Extract (message_id, message) pairs from an SQS batch, a Kinesis batch,
+    a list of lifecycle events or a single IoT rule event
+    """
+    if 'Records' in event:
+        entries = []
+        for record in event['Records']:
+            if 'kinesis' in record:
+                message_id = record['kinesis']['sequenceNumber']
+                payload = base64.b64decode(record['kinesis']['data'])
+            else:
+                message_id = record.get('messageId')
+                payload = record.get('body')
+            try:
+                entries.append((message_id, json.loads(payload)))
+            except (TypeError, ValueError):
+                entries.append((message_id, None))
+        return entries
+    if isinstance(event, list):
+        return list(enumerate(event))
+    return [(None, event)]
+
+def parse_presence(message):
+    """(thingName, status, timestamp, versionNumber) of an IoT lifecycle event, None if it is not one"""
+    if not isinstance(message, dict):
+        return None
+    status = STATUS_BY_EVENT.get(message.get('eventType'))
+    thing_name = message.get('thingName') or message.get('clientId')
+    if status is None or not thing_name or message.get('timestamp') is None:
+        return None
+    if status == 'OFFLINE' and message.get('disconnectReason') in IGNORED_DISCONNECT_REASONS:
+        return None
+    return thing_name, status, int(message['timestamp']), int(message.get('versionNumber') or 0)
+
+def coalesce_presence(messages):
+    """
+    Keep only the latest event of each Thing in the batch
+    Return {thingName: {'status', 'timestamp', 'events', 'messageIds'}}
+    Thiết bị chập chờn (connect/disconnect liên tục) chỉ còn một trạng thái mỗi batch
+    """
+    things = {}
+    for message_id, message in messages:
+        presence = parse_presence(message)
+        if presence is None:
+            continue
+        thing_name, status, timestamp, version = presence
+        entry = things.setdefault(thing_name, {'order': None, 'events': 0, 'messageIds': set()})
+        entry['events'] += 1
+        if message_id is not None:
+            entry['messageIds'].add(message_id)
+        if entry['order'] is None or (timestamp, version) > entry['order']:
+            entry.update({'order': (timestamp, version), 'status': status, 'timestamp': timestamp})
+    return things
+
+def load_thing_rooms(thing_names):
+    """{thingName: (roomId, officeId)} for the given Things; unknown Things are left out"""
+    rooms = {}
+    missing = []
+    for thing_name in thing_names:
+        cached = thing_room_cache.get(thing_name)
+        if cached is not None:
+            rooms[thing_name] = tuple(cached)
+        else:
+            missing.append(thing_name)
+    if not missing:
+        return rooms
+
+    names = {'#p0': 'roomId', '#p1': 'officeId', '#p2': 'thingName'}
+    found = {}
+    try:
+        for thing_name in missing:
+            response = table.query(
+                IndexName=THING_INDEX_NAME,
+                KeyConditionExpression=Key('thingName').eq(thing_name),
+                ProjectionExpression=', '.join(names),
+                ExpressionAttributeNames=names
+            )
+            for item in response.get('Items', []):
+                found[item['thingName']] = (item['roomId'], item['officeId'])
+    except ClientError as e:
+        # Index chưa tạo hoặc đang backfill: một lần scan cho mọi Thing còn thiếu
+        if e.response['Error']['Code'] not in ('ValidationException', 'ResourceNotFoundException'):
+            raise
+        scan_kwargs = {
+            'FilterExpression': Attr('thingName').is_in(missing),
+            'ProjectionExpression': ', '.join(names),
+            'ExpressionAttributeNames': names
+        }
+        while True:
+            response = table.scan(**scan_kwargs)
+            for item in response.get('Items', []):
+                found[item['thingName']] = (item['roomId'], item['officeId'])
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            scan_kwargs['ExclusiveStartKey'] = last_key
+
+    for thing_name, room in found.items():
+        thing_room_cache.put(thing_name, list(room))
+    rooms.update(found)
+    return rooms
+
+def write_presence(room, status, timestamp):
+    """
+    Record the latest lifecycle event of a room's Thing
+    Chỉ ghi connectionStatus/lastSeen khi trạng thái thực sự đổi; sự kiện mới hơn nhưng cùng trạng thái
+    chỉ đẩy watermark lastEventAt (không đổi lastSeen nên cache cấu hình phòng vẫn hợp lệ)
+    lastEventAt đơn điệu nên một sự kiện đến trễ (cũ hơn watermark) không thể lật trạng thái
+    Return (accepted, transitioned)
+    """
+    room_id, office_id = room
+    key = {'roomId': room_id, 'officeId': office_id}
+    newer = 'attribute_exists(roomId) AND (attribute_not_exists(lastEventAt) OR lastEventAt < :timestamp)'
+    try:
+        table.update_item(
+            Key=key,
+            UpdateExpression='SET connectionStatus = :status, lastSeen = :timestamp, lastEventAt = :timestamp',
+            ConditionExpression=f'{newer} AND (attribute_not_exists(connectionStatus) OR connectionStatus <> :status)',
+            ExpressionAttributeValues={':status': status, ':timestamp': timestamp}
+        )
+        return True, True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+    try:
+        table.update_item(
+            Key=key,
+            UpdateExpression='SET lastEventAt = :timestamp',
+            ConditionExpression=f'{newer} AND connectionStatus = :status',
+            ExpressionAttributeValues={':status': status, ':timestamp': timestamp}
+        )
+        return True, False
+    except ClientError as e:
+        # Sự kiện đến trễ hoặc trùng lặp
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False, False
+
+def lambda_handler(event, context):
+    """
+    Consumer cho IoT lifecycle events ($aws/events/presence/+/+) qua IoT Rule -> SQS/Kinesis
+    - Gộp theo Thing, chỉ giữ sự kiện mới nhất trong batch
+    - Mỗi Thing tối đa một lần ghi mỗi batch: connectionStatus ('ONLINE'/'OFFLINE') và lastSeen khi
+      trạng thái đổi, còn lại chỉ watermark lastEventAt (epoch ms)
+    - Sự kiện đến trễ hoặc trùng lặp (không mới hơn lastEventAt) bị điều kiện ghi loại bỏ
+    Đặt MaximumBatchingWindowInSeconds trên event source mapping để gộp thiết bị chập chờn
+    """
+    messages = parse_messages(event)
+    things = coalesce_presence(messages)
+
+    # Bỏ qua sự kiện không mới hơn timestamp lớn nhất container này đã thấy cho Thing đó
+    pending = {}
+    for thing_name, entry in things.items():
+        known = presence_cache.get(thing_name)
+        if known and known['timestamp'] >= entry['timestamp']:
+            continue
+        pending[thing_name] = entry
+
+    rooms = load_thing_rooms(list(pending))
+    written = 0
+    transitions = 0
+    failed = []
+    failed_ids = set()
+    for thing_name, entry in pending.items():
+        room = rooms.get(thing_name)
+        if room is None:
+            print(f"Thing {thing_name} is not assigned to a room, skipped")
+            continue
+        try:
+            accepted, transitioned = write_presence(room, entry['status'], entry['timestamp'])
+            written += accepted
+            transitions += transitioned
+            # Bị từ chối thì watermark trong bảng còn mới hơn: timestamp này vẫn là cận dưới đúng
+            presence_cache.put(thing_name, {'timestamp': entry['timestamp']})
+        except ClientError as e:
+            print(f"Error updating presence of {thing_name}: {e}")
+            failed.append(thing_name)
+            failed_ids.update(entry['messageIds'])
+
+    print(f"Processed {len(messages)} events for {len(things)} things, wrote {written} ({transitions} status changes)")
+    result = {'events': len(messages), 'things': len(things), 'written': written, 'transitions': transitions}
+    if 'Records' in event:
+        # Chỉ retry các message của Thing ghi lỗi
+        result['batchItemFailures'] = [{'itemIdentifier': message_id} for message_id in sorted(failed_ids)]
+    elif failed:
+        raise RuntimeError(f"Failed to update presence of {len(failed)} things")
+    return result
@@ -1,12 +1,98 @@
 import boto3
 import json
 import os
-from decimal import Decimal
+import base64
+import calendar
+import gzip
+import math
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
 from boto3.dynamodb.conditions import Key
+from ttl_cache import TTLCache
+from index_query import list_office_rooms
+from archive_store import ArchiveStore
+
+try:
+    import brotli  # Không có sẵn trong runtime Lambda, cần layer riêng
+except ImportError:
+    brotli = None
 
 TABLE_NAME = os.environ.get('SENSOR_LOG_TABLE')
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(TABLE_NAME)
+# Bảng rollup do SmartOfficeSensorRollup duy trì (tuỳ chọn)
+ROLLUP_TABLE_NAME = os.environ.get('SENSOR_ROLLUP_TABLE')
+# Bảng lưu dạng bucket (nhiều bản ghi mỗi item), đọc gộp với các dòng cũ trong SENSOR_LOG_TABLE (tuỳ chọn)
+BUCKET_TABLE_NAME = os.environ.get('SENSOR_BUCKET_TABLE')
+BUCKET_SECONDS = int(os.environ.get('SENSOR_BUCKET_SECONDS', '3600'))
+# Archive lạnh do SmartOfficeSensorArchive ghi: s3://bucket/prefix hoặc file:///path (tuỳ chọn)
+ARCHIVE_URI = os.environ.get('SENSOR_ARCHIVE_URI', '')
+# Manifest của archive được giữ trong container ấm một thời gian ngắn
+ARCHIVE_MANIFEST_TTL_SECONDS = 300
+DAY_SECONDS = 86400
+# Ring buffer các bản ghi gần nhất do SmartOfficeSensorIngest duy trì (tuỳ chọn)
+LATEST_TABLE_NAME = os.environ.get('SENSOR_LATEST_TABLE')
+# Bảng cấu hình phòng, dùng để lấy danh sách phòng khi gọi theo officeId (tuỳ chọn)
+ROOM_CONFIG_TABLE_NAME = os.environ.get('ROOM_CONFIG_TABLE')
+# Danh sách phòng của office ít thay đổi: giữ trong container ấm giữa các lần poll dashboard
+office_rooms_cache = TTLCache('officeRooms', ttl_seconds=int(os.environ.get('OFFICE_ROOMS_CACHE_TTL_SECONDS', '60')))
+
+class ThreadTables(threading.local):
+    """
+    DynamoDB tables of the current thread
+    boto3 resource (và Table) không thread-safe: mỗi thread tạo resource riêng từ session riêng
+    """
+
+    def __init__(self):
+        dynamodb = boto3.session.Session().resource('dynamodb')
+        self.table = dynamodb.Table(TABLE_NAME)
+        self.rollup_table = dynamodb.Table(ROLLUP_TABLE_NAME) if ROLLUP_TABLE_NAME else None
+        self.bucket_table = dynamodb.Table(BUCKET_TABLE_NAME) if BUCKET_TABLE_NAME else None
+        self.latest_table = dynamodb.Table(LATEST_TABLE_NAME) if LATEST_TABLE_NAME else None
+        self.room_config_table = dynamodb.Table(ROOM_CONFIG_TABLE_NAME) if ROOM_CONFIG_TABLE_NAME else None
+
+tables = ThreadTables()
+
+# Giới hạn số item mỗi trang để response và bộ nhớ Lambda không tăng theo độ dài khoảng thời gian
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+# Downsampling: trả về tối đa N điểm mỗi metric cho bất kỳ khoảng thời gian nào
+METRICS = ('temperature', 'humidity', 'light')
+# Đơn vị của từng series, trả về một lần trong response thay vì lặp lại trên mỗi dòng
+UNITS = {
+    'temperature': '°C',
+    'humidity': '%',
+    'light': 'lux'
+}
+DOWNSAMPLE_MODES = ('bucket', 'lttb')
+# fill=step dựng lại chuỗi bậc thang cho dữ liệu đã nén deadband (bucket rỗng = giá trị không đổi)
+FILL_MODES = ('none', 'step')
+DEFAULT_POINTS = 300
+MAX_POINTS = 2000
+# Rollup từ thô đến mịn: (tên, độ dài bucket tính bằng giây)
+ROLLUP_GRANULARITIES = (('1d', 86400), ('1h', 3600), ('1m', 60))
+# Item coverage của SmartOfficeSensorRollup (bucketStart = -1) và TTL của rollup theo phút (khớp với Lambda đó)
+ROLLUP_COVERAGE_BUCKET = -1
+MINUTE_ROLLUP_TTL_DAYS = int(os.environ.get('MINUTE_ROLLUP_TTL_DAYS', '14'))
+# Batch nhiều phòng: số phòng tối đa mỗi request và số query DynamoDB chạy song song
+MAX_BATCH_ROOMS = 100
+MAX_WORKERS = int(os.environ.get('SENSOR_QUERY_WORKERS', '16'))
+# Pool sống cùng container: thread (và resource DynamoDB của nó) được dùng lại giữa các lần gọi
+room_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+# Polling tăng dần (since): chu kỳ gửi mặc định của thiết bị và giới hạn thời gian chờ gợi ý
+REPORT_INTERVAL_SECONDS = int(os.environ.get('SENSOR_REPORT_INTERVAL', '60'))
+POLL_GRACE_SECONDS = 5
+MIN_POLL_SECONDS = 5
+MAX_POLL_SECONDS = 300
+# Định dạng response: rows (mặc định) hoặc columnar (mảng song song, timestamp mã hoá delta)
+RESPONSE_FORMATS = ('rows', 'columnar')
+# Chỉ nén body lớn hơn ngưỡng này khi client gửi Accept-Encoding
+MIN_COMPRESS_BYTES = 1024
+NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -14,6 +100,797 @@ class DecimalEncoder(json.JSONEncoder):
             return int(obj) if obj % 1 == 0 else float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+archive_store = ArchiveStore(ARCHIVE_URI) if ARCHIVE_URI else None
+archive_manifests = TTLCache('archiveManifests', ttl_seconds=ARCHIVE_MANIFEST_TTL_SECONDS)
+
+def parse_timestamp(value, name):
+    """Parse a Unix timestamp (seconds) query parameter into a Decimal"""
+    if value in (None, ''):
+        return None
+    try:
+        timestamp = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f'Invalid "{name}" timestamp: {value}')
+    if not timestamp.is_finite():
+        raise ValueError(f'Invalid "{name}" timestamp: {value}')
+    return timestamp
+
+def encode_cursor(last_evaluated_key):
+    """Encode LastEvaluatedKey into an opaque URL-safe cursor"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, cls=DecimalEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, room_id):
+    """Decode a cursor back into an ExclusiveStartKey for the given room"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        start_key = json.loads(raw, parse_float=Decimal)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(start_key, dict) or start_key.get('roomId') != room_id:
+        raise ValueError('Cursor does not belong to this roomId')
+    return start_key
+
+def parse_positive_int(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid "{name}": {value}')
+    if number <= 0:
+        raise ValueError(f'"{name}" must be a positive integer')
+    return number
+
+def to_number(value):
+    """Convert a stored reading ('25.68 °C', Decimal, int) to float, None if not numeric"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (Decimal, int, float)):
+        return float(value)
+    match = NUMBER_PATTERN.search(str(value))
+    return float(match.group()) if match else None
+
+def normalize_items(items):
+    """Serve numeric readings: legacy rows stored as '25.68 °C' strings are parsed once here"""
+    for item in items:
+        for metric in METRICS:
+            value = item.get(metric)
+            if isinstance(value, str):
+                item[metric] = to_number(value)
+    return items
+
+def parse_metrics(params):
+    """Requested subset of METRICS from `metrics` (or `fields`), in METRICS order"""
+    raw = params.get('metrics') or params.get('fields')
+    if not raw:
+        return METRICS
+    requested = {value.strip() for value in raw.split(',') if value.strip()}
+    unknown = requested - set(METRICS)
+    if unknown:
+        raise ValueError(f'Invalid metrics: {", ".join(sorted(unknown))}. Expected any of {", ".join(METRICS)}')
+    return tuple(metric for metric in METRICS if metric in requested)
+
+def select_units(metrics):
+    return {metric: UNITS[metric] for metric in metrics}
+
+def projection(attributes):
+    """ProjectionExpression kwargs; mọi tên đều qua placeholder vì `timestamp` là từ khoá của DynamoDB"""
+    names = {f'#p{index}': name for index, name in enumerate(attributes)}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+
+def extract_series(items, metric):
+    """Return parallel (timestamps, values) lists for one metric, skipping missing readings"""
+    timestamps = []
+    values = []
+    for item in items:
+        value = to_number(item.get(metric))
+        if value is not None:
+            timestamps.append(item['timestamp'])
+            values.append(value)
+    return timestamps, values
+
+def build_bucket_series(start, width, mins, maxs, sums, counts, lasts=None, fill=None):
+    """
+    Emit buckets as parallel timestamp/min/max/avg/count arrays
+    fill='step': bucket rỗng giữ giá trị cuối của bucket trước (dữ liệu đã nén deadband), count = 0
+    """
+    series = {'timestamp': [], 'min': [], 'max': [], 'avg': [], 'count': []}
+    carry = None
+    for index in range(len(counts)):
+        if not counts[index]:
+            if fill != 'step' or carry is None:
+                continue
+            low = high = avg = carry
+        else:
+            low = mins[index]
+            high = maxs[index]
+            avg = round(sums[index] / counts[index], 3)
+            carry = lasts[index] if lasts else avg
+        series['timestamp'].append(start + index * width)
+        series['min'].append(low)
+        series['max'].append(high)
+        series['avg'].append(avg)
+        series['count'].append(counts[index])
+    return series
+
+def bucket_aggregate(timestamps, values, start, width, bucket_count, fill=None):
+    """Fixed-width buckets with min/max/avg/count, computed in one pass over the series"""
+    mins = [math.inf] * bucket_count
+    maxs = [-math.inf] * bucket_count
+    sums = [0.0] * bucket_count
+    counts = [0] * bucket_count
+    lasts = [None] * bucket_count
+
+    for timestamp, value in zip(timestamps, values):
+        index = min(max(int((timestamp - start) // width), 0), bucket_count - 1)
+        if value < mins[index]:
+            mins[index] = value
+        if value > maxs[index]:
+            maxs[index] = value
+        sums[index] += value
+        counts[index] += 1
+        lasts[index] = value
+
+    return build_bucket_series(start, width, mins, maxs, sums, counts, lasts, fill)
+
+def pick_rollup(width):
+    """Coarsest rollup granularity that is still at least as fine as the requested bucket width"""
+    for granularity, seconds in ROLLUP_GRANULARITIES:
+        if seconds <= width:
+            return granularity, seconds
+    return None, None
+
+def aggregate_rollups(rollups, metric, start, width, bucket_count, fill=None, raw_items=()):
+    """
+    Merge pre-aggregated rollup items into fixed-width buckets with min/max/avg/count
+    raw_items: bản ghi gốc của phần cửa sổ chưa có rollup, cộng dồn vào cùng các bucket
+    """
+    mins = [math.inf] * bucket_count
+    maxs = [-math.inf] * bucket_count
+    sums = [0.0] * bucket_count
+    counts = [0] * bucket_count
+
+    for rollup in rollups:
+        count = int(rollup.get(f'{metric}Count', 0))
+        if not count:
+            continue
+        index = min(max(int((rollup['bucketStart'] - start) // width), 0), bucket_count - 1)
+        mins[index] = min(mins[index], float(rollup[f'{metric}Min']))
+        maxs[index] = max(maxs[index], float(rollup[f'{metric}Max']))
+        sums[index] += float(rollup[f'{metric}Sum'])
+        counts[index] += count
+
+    for timestamp, value in zip(*extract_series(raw_items, metric)):
+        index = min(max(int((timestamp - start) // width), 0), bucket_count - 1)
+        mins[index] = min(mins[index], value)
+        maxs[index] = max(maxs[index], value)
+        sums[index] += value
+        counts[index] += 1
+
+    return build_bucket_series(start, width, mins, maxs, sums, counts, fill=fill)
+
+def rollup_coverage_start(room_id, granularity, seconds):
+    """First bucket from which the rollups of a room are complete, None when there is no rollup yet"""
+    item = tables.rollup_table.get_item(
+        Key={'rollupKey': f'{room_id}#{granularity}', 'bucketStart': ROLLUP_COVERAGE_BUCKET}
+    ).get('Item')
+    if not item:
+        return None
+    coverage_start = int(item['coverageStart'])
+    if granularity == '1m' and MINUTE_ROLLUP_TTL_DAYS > 0:
+        # Rollup theo phút cũ hơn TTL đã (hoặc sắp) bị xoá
+        horizon = int(time.time()) - MINUTE_ROLLUP_TTL_DAYS * 86400
+        coverage_start = max(coverage_start, horizon - horizon % seconds + seconds)
+    return coverage_start
+
+def downsample_from_rollups(room_id, points, resolution, start, end, fill=None, metrics=METRICS):
+    """
+    Bucket mode served from the rollup table instead of raw rows
+    Chỉ dùng các bucket rollup nằm trọn trong [start, end); phần đầu cửa sổ trước coverage của rollup
+    (trước khi triển khai, hoặc đã hết TTL) và hai bucket lẻ ở hai đầu được đọc từ bản ghi gốc
+    Return (series, bucket_seconds, granularity, rollup_count, raw_count) or None when no rollup applies
+    """
+    if tables.rollup_table is None:
+        return None
+
+    first = math.floor(start)
+    last = math.ceil(end)
+    span = max(last - first, 1)
+    width = max(resolution or 0, math.ceil(span / points))
+    granularity, seconds = pick_rollup(width)
+    if not granularity:
+        return None
+
+    covered_from = rollup_coverage_start(room_id, granularity, seconds)
+    if covered_from is None:
+        return None
+    rollup_start = max(math.ceil(start / seconds) * seconds, covered_from)
+    rollup_end = math.floor(end / seconds) * seconds
+    if rollup_end <= rollup_start:
+        return None
+
+    key_condition = Key('rollupKey').eq(f'{room_id}#{granularity}') & \
+        Key('bucketStart').between(rollup_start, rollup_end - seconds)
+    attributes = ['bucketStart'] + [f'{metric}{part}' for metric in metrics for part in ('Min', 'Max', 'Sum', 'Count')]
+    rollups = query_window(key_condition, tables.rollup_table, projection(attributes))
+
+    raw_items = []
+    if rollup_start > start:
+        head_items, _ = read_readings(room_id, start, rollup_start, metrics=metrics)
+        raw_items = [item for item in head_items if item['timestamp'] < rollup_start]
+    # Cửa sổ gồm cả `end` giống đường raw
+    tail_items, _ = read_readings(room_id, rollup_end, end, metrics=metrics)
+    raw_items.extend(tail_items)
+
+    bucket_count = max(math.ceil(span / width), 1)
+    series = {
+        metric: aggregate_rollups(rollups, metric, first, width, bucket_count, fill, raw_items)
+        for metric in metrics
+    }
+    return series, width, granularity, len(rollups), len(raw_items)
+
+def lttb(timestamps, values, threshold):
+    """
+    Largest-Triangle-Three-Buckets: keep `threshold` points that preserve the visual shape
+    Tính toán trên float nhưng trả về timestamp gốc ở mọi nhánh
+    """
+    length = len(values)
+    if threshold >= length:
+        return {'timestamp': list(timestamps), 'value': list(values)}
+
+    original = timestamps
+    timestamps = [float(timestamp) for timestamp in original]
+    sampled = [0]
+    if threshold < 3:
+        # Không đủ điểm cho một tam giác: giữ điểm đầu (và điểm cuối khi threshold = 2)
+        if threshold == 2:
+            sampled.append(length - 1)
+        return {'timestamp': [original[i] for i in sampled], 'value': [values[i] for i in sampled]}
+
+    every = (length - 2) / (threshold - 2)
+    selected = 0
+
+    for i in range(threshold - 2):
+        # Điểm trung bình của bucket kế tiếp
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, length)
+        span = next_end - next_start
+        avg_x = sum(timestamps[next_start:next_end]) / span
+        avg_y = sum(values[next_start:next_end]) / span
+
+        # Chọn điểm trong bucket hiện tại tạo tam giác lớn nhất
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        point_x = timestamps[selected]
+        point_y = values[selected]
+        max_area = -1.0
+        for j in range(range_start, range_end):
+            area = abs((point_x - avg_x) * (values[j] - point_y) - (point_x - timestamps[j]) * (avg_y - point_y))
+            if area > max_area:
+                max_area = area
+                next_selected = j
+        sampled.append(next_selected)
+        selected = next_selected
+
+    sampled.append(length - 1)
+    return {'timestamp': [original[i] for i in sampled], 'value': [values[i] for i in sampled]}
+
+def downsample(items, mode, points, resolution, start, end, fill=None, metrics=METRICS):
+    """Reduce raw readings to at most `points` points per metric"""
+    if not items:
+        return {}, None
+
+    first = math.floor(start if start is not None else items[0]['timestamp'])
+    last = math.ceil(end if end is not None else items[-1]['timestamp'])
+    span = max(last - first, 1)
+
+    result = {}
+    if mode == 'lttb':
+        for metric in metrics:
+            timestamps, values = extract_series(items, metric)
+            result[metric] = lttb(timestamps, values, points)
+        return result, None
+
+    # Độ rộng bucket: theo resolution (giây) nhưng không vượt quá `points` bucket
+    width = max(resolution or 0, math.ceil(span / points))
+    bucket_count = max(math.ceil(span / width), 1)
+    for metric in metrics:
+        timestamps, values = extract_series(items, metric)
+        result[metric] = bucket_aggregate(timestamps, values, first, width, bucket_count, fill)
+    return result, width
+
+def query_window(key_condition, source_table, extra_kwargs=None):
+    """Read every item of a time window, following LastEvaluatedKey"""
+    items = []
+    query_kwargs = {'KeyConditionExpression': key_condition, 'ScanIndexForward': True, **(extra_kwargs or {})}
+    while True:
+        response = source_table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return items
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+def build_key_condition(room_id, start, end):
+    condition = Key('roomId').eq(room_id)
+    if start is not None and end is not None:
+        return condition & Key('timestamp').between(start, end)
+    if start is not None:
+        return condition & Key('timestamp').gte(start)
+    if end is not None:
+        return condition & Key('timestamp').lte(end)
+    return condition
+
+def unpack_bucket(bucket, metrics=METRICS):
+    """Expand one packed bucket item into per-reading dicts"""
+    base = bucket['bucketStart']
+    columns = [bucket.get(metric) or [] for metric in metrics]
+    readings = []
+    for index, offset in enumerate(bucket.get('ts', [])):
+        reading = {'roomId': bucket['roomId'], 'timestamp': base + offset}
+        for metric, column in zip(metrics, columns):
+            if index < len(column) and column[index] is not None:
+                reading[metric] = column[index]
+        readings.append(reading)
+    return readings
+
+def in_bounds(timestamp, start, end, ascending, after):
+    if start is not None and timestamp < start:
+        return False
+    if end is not None and timestamp > end:
+        return False
+    if after is not None:
+        return timestamp > after if ascending else timestamp < after
+    return True
+
+def read_bucket_readings(room_id, start, end, limit, ascending, after, metrics=METRICS):
+    """
+    Readings from packed bucket items, sliced to the window
+    Return (readings, has_more); stops once `limit` readings are collected from whole buckets
+    """
+    # Bucket chứa bản ghi tại `start` có bucketStart <= start nên lùi cận dưới về đầu bucket
+    lower = start
+    if ascending and after is not None:
+        lower = after if lower is None else max(lower, after)
+    upper = end
+    if not ascending and after is not None:
+        upper = after if upper is None else min(upper, after)
+
+    condition = Key('roomId').eq(room_id)
+    if lower is not None and upper is not None:
+        condition = condition & Key('bucketStart').between(lower - lower % BUCKET_SECONDS, upper)
+    elif lower is not None:
+        condition = condition & Key('bucketStart').gte(lower - lower % BUCKET_SECONDS)
+    elif upper is not None:
+        condition = condition & Key('bucketStart').lte(upper)
+
+    readings = []
+    query_kwargs = {'KeyConditionExpression': condition, 'ScanIndexForward': ascending}
+    if metrics != METRICS:
+        query_kwargs.update(projection(['roomId', 'bucketStart', 'ts', *metrics]))
+    while True:
+        response = tables.bucket_table.query(**query_kwargs)
+        for bucket in response.get('Items', []):
+            readings.extend(
+                reading for reading in unpack_bucket(bucket, metrics)
+                if in_bounds(reading['timestamp'], start, end, ascending, after)
+            )
+            if limit and len(readings) >= limit:
+                return readings, True
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return readings, False
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+def day_key(day_start):
+    return datetime.fromtimestamp(day_start, tz=timezone.utc).strftime('%Y-%m-%d')
+
+def load_archive_manifest(room_id):
+    """{'firstDay', 'archivedThrough'} of the room's archive, cached briefly per container"""
+    return archive_manifests.get_or_load(room_id, read_archive_manifest)
+
+def read_archive_manifest(room_id):
+    raw = archive_store.get(f'{room_id}/manifest.json')
+    # {} (không phải None) để phòng chưa có archive cũng được cache
+    return json.loads(raw) if raw else {}
+
+def load_archive_day(room_id, day_start, metrics=METRICS):
+    """Readings of one archived room-day, oldest first"""
+    raw = archive_store.get(f'{room_id}/{day_key(day_start)}.json.gz')
+    if not raw:
+        return []
+    segment = json.loads(gzip.decompress(raw), parse_float=Decimal)
+    readings = []
+    for index, timestamp in enumerate(segment['timestamp']):
+        reading = {'roomId': room_id, 'timestamp': timestamp}
+        for metric in metrics:
+            value = segment[metric][index]
+            if value is not None:
+                reading[metric] = value
+        readings.append(reading)
+    return readings
+
+def read_archive_readings(room_id, start, end, limit, ascending, after, metrics=METRICS):
+    """
+    Readings from archived day segments, sliced to the window
+    Return (readings, has_more); stops once `limit` readings are collected from whole days
+    """
+    manifest = load_archive_manifest(room_id)
+    if not manifest or not manifest.get('firstDay'):
+        return [], False
+
+    lower = start
+    upper = end
+    if after is not None:
+        if ascending:
+            lower = after if lower is None else max(lower, after)
+        else:
+            upper = after if upper is None else min(upper, after)
+
+    first_day = calendar.timegm(datetime.strptime(manifest['firstDay'], '%Y-%m-%d').timetuple())
+    last_day = calendar.timegm(datetime.strptime(manifest['archivedThrough'], '%Y-%m-%d').timetuple())
+    if lower is not None:
+        first_day = max(first_day, int(lower) - int(lower) % DAY_SECONDS)
+    if upper is not None:
+        last_day = min(last_day, int(upper) - int(upper) % DAY_SECONDS)
+
+    days = list(range(first_day, last_day + 1, DAY_SECONDS))
+    if not ascending:
+        days.reverse()
+
+    readings = []
+    for day in days:
+        day_readings = load_archive_day(room_id, day, metrics)
+        if not ascending:
+            day_readings.reverse()
+        readings.extend(
+            reading for reading in day_readings
+            if in_bounds(reading['timestamp'], start, end, ascending, after)
+        )
+        if limit and len(readings) >= limit:
+            return readings, True
+    return readings, False
+
+def read_readings(room_id, start=None, end=None, limit=None, ascending=True, after=None, metrics=METRICS):
+    """
+    Raw readings of a room in [start, end], continuing after the `after` timestamp
+    Gộp bản ghi dạng bucket và archive lạnh với các dòng (một bản ghi mỗi item) trong SENSOR_LOG_TABLE
+    Return (items, next_key); next_key has the LastEvaluatedKey shape {'roomId', 'timestamp'}
+    `metrics` chọn một phần các metric, chỉ các thuộc tính đó được đọc từ DynamoDB
+    """
+    query_kwargs = {
+        'KeyConditionExpression': build_key_condition(room_id, start, end),
+        'ScanIndexForward': ascending
+    }
+    if metrics != METRICS:
+        query_kwargs.update(projection(['roomId', 'timestamp', *metrics]))
+    if limit:
+        query_kwargs['Limit'] = limit
+    if after is not None:
+        query_kwargs['ExclusiveStartKey'] = {'roomId': room_id, 'timestamp': after}
+
+    items = []
+    while True:
+        response = tables.table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if limit or not last_key:
+            break
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+    sources = []
+    if tables.bucket_table is not None:
+        sources.append(read_bucket_readings(room_id, start, end, limit, ascending, after, metrics))
+    # Đọc newest-N: bảng nóng đã đủ `limit` bản ghi thì mọi bản ghi archive đều cũ hơn, bỏ qua archive
+    if archive_store is not None and (ascending or not (limit and last_key)):
+        sources.append(read_archive_readings(room_id, start, end, limit, ascending, after, metrics))
+    if not sources:
+        return items, last_key
+
+    merged = {}
+    for reading in items:
+        merged.setdefault(reading['timestamp'], reading)
+    for extra, _ in sources:
+        for reading in extra:
+            merged.setdefault(reading['timestamp'], reading)
+    readings = [merged[timestamp] for timestamp in sorted(merged, reverse=not ascending)]
+
+    has_more = bool(last_key) or any(more for _, more in sources)
+    if limit and len(readings) > limit:
+        readings = readings[:limit]
+        has_more = True
+    if not has_more or not readings:
+        return readings, None
+    return readings, {'roomId': room_id, 'timestamp': readings[-1]['timestamp']}
+
+def to_columnar(body, metrics=METRICS):
+    """Replace the row list with parallel arrays; timestamps become a start value plus deltas"""
+    data = body.pop('data')
+    timestamps = [item['timestamp'] for item in data]
+    columns = {
+        'timestamp': {
+            'start': timestamps[0] if timestamps else None,
+            'deltas': [current - previous for previous, current in zip(timestamps, timestamps[1:])]
+        }
+    }
+    for metric in metrics:
+        columns[metric] = [item.get(metric) for item in data]
+    body['format'] = 'columnar'
+    body['columns'] = columns
+    return body
+
+def pick_encoding(event):
+    """Choose br or gzip from the request's Accept-Encoding header"""
+    request_headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+    accepted = set()
+    for token in (request_headers.get('accept-encoding') or '').split(','):
+        name, _, quality = token.strip().partition(';')
+        if quality.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+def success_response(body, headers, event):
+    """Serialize a 200 response, compressing the body when the client accepts it"""
+    payload = json.dumps(body, cls=DecimalEncoder, separators=(',', ':'))
+    encoding = pick_encoding(event)
+    if not encoding or len(payload) < MIN_COMPRESS_BYTES:
+        return {'statusCode': 200, 'headers': headers, 'body': payload}
+
+    raw = payload.encode('utf-8')
+    compressed = brotli.compress(raw) if encoding == 'br' else gzip.compress(raw)
+    return {
+        'statusCode': 200,
+        'headers': {**headers, 'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'},
+        'body': base64.b64encode(compressed).decode('ascii'),
+        'isBase64Encoded': True
+    }
+
+def parse_query_options(params):
+    """Validate the query parameters shared by single-room and batch requests"""
+    try:
+        limit = int(params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError(f"Invalid limit: {params.get('limit')}")
+
+    since = parse_timestamp(params.get('since'), 'since')
+    start = parse_timestamp(params.get('from'), 'from')
+    end = parse_timestamp(params.get('to'), 'to')
+    if start is not None and end is not None and start > end:
+        raise ValueError('"from" must not be greater than "to"')
+
+    mode = params.get('mode') or 'bucket'
+    if mode not in DOWNSAMPLE_MODES:
+        raise ValueError(f'Invalid mode: {mode}. Expected one of {", ".join(DOWNSAMPLE_MODES)}')
+
+    fill = params.get('fill') or 'none'
+    if fill not in FILL_MODES:
+        raise ValueError(f'Invalid fill: {fill}. Expected one of {", ".join(FILL_MODES)}')
+
+    response_format = params.get('format') or 'rows'
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f'Invalid format: {response_format}. Expected one of {", ".join(RESPONSE_FORMATS)}')
+
+    return {
+        'limit': max(1, min(limit, MAX_LIMIT)),
+        'since': since,
+        'start': start,
+        'end': end,
+        'points': parse_positive_int(params.get('points'), 'points'),
+        'resolution': parse_positive_int(params.get('resolution'), 'resolution'),
+        'mode': mode,
+        'fill': fill,
+        'source': params.get('source'),
+        'cursor': params.get('cursor'),
+        'format': response_format,
+        'metrics': parse_metrics(params)
+    }
+
+def get_recent_readings(room_id, limit, metrics=METRICS):
+    """
+    Newest `limit` readings from the room's ring-buffer item with a single GetItem
+    Return None when the buffer is missing or too short to answer the request
+    """
+    response = tables.latest_table.get_item(Key={'roomId': room_id}, ProjectionExpression='readings')
+    readings = response.get('Item', {}).get('readings') or []
+    # Buffer ngắn hơn limit (phòng mới hoặc buffer mới bật): để query bảng log trả lời
+    if len(readings) < limit:
+        return None
+
+    # Ingest theo lô có thể nối bản ghi không đúng thứ tự thời gian
+    readings = sorted(readings, key=lambda entry: entry[0])[-limit:]
+    items = []
+    for entry in readings:
+        item = {'roomId': room_id, 'timestamp': entry[0]}
+        for metric, value in zip(METRICS, entry[1:]):
+            if value is not None and metric in metrics:
+                item[metric] = value
+        items.append(item)
+
+    # Cursor trỏ tới bản ghi cũ nhất, giống LastEvaluatedKey của query giảm dần
+    return {
+        'roomId': room_id,
+        'units': select_units(metrics),
+        'data_count': len(items),
+        'data': items,
+        'nextCursor': encode_cursor({'roomId': room_id, 'timestamp': readings[0][0]})
+    }
+
+def suggest_next_poll(watermark, timestamps):
+    """
+    Seconds until the next reading is expected, from the observed reporting interval
+    Thiết bị trễ hơn dự kiến thì quay về chu kỳ bình thường thay vì poll dồn dập
+    """
+    deltas = [float(current - previous) for previous, current in zip(timestamps, timestamps[1:]) if current > previous]
+    interval = statistics.median(deltas) if deltas else REPORT_INTERVAL_SECONDS
+
+    wait = float(watermark) + interval + POLL_GRACE_SECONDS - time.time()
+    if wait <= 0:
+        wait = interval
+    return int(min(max(wait, MIN_POLL_SECONDS), MAX_POLL_SECONDS))
+
+def get_new_readings(room_id, since, limit, metrics=METRICS):
+    """Readings strictly newer than `since`, oldest first, with a watermark for the next poll"""
+    items, next_key = read_readings(room_id, limit=limit, ascending=True, after=since, metrics=metrics)
+    items = normalize_items(items)
+    has_more = next_key is not None
+    watermark = items[-1]['timestamp'] if items else since
+
+    return {
+        'roomId': room_id,
+        'units': select_units(metrics),
+        'data_count': len(items),
+        'data': items,
+        'watermark': watermark,
+        'hasMore': has_more,
+        # Còn dữ liệu thì gọi lại ngay với since = watermark
+        'nextPollSeconds': 0 if has_more else suggest_next_poll(watermark, [since] + [item['timestamp'] for item in items])
+    }
+
+def expand_steps(items):
+    """
+    Step series for deadband-compressed rows: before each reading, repeat the previous
+    values at the new timestamp so line charts draw a hold followed by a jump
+    """
+    expanded = []
+    previous = None
+    for item in items:
+        if previous is not None:
+            hold = {key: value for key, value in previous.items() if key in METRICS}
+            if any(item.get(metric) != value for metric, value in hold.items()):
+                expanded.append({'roomId': item['roomId'], 'timestamp': item['timestamp'], **hold, 'filled': True})
+        expanded.append(item)
+        previous = item
+    return expanded
+
+def get_room_data(room_id, options):
+    """Query one room's readings and return the response body as a dict"""
+    body = query_room_data(room_id, options)
+    if options['fill'] == 'step' and 'data' in body:
+        body['data'] = expand_steps(body['data'])
+        body['data_count'] = len(body['data'])
+    if options['format'] == 'columnar' and 'data' in body:
+        return to_columnar(body, options['metrics'])
+    return body
+
+def query_room_data(room_id, options):
+    if options['since'] is not None:
+        return get_new_readings(room_id, options['since'], options['limit'], options['metrics'])
+
+    start = options['start']
+    end = options['end']
+    limit = options['limit']
+    mode = options['mode']
+    metrics = options['metrics']
+
+    # Có from/to: đọc theo thứ tự thời gian tăng dần để phân trang qua cả khoảng
+    # Không có: giữ hành vi cũ, lấy các bản ghi mới nhất
+    is_range = start is not None or end is not None
+
+    if options['points'] or options['resolution']:
+        points = min(options['points'] or DEFAULT_POINTS, MAX_POINTS)
+        resolution = options['resolution']
+
+        # Khoảng thời gian đủ dài: đọc rollup thô nhất thay vì hàng nghìn bản ghi gốc
+        rollup = None
+        if mode == 'bucket' and start is not None and end is not None and options['source'] != 'raw':
+            rollup = downsample_from_rollups(room_id, points, resolution, start, end, options['fill'], metrics)
+        if rollup:
+            series, bucket_seconds, granularity, rollup_count, raw_count = rollup
+            return {
+                'roomId': room_id,
+                'mode': mode,
+                'source': f'rollup:{granularity}' + ('+raw' if raw_count else ''),
+                'points': points,
+                'bucketSeconds': bucket_seconds,
+                'units': select_units(metrics),
+                'data_count': rollup_count + raw_count,
+                'series': series
+            }
+
+        # Downsampling cần toàn bộ khoảng thời gian nên không dùng cursor
+        if is_range:
+            items, _ = read_readings(room_id, start, end, metrics=metrics)
+        else:
+            items, _ = read_readings(room_id, limit=limit, ascending=False, metrics=metrics)
+            items.reverse()
+
+        series, bucket_seconds = downsample(items, mode, points, resolution, start, end, options['fill'], metrics)
+        return {
+            'roomId': room_id,
+            'mode': mode,
+            'source': 'raw',
+            'points': points,
+            'bucketSeconds': bucket_seconds,
+            'units': select_units(metrics),
+            'data_count': len(items),
+            'series': series
+        }
+
+    # Dashboard mặc định: một GetItem vào ring buffer thay vì query bảng log
+    if tables.latest_table is not None and not is_range and not options['cursor']:
+        recent = get_recent_readings(room_id, limit, metrics)
+        if recent is not None:
+            return recent
+
+    # Query DynamoDB
+    # PK = roomId, SK = timestamp
+    after = None
+    if options['cursor']:
+        after = decode_cursor(options['cursor'], room_id)['timestamp']
+
+    items, next_key = read_readings(room_id, start, end, limit, ascending=is_range, after=after, metrics=metrics)
+
+    # Đảo ngược lại để Chart vẽ từ quá khứ -> hiện tại
+    if not is_range:
+        items.reverse()
+    normalize_items(items)
+
+    return {
+        'roomId': room_id,
+        'units': select_units(metrics),
+        'data_count': len(items),
+        'data': items,
+        'nextCursor': encode_cursor(next_key)
+    }
+
+def list_office_room_ids(office_id):
+    """Room IDs of an office from ROOM_CONFIG_TABLE"""
+    if tables.room_config_table is None:
+        raise ValueError('officeId lookup is not configured (ROOM_CONFIG_TABLE)')
+    return office_rooms_cache.get_or_load(office_id, load_office_room_ids)
+
+def load_office_room_ids(office_id):
+    return [item['roomId'] for item in list_office_rooms(tables.room_config_table, office_id, ['roomId'])]
+
+def get_rooms_data(room_ids, options):
+    """
+    Fan out get_room_data over a bounded thread pool
+    Return (rooms, errors) keyed by roomId so one failing room does not fail the batch
+    """
+    # Cursor chỉ có nghĩa với một phòng
+    options = {**options, 'cursor': None}
+    rooms = {}
+    errors = {}
+
+    # Mỗi worker dùng tables của thread mình (ThreadTables), không dùng chung resource boto3
+    futures = {room_executor.submit(get_room_data, room_id, options): room_id for room_id in room_ids}
+    for future in as_completed(futures):
+        room_id = futures[future]
+        try:
+            rooms[room_id] = future.result()
+        except Exception as e:
+            print(f"Error querying room {room_id}: {e}")
+            errors[room_id] = str(e)
+    return rooms, errors
+
 def lambda_handler(event, context):
     headers = {
         'Access-Control-Allow-Origin': '*',
@@ -28,38 +905,42 @@ def lambda_handler(event, context):
         # Lấy tham số từ URL
         params = event.get('queryStringParameters') or {}
         room_id = params.get('roomId')  # Input bây giờ là roomId
-        limit = int(params.get('limit', 50)) 
+        room_ids = [value.strip() for value in (params.get('roomIds') or '').split(',') if value.strip()]
+        office_id = params.get('officeId')
 
-        if not room_id:
+        if not room_id and not room_ids and not office_id:
             return {
-                'statusCode': 400, 
-                'headers': headers, 
-                'body': json.dumps({'message': 'Missing required parameter: roomId'})
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'message': 'Missing required parameter: roomId, roomIds or officeId'})
             }
 
-        # Query DynamoDB
-        # PK = roomId, SK tự động được dùng để sort
-        response = table.query(
-            KeyConditionExpression=Key('roomId').eq(room_id), # Query đúng PK
-            ScanIndexForward=False, # Lấy mới nhất trước (giảm dần theo timestamp)
-            Limit=limit
-        )
+        options = parse_query_options(params)
 
-        items = response.get('Items', [])
-        
-        # Đảo ngược lại để Chart vẽ từ quá khứ -> hiện tại
-        items.reverse()
+        if room_id:
+            return success_response(get_room_data(room_id, options), headers, event)
 
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({
-                'roomId': room_id,
-                'data_count': len(items),
-                'data': items
-            }, cls=DecimalEncoder)
+        # Batch: nhiều phòng trong một lần gọi (dashboard treo tường)
+        if not room_ids:
+            room_ids = list_office_room_ids(office_id)
+        room_ids = list(dict.fromkeys(room_ids))
+        if len(room_ids) > MAX_BATCH_ROOMS:
+            raise ValueError(f'Too many rooms: {len(room_ids)} (max {MAX_BATCH_ROOMS})')
+
+        rooms, errors = get_rooms_data(room_ids, options) if room_ids else ({}, {})
+
+        body = {
+            'roomCount': len(room_ids),
+            'rooms': rooms,
+            'errors': errors
         }
+        if office_id:
+            body['officeId'] = office_id
+        return success_response(body, headers, event)
+
+    except ValueError as e:
+        return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'message': str(e)})}
 
     except Exception as e:
         print(f"Error: {str(e)}")
-        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'message': str(e)})}
\ No newline at end of file
+        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'message': str(e)})}
@@ -1,12 +1,38 @@
 import boto3
 import json
 import os
+import random
+import re
+import time
 from decimal import Decimal
+from ttl_cache import TTLCache
+from config_profiles import profiles_enabled, resolve_config
 
 # DynamoDB client
 dynamodb = boto3.resource('dynamodb')
 TABLE_NAME = os.environ['ROOM_CONFIG_TABLE']
 table = dynamodb.Table(TABLE_NAME)
+# Giá trị cảm biến hiện tại do SmartOfficeSensorIngest duy trì (tuỳ chọn)
+LATEST_TABLE_NAME = os.environ.get('SENSOR_LATEST_TABLE')
+latest_table = dynamodb.Table(LATEST_TABLE_NAME) if LATEST_TABLE_NAME else None
+# Các field lấy từ bảng cảm biến thay vì từ room config
+CURRENT_READING_FIELDS = ['currentTemperature', 'currentHumidity', 'currentLight', 'lastReadingAt']
+FIELD_PATTERN = re.compile(r'^[A-Za-z][A-Za-z0-9_]*$')
+
+# Batch mode: BatchGetItem nhận tối đa 100 key mỗi lần gọi
+MAX_BATCH_KEYS = 500
+BATCH_GET_SIZE = 100
+MAX_BATCH_ATTEMPTS = 6
+BASE_BACKOFF_SECONDS = 0.05
+MAX_BACKOFF_SECONDS = 2
+
+# Room config trong container ấm; hết TTL thì chỉ đọc lại các attribute phiên bản, đổi mới đọc cả item
+# createdAt phân biệt phòng bị xoá rồi tạo lại; lastSeen đổi khi thiết bị online/offline
+# (SmartOfficeDevicePresence) mà không chạm lastUpdate
+VERSION_ATTRIBUTES = ['createdAt', 'lastUpdate', 'lastSeen']
+# Phiên bản của item không tồn tại: không bằng phiên bản nào nên entry cũ luôn bị đọc lại
+MISSING_VERSION = object()
+config_cache = TTLCache('roomConfig', version_of=lambda item: tuple(item.get(name) for name in VERSION_ATTRIBUTES))
 
 # Helper class to convert Decimal to int/float for JSON serialization
 class DecimalEncoder(json.JSONEncoder):
@@ -15,12 +41,188 @@ class DecimalEncoder(json.JSONEncoder):
             return int(obj) if obj % 1 == 0 else float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+def parse_fields(value):
+    """Sparse fieldset from `fields=a,b,c`; None means every attribute"""
+    if not value:
+        return None
+    fields = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    for field in fields:
+        if not FIELD_PATTERN.match(field):
+            raise ValueError(f'Invalid field: {field}')
+    return fields
+
+def projection(attributes):
+    """ProjectionExpression kwargs with placeholders so reserved words are safe"""
+    names = {f'#p{index}': name for index, name in enumerate(attributes)}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+
+def select_fields(item, fields):
+    """Trim a full cached item to the requested fields (roomId is kept for the caller)"""
+    if fields is None:
+        return item
+    return {key: value for key, value in item.items() if key == 'roomId' or key in fields}
+
+def load_room_config(key):
+    room_id, office_id = key
+    return table.get_item(Key={'roomId': room_id, 'officeId': office_id}).get('Item')
+
+def read_config_version(key):
+    room_id, office_id = key
+    response = table.get_item(Key={'roomId': room_id, 'officeId': office_id}, **projection(['roomId'] + VERSION_ATTRIBUTES))
+    if 'Item' not in response:
+        return MISSING_VERSION
+    return tuple(response['Item'].get(name) for name in VERSION_ATTRIBUTES)
+
+def get_room_config(room_id, office_id, fields=None):
+    """Room config item (None if missing); served from the warm-container cache when enabled"""
+    if config_cache.enabled:
+        item = config_cache.get_or_load((room_id, office_id), load_room_config, read_config_version)
+        return select_fields(item, fields) if item is not None else None
+
+    get_kwargs = {
+        'Key': {
+            'roomId': room_id,
+            'officeId': office_id
+        }
+    }
+    if fields is not None:
+        # roomId luôn được đọc để phân biệt item rỗng với item không tồn tại
+        config_fields = [field for field in fields if field not in CURRENT_READING_FIELDS]
+        get_kwargs.update(projection(['roomId'] + [field for field in config_fields if field != 'roomId']))
+    return table.get_item(**get_kwargs).get('Item')
+
+def get_current_readings(room_id, fields=None):
+    """Latest temperature/humidity/light of the room from the sensor ring-buffer item"""
+    if latest_table is None:
+        return {}
+    attributes = [field for field in CURRENT_READING_FIELDS if fields is None or field in fields]
+    if not attributes:
+        return {}
+    try:
+        response = latest_table.get_item(
+            Key={'roomId': room_id},
+            ProjectionExpression=', '.join(attributes)
+        )
+        return response.get('Item', {})
+    except Exception as e:
+        print(f"Warning: Could not fetch current readings: {e}")
+        return {}
+
+def backoff(attempt):
+    """Exponential backoff with full jitter"""
+    time.sleep(random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)))
+
+def batch_get(table_name, keys, extra=None):
+    """
+    BatchGetItem in chunks of 100, retrying UnprocessedKeys with backoff
+    Return (items, unprocessed_keys)
+    """
+    items = []
+    unprocessed = []
+    for index in range(0, len(keys), BATCH_GET_SIZE):
+        pending = {table_name: {'Keys': keys[index:index + BATCH_GET_SIZE], **(extra or {})}}
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            response = dynamodb.batch_get_item(RequestItems=pending)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            pending = response.get('UnprocessedKeys') or {}
+            if not pending or attempt == MAX_BATCH_ATTEMPTS - 1:
+                break
+            backoff(attempt)
+        if pending:
+            unprocessed.extend(pending[table_name]['Keys'])
+    return items, unprocessed
+
+def parse_batch_keys(event):
+    """
+    Keys for batch mode: ?officeId=...&roomIds=a,b,c hoặc body {"keys": [{"roomId", "officeId"}]}
+    Return None when the request is a single-room request
+    """
+    params = event.get('queryStringParameters') or {}
+    if params.get('roomIds'):
+        office_id = params.get('officeId')
+        if not office_id:
+            raise ValueError('Missing required parameter: officeId')
+        room_ids = [value.strip() for value in params['roomIds'].split(',') if value.strip()]
+        keys = [{'roomId': room_id, 'officeId': office_id} for room_id in room_ids]
+    elif event.get('body'):
+        body = json.loads(event['body'])
+        if 'keys' not in body:
+            return None
+        keys = body['keys']
+        if not isinstance(keys, list) or not all(
+                isinstance(key, dict) and key.get('roomId') and key.get('officeId') for key in keys):
+            raise ValueError('"keys" must be a list of {roomId, officeId}')
+        keys = [{'roomId': key['roomId'], 'officeId': key['officeId']} for key in keys]
+    else:
+        return None
+
+    # BatchGetItem từ chối key trùng lặp
+    keys = list({(key['roomId'], key['officeId']): key for key in keys}.values())
+    if not keys:
+        raise ValueError('No keys given')
+    if len(keys) > MAX_BATCH_KEYS:
+        raise ValueError(f'Too many keys: {len(keys)} (max {MAX_BATCH_KEYS})')
+    return keys
+
+def get_room_configs(keys, fields=None):
+    """Configs of many rooms keyed by roomId, with current readings merged in like the single-room GET"""
+    configs = {}
+    missing = keys
+    extra = None
+    if config_cache.enabled:
+        # Cache giữ item đầy đủ nên phần còn thiếu cũng được đọc đầy đủ
+        missing = []
+        for key in keys:
+            item = config_cache.get((key['roomId'], key['officeId']))
+            if item is None:
+                missing.append(key)
+            else:
+                configs[item['roomId']] = select_fields(item, fields)
+    elif fields is not None:
+        # roomId luôn được đọc để gắn item với phòng
+        config_fields = [field for field in fields if field not in CURRENT_READING_FIELDS and field != 'roomId']
+        extra = projection(['roomId'] + config_fields)
+
+    items, unprocessed = batch_get(TABLE_NAME, missing, extra) if missing else ([], [])
+    for item in items:
+        if config_cache.enabled:
+            config_cache.put((item['roomId'], item['officeId']), item)
+            item = select_fields(item, fields)
+        configs[item['roomId']] = item
+
+    attributes = [field for field in CURRENT_READING_FIELDS if fields is None or field in fields]
+    if latest_table is not None and attributes and configs:
+        readings, _ = batch_get(
+            LATEST_TABLE_NAME,
+            [{'roomId': room_id} for room_id in configs],
+            projection(['roomId'] + attributes)
+        )
+        for reading in readings:
+            configs[reading.pop('roomId')].update(reading)
+
+    if profiles_enabled():
+        offices = {key['roomId']: key['officeId'] for key in keys}
+        configs = {room_id: resolve_config(config, offices[room_id], fields) for room_id, config in configs.items()}
+
+    if fields is not None and 'roomId' not in fields:
+        for config in configs.values():
+            del config['roomId']
+
+    found = set(configs)
+    unprocessed_ids = {key['roomId'] for key in unprocessed}
+    return {
+        'roomCount': len(configs),
+        'rooms': configs,
+        'notFound': [key['roomId'] for key in keys if key['roomId'] not in found and key['roomId'] not in unprocessed_ids],
+        'unprocessed': sorted(unprocessed_ids)
+    }
+
 def lambda_handler(event, context):
     # CORS headers
     headers = {
         'Access-Control-Allow-Origin': '*',
         'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-        'Access-Control-Allow-Methods': 'GET,OPTIONS'
+        'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
     }
     
     # Handle preflight OPTIONS request
@@ -32,14 +234,41 @@ def lambda_handler(event, context):
         }
     
     try:
+        # Batch mode: nhiều phòng trong một lần gọi
+        try:
+            batch_keys = parse_batch_keys(event)
+            batch_fields = parse_fields((event.get('queryStringParameters') or {}).get('fields'))
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': str(e)})
+            }
+        if batch_keys is not None:
+            print(f"Batch getting {len(batch_keys)} room configs")
+            return {
+                'statusCode': 200,
+                'headers': headers,
+                'body': json.dumps(get_room_configs(batch_keys, batch_fields), cls=DecimalEncoder)
+            }
+
         # Extract officeId and roomId from query params, path params, or body
         office_id = None
         room_id = None
+        fields = None
         
         # Try query string parameters first
         if event.get('queryStringParameters'):
             office_id = event['queryStringParameters'].get('officeId')
             room_id = event['queryStringParameters'].get('roomId')
+            try:
+                fields = parse_fields(event['queryStringParameters'].get('fields'))
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': headers,
+                    'body': json.dumps({'error': str(e)})
+                }
         
         # Try path parameters
         if not office_id and event.get('pathParameters'):
@@ -64,15 +293,10 @@ def lambda_handler(event, context):
         
         # Get item from DynamoDB
         print(f"Getting config for officeId={office_id}, roomId={room_id}")
-        response = table.get_item(
-            Key={
-                'roomId': room_id,
-                'officeId': office_id
-            }
-        )
+        room_config = get_room_config(room_id, office_id, fields)
         
         # Check if item exists
-        if 'Item' not in response:
+        if room_config is None:
             return {
                 'statusCode': 404,
                 'headers': headers,
@@ -82,8 +306,14 @@ def lambda_handler(event, context):
             }
         
         # Return the room configuration
-        room_config = response['Item']
-        print(f"Room config found: {room_config}")
+        stats = config_cache.stats()
+        print(f"Room config found: {len(room_config)} attributes (cache hits={stats['hits']}, misses={stats['misses']})")
+        # Cấu hình hiệu lực: field của phòng ghi đè profile office/org và giá trị mặc định
+        if profiles_enabled():
+            room_config = resolve_config(room_config, office_id, fields)
+        if fields is not None and 'roomId' not in fields:
+            del room_config['roomId']
+        room_config.update(get_current_readings(room_id, fields))
         
         return {
             'statusCode': 200,
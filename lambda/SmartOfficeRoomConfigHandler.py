@@ -1,8 +1,14 @@
 import boto3
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from decimal import Decimal
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+from config_profiles import INHERITABLE_FIELDS, normalize_deadband
+from index_query import list_office_rooms
+from schedule_buckets import SCHEDULE_FIELDS, normalize_time, time_bucket
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -17,18 +23,201 @@ class DecimalEncoder(json.JSONEncoder):
 dynamodb = boto3.resource('dynamodb')
 TABLE_NAME = os.environ.get('ROOM_CONFIG_TABLE')
 table = dynamodb.Table(TABLE_NAME)
+# Bulk update chạy trên nhiều thread: resource/Table của boto3 không thread-safe, low-level client thì có
+dynamodb_client = boto3.client('dynamodb')
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
 
-# List of field to update
-ALLOWED_UPDATE_FIELDS = [
-    "temperatureMode",
-    "humidityMode",
-    "lightMode",
-    "targetTemperature",
-    "targetHumidity",
-    "targetLight",
-    "autoOnTime",
-    "autoOffTime"
-]
+# Bulk update: nhiều phòng trong một request
+MAX_BULK_ROOMS = 500
+BULK_WORKERS = int(os.environ.get('ROOM_CONFIG_BULK_WORKERS', '16'))
+# Giới hạn của TransactWriteItems
+MAX_TRANSACTION_ROOMS = 100
+
+# List of field to update: cùng danh sách với field kế thừa từ profile
+ALLOWED_UPDATE_FIELDS = INHERITABLE_FIELDS
+
+def build_update(updates):
+    """
+    Validate `updates` against ALLOWED_UPDATE_FIELDS and build the UpdateItem expression
+    Raise ValueError when a value is invalid or no allowed field is present
+    """
+    update_expression = "SET "
+    expression_names = {}
+    expression_values = {}
+    # null = bỏ giá trị riêng của phòng để kế thừa lại từ profile office/org
+    removed = []
+
+    valid_updates = False
+    for key, value in updates.items():
+        if key not in ALLOWED_UPDATE_FIELDS:
+            continue
+        valid_updates = True
+        placeholder_name = f"#{key}" 
+        expression_names[placeholder_name] = key
+        # Bucket của GSI lịch (xem SmartOfficeScheduler) luôn được ghi cùng với giờ bật/tắt
+        bucket = SCHEDULE_FIELDS.get(key)
+        if bucket:
+            expression_names[f"#{bucket}"] = bucket
+        if value is None:
+            removed.append(placeholder_name)
+            if bucket:
+                removed.append(f"#{bucket}")
+            continue
+        if key == "deadband":
+            value = normalize_deadband(value)
+        placeholder_value = f":{key}"
+        if bucket:
+            value = normalize_time(key, value)
+            update_expression += f"#{bucket} = :{bucket}, "
+            expression_values[f":{bucket}"] = time_bucket(value)
+        
+        update_expression += f"{placeholder_name} = {placeholder_value}, "
+        expression_values[placeholder_value] = value
+
+    if not valid_updates:
+        raise ValueError('No valid field in "updates"')
+
+    # Auto add lastUpdate field
+    current_time_iso = datetime.now(timezone.utc).isoformat()
+    
+    update_expression += "#lastUpdate = :lastUpdate"
+    expression_names["#lastUpdate"] = "lastUpdate"
+    expression_values[":lastUpdate"] = current_time_iso
+    if removed:
+        update_expression += " REMOVE " + ", ".join(removed)
+
+    return {
+        'UpdateExpression': update_expression,
+        'ExpressionAttributeNames': expression_names,
+        'ExpressionAttributeValues': expression_values
+    }
+
+def list_office_room_ids(office_id):
+    """Room IDs of an office from the officeId GSI"""
+    return [item['roomId'] for item in list_office_rooms(table, office_id, ['roomId'])]
+
+def update_room(room_id, office_id, update):
+    """
+    Apply one prepared update to an existing room; return its per-room result
+    Gọi từ thread worker nên đi qua dynamodb_client, tự serialize/deserialize giá trị
+    """
+    try:
+        response = dynamodb_client.update_item(
+            TableName=TABLE_NAME,
+            Key={'roomId': {'S': room_id}, 'officeId': {'S': office_id}},
+            ConditionExpression='attribute_exists(roomId)',
+            ReturnValues="UPDATED_NEW",
+            UpdateExpression=update['UpdateExpression'],
+            ExpressionAttributeNames=update['ExpressionAttributeNames'],
+            ExpressionAttributeValues={
+                placeholder: serializer.serialize(value)
+                for placeholder, value in update['ExpressionAttributeValues'].items()
+            }
+        )
+        attributes = {
+            name: deserializer.deserialize(value)
+            for name, value in (response.get('Attributes') or {}).items()
+        }
+        return {'status': 'updated', 'updatedAttributes': attributes}
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return {'status': 'not_found', 'error': 'No room found with given officeId and roomId'}
+        print(f"Lỗi khi cập nhật phòng {room_id}: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+def update_rooms_atomic(room_ids, office_id, update):
+    """All-or-nothing update of up to MAX_TRANSACTION_ROOMS rooms with TransactWriteItems"""
+    try:
+        dynamodb.meta.client.transact_write_items(TransactItems=[
+            {
+                'Update': {
+                    'TableName': TABLE_NAME,
+                    'Key': {'roomId': room_id, 'officeId': office_id},
+                    'ConditionExpression': 'attribute_exists(roomId)',
+                    **update
+                }
+            }
+            for room_id in room_ids
+        ])
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        # CancellationReasons theo đúng thứ tự TransactItems
+        reasons = e.response.get('CancellationReasons') or []
+        results = {}
+        for index, room_id in enumerate(room_ids):
+            code = reasons[index].get('Code') if index < len(reasons) else None
+            if code == 'ConditionalCheckFailed':
+                results[room_id] = {'status': 'not_found', 'error': 'No room found with given officeId and roomId'}
+            else:
+                results[room_id] = {'status': 'rolled_back', 'error': code if code and code != 'None' else 'Transaction cancelled'}
+        return results
+    return {room_id: {'status': 'updated'} for room_id in room_ids}
+
+def bulk_update(body, headers):
+    """
+    Same change set for many rooms of one office:
+    {"officeId", "roomIds": [...] hoặc "allRooms": true, "updates", "atomic": false}
+    """
+    office_id = body.get('officeId')
+    updates = body.get('updates')
+    if not office_id or not updates or not isinstance(updates, dict):
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': 'Missing \"officeId\" or \"updates\"'})
+        }
+
+    try:
+        update = build_update(updates)
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+    if body.get('allRooms'):
+        room_ids = list_office_room_ids(office_id)
+    else:
+        room_ids = list(dict.fromkeys(body.get('roomIds') or []))
+    if not room_ids:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': 'No rooms to update'})
+        }
+    atomic = bool(body.get('atomic'))
+    max_rooms = MAX_TRANSACTION_ROOMS if atomic else MAX_BULK_ROOMS
+    if len(room_ids) > max_rooms:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': f'Too many rooms: {len(room_ids)} (max {max_rooms})'})
+        }
+
+    if atomic:
+        results = update_rooms_atomic(room_ids, office_id, update)
+    else:
+        with ThreadPoolExecutor(max_workers=min(BULK_WORKERS, len(room_ids))) as executor:
+            outcomes = executor.map(lambda room_id: update_room(room_id, office_id, update), room_ids)
+            results = dict(zip(room_ids, outcomes))
+
+    updated = sum(1 for result in results.values() if result['status'] == 'updated')
+    print(f"Bulk update officeId={office_id}: {updated}/{len(room_ids)} rooms updated")
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps({
+            'message': 'Bulk room config update finished',
+            'officeId': office_id,
+            'requested': len(room_ids),
+            'updated': updated,
+            'failed': len(room_ids) - updated,
+            'results': results
+        }, cls=DecimalEncoder)
+    }
 
 def lambda_handler(event, context):
     # CORS headers
@@ -48,9 +237,13 @@ def lambda_handler(event, context):
     
     try:
         if "body" in event:
-            body = json.loads(event["body"])
+            body = json.loads(event["body"], parse_float=Decimal)
         else:
             body = event
+
+        # Bulk: cùng một bộ thay đổi cho nhiều phòng (hoặc cả văn phòng)
+        if 'roomIds' in body or body.get('allRooms'):
+            return bulk_update(body, headers)
         
         office_id = body.get('officeId')
         room_id = body.get('roomId')
@@ -63,35 +256,15 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'Missing \"officeId\", \"roomId\", or \"updates\"'})
             }
 
-        update_expression = "SET "
-        expression_names = {}
-        expression_values = {}
-
-        valid_updates = False
-        for key, value in updates.items():
-            if key in ALLOWED_UPDATE_FIELDS:
-                valid_updates = True
-                placeholder_name = f"#{key}" 
-                placeholder_value = f":{key}"
-                
-                update_expression += f"{placeholder_name} = {placeholder_value}, "
-                expression_names[placeholder_name] = key
-                expression_values[placeholder_value] = value
-
-        if not valid_updates:
+        try:
+            update = build_update(updates)
+        except ValueError as e:
             return {
                 'statusCode': 400,
                 'headers': headers,
-                'body': json.dumps({'error': 'No valid field in \"updates\"'})
+                'body': json.dumps({'error': str(e)})
             }
 
-        # Auto add lastUpdate field
-        current_time_iso = datetime.now(timezone.utc).isoformat()
-        
-        update_expression += "#lastUpdate = :lastUpdate"
-        expression_names["#lastUpdate"] = "lastUpdate"
-        expression_values[":lastUpdate"] = current_time_iso
-
         key_to_update = {
             'roomId': room_id,      
             'officeId': office_id   
@@ -99,10 +272,8 @@ def lambda_handler(event, context):
 
         response = table.update_item(
             Key=key_to_update,
-            UpdateExpression=update_expression,
-            ExpressionAttributeNames=expression_names,
-            ExpressionAttributeValues=expression_values,
-            ReturnValues="UPDATED_NEW"
+            ReturnValues="UPDATED_NEW",
+            **update
         )
 
         success_body = {
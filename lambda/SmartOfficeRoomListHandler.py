@@ -1,13 +1,20 @@
+import base64
 import boto3
 import json
 import os
+import re
 from decimal import Decimal
-from boto3.dynamodb.conditions import Key # <--- THÊM IMPORT NÀY
+from index_query import OFFICE_INDEX_NAME, list_office_rooms, query_index_page
 
 # DynamoDB client
 dynamodb = boto3.resource('dynamodb')
 TABLE_NAME = os.environ['ROOM_CONFIG_TABLE']
 table = dynamodb.Table(TABLE_NAME)
+# GSI OFFICE_INDEX_NAME trên ROOM_CONFIG_TABLE: PK = officeId, SK = roomId, ProjectionType = ALL
+# DynamoDB tự backfill index cho các item sẵn có (officeId là sort key của bảng nên item nào cũng có);
+# trong lúc index chưa ACTIVE, index_query quay về scan có phân trang
+MAX_PAGE_SIZE = 500
+FIELD_PATTERN = re.compile(r'^[A-Za-z][A-Za-z0-9_]*$')
 
 # Helper class to convert Decimal to int/float for JSON serialization
 class DecimalEncoder(json.JSONEncoder):
@@ -16,6 +23,46 @@ class DecimalEncoder(json.JSONEncoder):
             return int(obj) if obj % 1 == 0 else float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+def parse_fields(value):
+    """Sparse fieldset from `fields=a,b,c`; None means every attribute"""
+    if not value:
+        return None
+    fields = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    for field in fields:
+        if not FIELD_PATTERN.match(field):
+            raise ValueError(f'Invalid field: {field}')
+    # roomId luôn có để client nhận diện từng phòng
+    return ['roomId'] + [field for field in fields if field != 'roomId']
+
+def encode_cursor(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key, cls=DecimalEncoder).encode()).decode()
+
+def decode_cursor(cursor, office_id):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(key, dict) or key.get('officeId') != office_id or 'roomId' not in key:
+        raise ValueError('Cursor does not belong to this office')
+    return key
+
+def list_rooms(office_id, fields=None, limit=None, cursor=None):
+    """
+    Rooms of an office from the officeId GSI
+    Không có limit: đọc hết mọi trang; có limit (hoặc cursor): trả về một trang và key của phòng cuối cùng
+    """
+    if not limit and not cursor:
+        return list_office_rooms(table, office_id, fields), None
+
+    rooms, has_more = query_index_page(
+        table, OFFICE_INDEX_NAME, 'officeId', office_id, limit or MAX_PAGE_SIZE, cursor, fields
+    )
+    # Key của phòng cuối cùng được trả về (không phải LastEvaluatedKey): trang tiếp theo bắt đầu ngay sau nó
+    last_key = {'roomId': rooms[-1]['roomId'], 'officeId': office_id} if has_more and rooms else None
+    return rooms, last_key
+
 def lambda_handler(event, context):
     # CORS headers
     headers = {
@@ -35,6 +82,7 @@ def lambda_handler(event, context):
     try:
         # Extract officeId from query params, path params, or body
         office_id = None
+        params = event.get('queryStringParameters') or {}
         
         # Try query string parameters first
         if event.get('queryStringParameters'):
@@ -59,18 +107,34 @@ def lambda_handler(event, context):
                 })
             }
         
-        # --- Use SCAN with FilterExpression since officeId is not the primary key ---
-        print(f"Scanning table for officeId: {office_id}")
-        response = table.scan(
-            FilterExpression='officeId = :officeId',
-            ExpressionAttributeValues={
-                ':officeId': office_id
+        try:
+            fields = parse_fields(params.get('fields'))
+            limit = None
+            if params.get('limit'):
+                limit = int(params['limit'])
+                if limit <= 0:
+                    raise ValueError
+                limit = min(limit, MAX_PAGE_SIZE)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': str(e) or f"Invalid limit: {params.get('limit')}"})
             }
-        )
-        print(f"Scan completed. Items found: {len(response.get('Items', []))}")
-        
-        # Extract items
-        rooms = response.get('Items', [])
+
+        try:
+            cursor = decode_cursor(params['cursor'], office_id) if params.get('cursor') else None
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        # --- Query GSI theo officeId thay vì scan toàn bảng ---
+        print(f"Querying rooms for officeId: {office_id}")
+        rooms, last_key = list_rooms(office_id, fields, limit, cursor)
+        print(f"Query completed. Items found: {len(rooms)}")
         
         # Return the list of rooms
         return {
@@ -79,7 +143,8 @@ def lambda_handler(event, context):
             'body': json.dumps({
                 'officeId': office_id,
                 'roomCount': len(rooms),
-                'rooms': rooms
+                'rooms': rooms,
+                'nextCursor': encode_cursor(last_key)
             }, cls=DecimalEncoder)
         }
         
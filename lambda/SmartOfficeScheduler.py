@@ -0,0 +1,194 @@
+import boto3
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from parallel_scan import parallel_scan
+from config_profiles import list_org_office_ids, load_inherited_config, profile_table, profiles_enabled
+from device_shadow import shadow_client
+from index_query import list_office_rooms, query_index
+from schedule_buckets import SCHEDULE_FIELDS, current_bucket, normalize_time, settings_buckets, time_bucket
+
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT'))
+TABLE_NAME = os.environ['ROOM_CONFIG_TABLE']
+table = dynamodb.Table(TABLE_NAME)
+# GSI thưa: partition key là bucket, chỉ phòng có đặt giờ mới nằm trong index
+SCHEDULE_INDEXES = {
+    'autoOnTime': os.environ.get('ROOM_CONFIG_AUTO_ON_INDEX', 'autoOnBucket-index'),
+    'autoOffTime': os.environ.get('ROOM_CONFIG_AUTO_OFF_INDEX', 'autoOffBucket-index')
+}
+# Cùng GSI thưa trên CONFIG_PROFILE_TABLE: profile office/org có đặt giờ (xem SmartOfficeConfigProfileHandler)
+PROFILE_SCHEDULE_INDEXES = {
+    'autoOnTime': os.environ.get('CONFIG_PROFILE_AUTO_ON_INDEX', 'autoOnBucket-index'),
+    'autoOffTime': os.environ.get('CONFIG_PROFILE_AUTO_OFF_INDEX', 'autoOffBucket-index')
+}
+COMMAND_WORKERS = int(os.environ.get('SCHEDULER_WORKERS', '32'))
+BACKFILL_SEGMENTS = 4
+
+COMMANDS = {'autoOnTime': 'on', 'autoOffTime': 'off'}
+
+def tick_time(event):
+    """Minute being processed: the EventBridge `time` (so a retried invocation redoes the same minute) or now"""
+    value = (event or {}).get('time')
+    if value:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc)
+    return datetime.now(timezone.utc)
+
+def query_due_rooms(field, bucket):
+    """Rooms whose own `field` falls in `bucket`, from the sparse schedule GSI"""
+    return query_index(table, SCHEDULE_INDEXES[field], SCHEDULE_FIELDS[field], bucket, ['roomId', 'officeId', 'thingName'])
+
+def due_office_ids(field, bucket):
+    """
+    Offices whose inherited `field` falls in `bucket`
+    Profile office có giờ trong bucket, hoặc profile org có giờ trong bucket và office không đặt đè
+    """
+    profiles = query_index(profile_table, PROFILE_SCHEDULE_INDEXES[field], SCHEDULE_FIELDS[field], bucket, ['profileId'])
+    candidates = set()
+    for profile in profiles:
+        profile_id = profile['profileId']
+        if profile_id.startswith('OFFICE#'):
+            candidates.add(profile_id[len('OFFICE#'):])
+        elif profile_id.startswith('ORG#'):
+            candidates.update(list_org_office_ids(profile_id[len('ORG#'):]))
+
+    office_ids = []
+    for office_id in candidates:
+        # Đọc trực tiếp (không qua cache): chỉ các office ứng viên của bucket này
+        value = load_inherited_config(office_id)['settings'].get(field)
+        try:
+            if value is not None and time_bucket(normalize_time(field, value)) == bucket:
+                office_ids.append(office_id)
+        except ValueError:
+            continue
+    return office_ids
+
+def query_inheriting_rooms(office_id, field):
+    """Rooms of an office that do not set `field` themselves, so they follow the profile schedule"""
+    rooms = list_office_rooms(table, office_id, ['roomId', 'officeId', 'thingName', field])
+    return [room for room in rooms if field not in room]
+
+def due_commands(bucket):
+    """{thingName: 'on' | 'off'} for every room scheduled in `bucket`; off wins when both are due"""
+    due = {field: query_due_rooms(field, bucket) for field in SCHEDULE_FIELDS}
+    if profiles_enabled():
+        for field in SCHEDULE_FIELDS:
+            for office_id in due_office_ids(field, bucket):
+                due[field].extend(query_inheriting_rooms(office_id, field))
+
+    commands = {}
+    for field in ('autoOnTime', 'autoOffTime'):
+        for room in due[field]:
+            if room.get('thingName'):
+                commands[room['thingName']] = COMMANDS[field]
+    return commands
+
+def send_commands(commands):
+    """Push the commands to the device shadows concurrently; return the Things that failed"""
+    def send(thing_name):
+        try:
+            shadow_client.update_desired(thing_name, {'power': commands[thing_name]})
+            return None
+        except ClientError as e:
+            print(f"Error sending '{commands[thing_name]}' to {thing_name}: {e}")
+            return thing_name
+
+    if not commands:
+        return []
+    with ThreadPoolExecutor(max_workers=min(COMMAND_WORKERS, len(commands))) as executor:
+        return [thing_name for thing_name in executor.map(send, list(commands)) if thing_name]
+
+def backfill_buckets():
+    """
+    One-off: write the schedule buckets of rooms whose times were saved before the index existed
+    Chạy một lần với event {"backfill": true} sau khi tạo GSI
+    """
+    names = {'#p0': 'roomId', '#p1': 'officeId'}
+    for index, field in enumerate(list(SCHEDULE_FIELDS) + list(SCHEDULE_FIELDS.values())):
+        names[f'#p{index + 2}'] = field
+    updated = 0
+    for item in parallel_scan(
+        table,
+        segments=BACKFILL_SEGMENTS,
+        FilterExpression=Attr('autoOnTime').exists() | Attr('autoOffTime').exists(),
+        ProjectionExpression=', '.join(names),
+        ExpressionAttributeNames=names
+    ):
+        values = {}
+        for field, bucket_attribute in SCHEDULE_FIELDS.items():
+            if field not in item:
+                continue
+            try:
+                bucket = time_bucket(normalize_time(field, item[field]))
+            except ValueError as e:
+                print(f"Room {item['roomId']}: {e}, skipped")
+                continue
+            if item.get(bucket_attribute) != bucket:
+                values[bucket_attribute] = bucket
+        if not values:
+            continue
+        table.update_item(
+            Key={'roomId': item['roomId'], 'officeId': item['officeId']},
+            UpdateExpression='SET ' + ', '.join(f'{name} = :{name}' for name in values),
+            ExpressionAttributeValues={f':{name}': value for name, value in values.items()},
+            ConditionExpression='attribute_exists(roomId)'
+        )
+        updated += 1
+
+    profiles_updated = backfill_profile_buckets() if profiles_enabled() else 0
+    print(f"Schedule bucket backfill: {updated} rooms, {profiles_updated} profiles updated")
+    return {'backfilled': updated, 'profilesBackfilled': profiles_updated}
+
+def backfill_profile_buckets():
+    """Write the schedule buckets of office/org profiles saved before the profile index existed"""
+    names = {'#p0': 'profileId', '#p1': 'settings'}
+    for index, bucket_attribute in enumerate(SCHEDULE_FIELDS.values()):
+        names[f'#p{index + 2}'] = bucket_attribute
+    scan_kwargs = {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+    updated = 0
+    while True:
+        response = profile_table.scan(**scan_kwargs)
+        for profile in response.get('Items', []):
+            try:
+                buckets = settings_buckets(profile.get('settings') or {})
+            except ValueError as e:
+                print(f"Profile {profile['profileId']}: {e}, skipped")
+                continue
+            if all(profile.get(name) == buckets.get(name) for name in SCHEDULE_FIELDS.values()):
+                continue
+            removed = [name for name in SCHEDULE_FIELDS.values() if name not in buckets]
+            expression = 'SET ' + ', '.join(f'{name} = :{name}' for name in buckets) if buckets else ''
+            if removed:
+                expression += ' REMOVE ' + ', '.join(removed)
+            update_kwargs = {
+                'Key': {'profileId': profile['profileId']},
+                'UpdateExpression': expression.strip(),
+                'ConditionExpression': 'attribute_exists(profileId)'
+            }
+            if buckets:
+                update_kwargs['ExpressionAttributeValues'] = {f':{name}': value for name, value in buckets.items()}
+            profile_table.update_item(**update_kwargs)
+            updated += 1
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return updated
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+def lambda_handler(event, context):
+    """
+    Scheduled job (EventBridge, rate(1 minute)): bật/tắt các phòng có autoOnTime/autoOffTime rơi vào phút hiện tại
+    Chỉ truy vấn bucket của phút này trên GSI lịch: công việc mỗi lần chạy tỉ lệ với số phòng đến giờ
+    """
+    if (event or {}).get('backfill'):
+        return backfill_buckets()
+
+    bucket = current_bucket(tick_time(event))
+    commands = due_commands(bucket)
+    failed = send_commands(commands)
+
+    print(f"Schedule tick {bucket} UTC: {len(commands)} commands, {len(failed)} failed")
+    if failed:
+        # Lệnh là desired state nên idempotent: để EventBridge retry cả phút
+        raise RuntimeError(f"Failed to send schedule commands to {len(failed)} things")
+    return {'bucket': bucket, 'commands': len(commands)}
@@ -0,0 +1,234 @@
+import boto3
+import calendar
+import gzip
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+from archive_store import ArchiveStore
+
+TABLE_NAME = os.environ.get('SENSOR_LOG_TABLE')
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT'))
+table = dynamodb.Table(TABLE_NAME)
+BUCKET_TABLE_NAME = os.environ.get('SENSOR_BUCKET_TABLE')
+bucket_table = dynamodb.Table(BUCKET_TABLE_NAME) if BUCKET_TABLE_NAME else None
+BUCKET_SECONDS = int(os.environ.get('SENSOR_BUCKET_SECONDS', '3600'))
+ROOM_CONFIG_TABLE_NAME = os.environ.get('ROOM_CONFIG_TABLE')
+room_config_table = dynamodb.Table(ROOM_CONFIG_TABLE_NAME) if ROOM_CONFIG_TABLE_NAME else None
+
+# Nơi lưu archive: s3://bucket/prefix (S3 hoặc S3-compatible qua S3_ENDPOINT) hoặc file:///path khi test local
+ARCHIVE_URI = os.environ.get('SENSOR_ARCHIVE_URI', '')
+# Ngày cũ hơn số ngày này được nén thành archive; phải nhỏ hơn SENSOR_HOT_RETENTION_DAYS (TTL của dòng nóng)
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '7'))
+# TTL của dòng nóng (khớp với SmartOfficeSensorIngest, 0 = không hết hạn); expiresAt tính theo timestamp
+# của bản ghi nên bản ghi đến muộn của một ngày đã archive vẫn hết hạn cùng ngày đó
+HOT_RETENTION_DAYS = int(os.environ.get('SENSOR_HOT_RETENTION_DAYS', '0'))
+# Giới hạn số ngày mỗi phòng mỗi lần chạy để không vượt timeout của Lambda
+MAX_DAYS_PER_RUN = int(os.environ.get('ARCHIVE_MAX_DAYS_PER_RUN', '31'))
+METRICS = ('temperature', 'humidity', 'light')
+DAY_SECONDS = 86400
+NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj) if obj % 1 == 0 else float(obj)
+        return super(DecimalEncoder, self).default(obj)
+
+store = ArchiveStore(ARCHIVE_URI) if ARCHIVE_URI else None
+
+def day_key(day_start):
+    return datetime.fromtimestamp(day_start, tz=timezone.utc).strftime('%Y-%m-%d')
+
+def parse_day(value):
+    return calendar.timegm(datetime.strptime(value, '%Y-%m-%d').timetuple())
+
+def query_all(source_table, key_condition):
+    items = []
+    query_kwargs = {'KeyConditionExpression': key_condition}
+    while True:
+        response = source_table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return items
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+def read_day(room_id, day_start):
+    """All readings of one UTC day from the log table and, if enabled, the packed bucket table"""
+    day_end = day_start + DAY_SECONDS - 1
+    readings = {}
+    for item in query_all(table, Key('roomId').eq(room_id) & Key('timestamp').between(day_start, day_end)):
+        readings.setdefault(int(item['timestamp']), item)
+
+    if bucket_table is not None:
+        condition = Key('roomId').eq(room_id) & \
+            Key('bucketStart').between(day_start - day_start % BUCKET_SECONDS, day_end)
+        for bucket in query_all(bucket_table, condition):
+            base = int(bucket['bucketStart'])
+            for index, offset in enumerate(bucket.get('ts', [])):
+                timestamp = base + int(offset)
+                if day_start <= timestamp <= day_end and timestamp not in readings:
+                    values = {}
+                    for metric in METRICS:
+                        column = bucket.get(metric) or []
+                        values[metric] = column[index] if index < len(column) else None
+                    readings[timestamp] = values
+    return [{**readings[timestamp], 'timestamp': timestamp} for timestamp in sorted(readings)]
+
+def to_number(value):
+    """Numeric reading; legacy rows stored as '25.68 °C' strings are parsed once here"""
+    if value is None or isinstance(value, (Decimal, int, float)):
+        return value
+    match = NUMBER_PATTERN.search(str(value))
+    return Decimal(match.group()) if match else None
+
+def build_segment(room_id, day_start, readings):
+    """Gzip-compressed columnar JSON for one room-day"""
+    segment = {
+        'roomId': room_id,
+        'day': day_key(day_start),
+        'timestamp': [reading['timestamp'] for reading in readings]
+    }
+    for metric in METRICS:
+        segment[metric] = [to_number(reading.get(metric)) for reading in readings]
+    payload = json.dumps(segment, cls=DecimalEncoder, separators=(',', ':'))
+    return gzip.compress(payload.encode('utf-8'))
+
+def first_reading_day(room_id):
+    candidates = []
+    response = table.query(KeyConditionExpression=Key('roomId').eq(room_id), ScanIndexForward=True, Limit=1)
+    candidates.extend(int(item['timestamp']) for item in response.get('Items', []))
+    if bucket_table is not None:
+        response = bucket_table.query(KeyConditionExpression=Key('roomId').eq(room_id), ScanIndexForward=True, Limit=1)
+        candidates.extend(int(item['bucketStart']) for item in response.get('Items', []))
+    if not candidates:
+        return None
+    first = min(candidates)
+    return first - first % DAY_SECONDS
+
+def load_segment_readings(room_id, day_start):
+    """Readings of an archived room-day, [] when the day has no segment"""
+    raw = store.get(f'{room_id}/{day_key(day_start)}.json.gz')
+    if not raw:
+        return []
+    segment = json.loads(gzip.decompress(raw), parse_float=Decimal)
+    return [
+        {'timestamp': timestamp, **{metric: segment[metric][index] for metric in METRICS}}
+        for index, timestamp in enumerate(segment['timestamp'])
+    ]
+
+def recheck_day(room_id, day_start):
+    """
+    Append readings that reached the hot tables after the day was archived
+    Return the number of late readings added to the segment
+    """
+    archived = load_segment_readings(room_id, day_start)
+    known = {int(reading['timestamp']) for reading in archived}
+    late = [reading for reading in read_day(room_id, day_start) if reading['timestamp'] not in known]
+    if late:
+        readings = sorted(archived + late, key=lambda reading: int(reading['timestamp']))
+        store.put(f'{room_id}/{day_key(day_start)}.json.gz', build_segment(room_id, day_start, readings))
+    return len(late)
+
+def recheck_horizon(today):
+    """
+    Last day whose hot rows are all still present, None when hot rows never expire
+    Bản ghi của ngày D hết hạn trong [D + HOT_RETENTION_DAYS, D + HOT_RETENTION_DAYS + 1)
+    """
+    if HOT_RETENTION_DAYS <= 0:
+        # Không có TTL: bản ghi đến muộn nằm lại bảng nóng và GetData vẫn đọc gộp được
+        return None
+    return today - (HOT_RETENTION_DAYS - 1) * DAY_SECONDS
+
+def archive_room(room_id, cutoff_day, today):
+    """
+    Archive every complete day up to `cutoff_day` that is not archived yet, then re-check
+    archived days one last time before their hot rows expire so late readings are not lost to TTL
+    manifest.json lưu firstDay/archivedThrough/recheckedThrough để đọc và chạy tiếp ở lần sau
+    Return (days archived, late readings appended)
+    """
+    manifest_key = f'{room_id}/manifest.json'
+    raw = store.get(manifest_key)
+    manifest = json.loads(raw) if raw else {}
+
+    if manifest.get('archivedThrough'):
+        day = parse_day(manifest['archivedThrough']) + DAY_SECONDS
+    else:
+        day = first_reading_day(room_id)
+        if day is None:
+            return 0, 0
+
+    archived = 0
+    while day <= cutoff_day and archived < MAX_DAYS_PER_RUN:
+        readings = read_day(room_id, day)
+        if readings:
+            store.put(f'{room_id}/{day_key(day)}.json.gz', build_segment(room_id, day, readings))
+            manifest.setdefault('firstDay', day_key(day))
+        manifest['archivedThrough'] = day_key(day)
+        # Ghi manifest sau mỗi ngày để lần chạy bị timeout có thể tiếp tục
+        store.put(manifest_key, json.dumps(manifest).encode('utf-8'))
+        archived += 1
+        day += DAY_SECONDS
+
+    horizon = recheck_horizon(today)
+    if horizon is None or not manifest.get('firstDay'):
+        return archived, 0
+    day = parse_day(manifest.get('recheckedThrough') or manifest['firstDay'])
+    if manifest.get('recheckedThrough'):
+        day += DAY_SECONDS
+    # Ngày đã hết hạn hoàn toàn không còn gì để đọc lại
+    day = max(day, today - HOT_RETENTION_DAYS * DAY_SECONDS)
+    last_day = min(horizon, parse_day(manifest['archivedThrough']))
+    late = 0
+    rechecked = 0
+    while day <= last_day and rechecked < MAX_DAYS_PER_RUN:
+        late += recheck_day(room_id, day)
+        manifest['recheckedThrough'] = day_key(day)
+        store.put(manifest_key, json.dumps(manifest).encode('utf-8'))
+        rechecked += 1
+        day += DAY_SECONDS
+    return archived, late
+
+def list_room_ids():
+    room_ids = set()
+    scan_kwargs = {'ProjectionExpression': 'roomId'}
+    while True:
+        response = room_config_table.scan(**scan_kwargs)
+        room_ids.update(item['roomId'] for item in response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return sorted(room_ids)
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+def lambda_handler(event, context):
+    """
+    Scheduled job (EventBridge): nén dữ liệu cảm biến cũ thành archive theo ngày
+    Dòng nóng trong DynamoDB tự hết hạn qua TTL (expiresAt) do SmartOfficeSensorIngest ghi;
+    mỗi ngày đã archive được đọc lại một lần trước khi hết hạn để gộp bản ghi đến muộn
+    """
+    if store is None:
+        raise RuntimeError('SENSOR_ARCHIVE_URI is not configured')
+
+    today = int(time.time()) // DAY_SECONDS * DAY_SECONDS
+    cutoff_day = today - ARCHIVE_AFTER_DAYS * DAY_SECONDS
+    room_ids = (event or {}).get('roomIds')
+    if not room_ids:
+        if room_config_table is None:
+            raise RuntimeError('ROOM_CONFIG_TABLE is required when roomIds is not given')
+        room_ids = list_room_ids()
+
+    summary = {}
+    for room_id in room_ids:
+        try:
+            archived, late = archive_room(room_id, cutoff_day, today)
+            summary[room_id] = {'archivedDays': archived, 'lateReadings': late}
+        except Exception as e:
+            print(f"Error archiving room {room_id}: {e}")
+            summary[room_id] = f'error: {e}'
+
+    print(f"Archive run through {day_key(cutoff_day)}: {summary}")
+    return {'archivedThrough': day_key(cutoff_day), 'rooms': summary}
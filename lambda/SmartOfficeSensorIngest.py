@@ -0,0 +1,515 @@
+import boto3
+import base64
+import json
+import os
+import random
+import re
+import time
+from decimal import Decimal, InvalidOperation
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from ttl_cache import TTLCache
+from config_profiles import profiles_enabled, get_inherited_config
+
+TABLE_NAME = os.environ.get('SENSOR_LOG_TABLE')
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT'))
+table = dynamodb.Table(TABLE_NAME)
+# BatchWriteItem: tối đa 25 item mỗi request, retry UnprocessedItems với exponential backoff + jitter
+BATCH_WRITE_SIZE = 25
+MAX_BATCH_ATTEMPTS = 6
+BASE_BACKOFF_SECONDS = 0.05
+MAX_BACKOFF_SECONDS = 2
+# Chế độ lưu: "row" = một item mỗi bản ghi, "bucket" = gom nhiều bản ghi vào một item mỗi phòng mỗi giờ
+STORAGE_MODE = os.environ.get('SENSOR_STORAGE_MODE', 'row')
+BUCKET_TABLE_NAME = os.environ.get('SENSOR_BUCKET_TABLE')
+bucket_table = dynamodb.Table(BUCKET_TABLE_NAME) if BUCKET_TABLE_NAME else None
+BUCKET_SECONDS = int(os.environ.get('SENSOR_BUCKET_SECONDS', '3600'))
+# TTL của dữ liệu nóng (0 = giữ mãi); SmartOfficeSensorArchive phải archive trước khi hết hạn
+HOT_RETENTION_DAYS = int(os.environ.get('SENSOR_HOT_RETENTION_DAYS', '0'))
+# Một item mỗi phòng chứa N bản ghi gần nhất + giá trị hiện tại (tuỳ chọn)
+LATEST_TABLE_NAME = os.environ.get('SENSOR_LATEST_TABLE')
+latest_table = dynamodb.Table(LATEST_TABLE_NAME) if LATEST_TABLE_NAME else None
+RECENT_READINGS_SIZE = int(os.environ.get('RECENT_READINGS_SIZE', '50'))
+# Chỉ cắt bớt ring buffer khi vượt quá N + slack để phần lớn lần ghi chỉ tốn một UpdateItem
+RECENT_READINGS_SLACK = 10
+# Deadband theo phòng, cấu hình trong ROOM_CONFIG_TABLE (attribute "deadband"), tuỳ chọn
+ROOM_CONFIG_TABLE_NAME = os.environ.get('ROOM_CONFIG_TABLE')
+room_config_table = dynamodb.Table(ROOM_CONFIG_TABLE_NAME) if ROOM_CONFIG_TABLE_NAME else None
+DEFAULT_MAX_SILENCE_SECONDS = 900
+# Bản ghi cuối cùng đã lưu (trạng thái của deadband) nằm trên item ring buffer: thiếu bảng này thì
+# deadband không so sánh được gì và lặng lẽ lưu mọi bản ghi
+if room_config_table is not None and latest_table is None:
+    raise RuntimeError('Deadband compression (ROOM_CONFIG_TABLE) requires SENSOR_LATEST_TABLE')
+
+# Đơn vị chuẩn của từng series - chỉ lưu giá trị số trong bảng, không lưu đơn vị theo từng dòng
+METRICS = ('temperature', 'humidity', 'light')
+UNITS = {
+    'temperature': '°C',
+    'humidity': '%',
+    'light': 'lux'
+}
+READING_PATTERN = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*([^\d\s]*)\s*$')
+FAHRENHEIT_UNITS = ('°F', 'F', 'degF')
+# Giới hạn kiểu Number của DynamoDB: 38 chữ số có nghĩa, độ lớn trong [1E-130, 1E+126)
+MAX_SIGNIFICANT_DIGITS = 38
+MIN_ADJUSTED_EXPONENT = -130
+MAX_ADJUSTED_EXPONENT = 125
+
+def check_number(metric, number):
+    """Reject values DynamoDB cannot store so one bad reading cannot fail a whole batch"""
+    if not number.is_finite():
+        raise ValueError(f'Invalid {metric} reading: {number}')
+    if number and not MIN_ADJUSTED_EXPONENT <= number.adjusted() <= MAX_ADJUSTED_EXPONENT:
+        raise ValueError(f'{metric} reading out of range: {number}')
+    if len(number.as_tuple().digits) > MAX_SIGNIFICANT_DIGITS:
+        raise ValueError(f'{metric} reading has too many digits: {number}')
+    return number
+
+def normalize_value(metric, value):
+    """Convert a device reading ('25.68 °C', '16.6 %', 24.9) into a Decimal in the series unit"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        return check_number(metric, Decimal(str(value)))
+
+    match = READING_PATTERN.match(str(value))
+    if not match:
+        raise ValueError(f'Invalid {metric} reading: {value}')
+    number = Decimal(match.group(1))
+    unit = match.group(2)
+
+    if metric == 'temperature' and unit in FAHRENHEIT_UNITS:
+        number = ((number - 32) * 5 / 9).quantize(Decimal('0.01'))
+    return check_number(metric, number)
+
+def normalize_reading(message):
+    """Build a sensor log item with numeric readings from a raw device message"""
+    room_id = message.get('roomId')
+    if not room_id:
+        raise ValueError('Missing roomId in sensor message')
+
+    try:
+        timestamp = Decimal(str(message.get('timestamp') or int(time.time())))
+    except InvalidOperation:
+        raise ValueError(f"Invalid timestamp: {message.get('timestamp')}")
+    # Infinity/NaN không đổi được sang int (OverflowError): coi là bản ghi sai thay vì làm hỏng cả batch
+    timestamp = int(check_number('timestamp', timestamp))
+
+    item = {'roomId': room_id, 'timestamp': timestamp}
+    if HOT_RETENTION_DAYS > 0:
+        item['expiresAt'] = timestamp + HOT_RETENTION_DAYS * 86400
+    for metric in METRICS:
+        value = normalize_value(metric, message.get(metric))
+        if value is not None:
+            item[metric] = value
+    return item
+
+def chunked(items, size):
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+def backoff(attempt):
+    """Exponential backoff with full jitter"""
+    time.sleep(random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)))
+
+def is_validation_error(error):
+    return error.response['Error']['Code'] == 'ValidationException'
+
+def put_rows_one_by_one(items):
+    """
+    Fallback for a chunk DynamoDB rejected as a whole: return (failed, rejected)
+    Item bị từ chối (ValidationException) không retry được nên chỉ ghi log, các item khác vẫn được ghi
+    """
+    failed = []
+    rejected = []
+    for item in items:
+        try:
+            table.put_item(Item=item)
+        except ClientError as e:
+            print(f"PutItem failed for {item['roomId']} at {item['timestamp']}: {e}")
+            (rejected if is_validation_error(e) else failed).append(item)
+    return failed, rejected
+
+def batch_write_rows(items):
+    """
+    Write rows with BatchWriteItem in chunks of 25, retrying UnprocessedItems
+    Return (items that still could not be written, items DynamoDB rejected as invalid)
+    """
+    failed = []
+    rejected = []
+    for chunk in chunked(items, BATCH_WRITE_SIZE):
+        requests = [{'PutRequest': {'Item': item}} for item in chunk]
+        try:
+            for attempt in range(MAX_BATCH_ATTEMPTS):
+                response = dynamodb.batch_write_item(RequestItems={TABLE_NAME: requests})
+                requests = response.get('UnprocessedItems', {}).get(TABLE_NAME, [])
+                if not requests or attempt == MAX_BATCH_ATTEMPTS - 1:
+                    break
+                backoff(attempt)
+        except ClientError as e:
+            print(f"BatchWriteItem failed: {e}")
+            if is_validation_error(e):
+                # Một item sai làm hỏng cả chunk: ghi lại từng item để tách nó ra
+                chunk_failed, chunk_rejected = put_rows_one_by_one([request['PutRequest']['Item'] for request in requests])
+                failed.extend(chunk_failed)
+                rejected.extend(chunk_rejected)
+                continue
+        failed.extend(request['PutRequest']['Item'] for request in requests)
+    return failed, rejected
+
+# Deadband policy của từng phòng trong container ấm ({} = phòng không cấu hình deadband)
+deadband_cache = TTLCache('deadband', ttl_seconds=int(os.environ.get('DEADBAND_CACHE_TTL_SECONDS', '60')))
+
+def load_deadband_policy(room_id):
+    response = room_config_table.query(
+        KeyConditionExpression=Key('roomId').eq(room_id),
+        ProjectionExpression='deadband, officeId',
+        Limit=1
+    )
+    items = response.get('Items', [])
+    if not items:
+        return {}
+    if not items[0].get('deadband') and profiles_enabled():
+        # Phòng không đặt deadband riêng: dùng deadband của profile office/org
+        return get_inherited_config(items[0]['officeId'])['settings'].get('deadband') or {}
+    return items[0].get('deadband') or {}
+
+def load_deadband_policies(room_ids):
+    """
+    Deadband policy per room from ROOM_CONFIG_TABLE
+    deadband = {'temperature': 0.2, 'humidity': 1, 'light': 10, 'maxSilenceSeconds': 900}
+    """
+    policies = {}
+    if room_config_table is None:
+        return policies
+    for room_id in room_ids:
+        try:
+            policy = deadband_cache.get_or_load(room_id, load_deadband_policy)
+        except ClientError as e:
+            print(f"Could not load deadband policy for {room_id}: {e}")
+            continue
+        if policy:
+            policies[room_id] = policy
+    return policies
+
+def load_last_stored(room_id):
+    """Values of the last reading actually written for the room, kept on its ring-buffer item"""
+    response = latest_table.get_item(Key={'roomId': room_id}, ProjectionExpression='lastStored')
+    return response.get('Item', {}).get('lastStored')
+
+def should_store(item, last, policy):
+    """A reading is stored when a metric leaves the deadband or the room has been silent too long"""
+    if last is None or item['timestamp'] <= last['timestamp']:
+        return True
+    if item['timestamp'] - last['timestamp'] >= policy.get('maxSilenceSeconds', DEFAULT_MAX_SILENCE_SECONDS):
+        return True
+    for metric in METRICS:
+        value = item.get(metric)
+        previous = last.get(metric)
+        if value is None:
+            continue
+        if previous is None:
+            return True
+        threshold = policy.get(metric)
+        if threshold is None:
+            if value != previous:
+                return True
+        elif abs(value - previous) >= threshold:
+            return True
+    return False
+
+def apply_deadband(items):
+    """
+    Drop readings inside the room's deadband
+    Return (items_to_store, {room_id: last stored reading})
+    """
+    by_room = {}
+    for item in items:
+        by_room.setdefault(item['roomId'], []).append(item)
+    policies = load_deadband_policies(by_room)
+
+    to_store = []
+    last_stored = {}
+    for room_id, room_items in by_room.items():
+        policy = policies.get(room_id)
+        if not policy:
+            to_store.extend(room_items)
+            continue
+
+        last = load_last_stored(room_id)
+        for item in sorted(room_items, key=lambda reading: reading['timestamp']):
+            if should_store(item, last, policy):
+                to_store.append(item)
+                last = item
+                last_stored[room_id] = item
+    return to_store, last_stored
+
+def write_to_bucket(room_id, bucket_start, items, last_offset, condition, condition_values):
+    """One UpdateItem appending `items` to the bucket; lastOffset = largest ts offset appended so far"""
+    names = {f'#{metric}': metric for metric in METRICS}
+    values = {f':{metric}': [item.get(metric) for item in items] for metric in METRICS}
+    update_expression = 'SET ts = list_append(if_not_exists(ts, :empty), :ts), lastOffset = :lastOffset, ' + ', '.join(
+        f'#{metric} = list_append(if_not_exists(#{metric}, :empty), :{metric})' for metric in METRICS
+    ) + ' ADD readingCount :count'
+    expression_values = {
+        **values,
+        **condition_values,
+        ':empty': [],
+        ':ts': [item['timestamp'] - bucket_start for item in items],
+        ':lastOffset': last_offset,
+        ':count': len(items)
+    }
+    if HOT_RETENTION_DAYS > 0:
+        update_expression = update_expression.replace('SET ', 'SET expiresAt = :expiresAt, ', 1)
+        expression_values[':expiresAt'] = bucket_start + BUCKET_SECONDS + HOT_RETENTION_DAYS * 86400
+
+    bucket_table.update_item(
+        Key={'roomId': room_id, 'bucketStart': bucket_start},
+        UpdateExpression=update_expression,
+        ConditionExpression=condition,
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=expression_values
+    )
+
+def append_to_bucket(room_id, bucket_start, items):
+    """
+    Append readings of one room and one time bucket to its item with a single UpdateItem
+    ts = độ lệch (giây) so với bucketStart; các list metric song song với ts, NULL nếu thiếu giá trị
+    Chỉ append khi mọi bản ghi mới hơn lastOffset: batch bị gửi lại (retry, SQS/Kinesis redelivery)
+    không được nối thêm lần nữa, nếu không rollup và readingCount sẽ đếm hai lần
+    """
+    items = sorted(items, key=lambda item: item['timestamp'])
+    offsets = [item['timestamp'] - bucket_start for item in items]
+    try:
+        write_to_bucket(
+            room_id, bucket_start, items, offsets[-1],
+            'attribute_not_exists(lastOffset) OR lastOffset < :firstOffset',
+            {':firstOffset': offsets[0]}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # Bản ghi đến muộn hoặc bị gửi lại: chỉ append các offset chưa có trong bucket
+        append_missing_to_bucket(room_id, bucket_start, items)
+
+def append_missing_to_bucket(room_id, bucket_start, items):
+    """Append only readings whose offset is not in the bucket yet, with optimistic locking on size(ts)"""
+    for attempt in range(MAX_BATCH_ATTEMPTS):
+        bucket = bucket_table.get_item(
+            Key={'roomId': room_id, 'bucketStart': bucket_start},
+            ProjectionExpression='ts, lastOffset',
+            ConsistentRead=True
+        ).get('Item') or {}
+        existing = bucket.get('ts') or []
+        known = {int(offset) for offset in existing}
+        missing = [item for item in items if item['timestamp'] - bucket_start not in known]
+        if not missing:
+            return
+        last_offset = max([int(bucket.get('lastOffset', -1))] + [item['timestamp'] - bucket_start for item in missing])
+        if existing:
+            condition, condition_values = 'size(ts) = :length', {':length': len(existing)}
+        else:
+            condition, condition_values = 'attribute_not_exists(ts)', {}
+        try:
+            write_to_bucket(room_id, bucket_start, missing, last_offset, condition, condition_values)
+            return
+        except ClientError as e:
+            # Có lần append song song: đọc lại bucket
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or attempt == MAX_BATCH_ATTEMPTS - 1:
+                raise
+            backoff(attempt)
+
+def store_readings(items):
+    """Persist a deduplicated batch of readings; return (failed, rejected) items"""
+    if STORAGE_MODE != 'bucket':
+        return batch_write_rows(items)
+
+    buckets = {}
+    for item in items:
+        bucket_start = item['timestamp'] - item['timestamp'] % BUCKET_SECONDS
+        buckets.setdefault((item['roomId'], bucket_start), []).append(item)
+
+    failed = []
+    rejected = []
+    for (room_id, bucket_start), bucket_items in buckets.items():
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            try:
+                append_to_bucket(room_id, bucket_start, bucket_items)
+                break
+            except ClientError as e:
+                print(f"Bucket append failed for {room_id} at {bucket_start}: {e}")
+                if is_validation_error(e) and len(bucket_items) > 1:
+                    # Tách bản ghi sai ra khỏi lần append
+                    for item in bucket_items:
+                        item_failed, item_rejected = store_readings([item])
+                        failed.extend(item_failed)
+                        rejected.extend(item_rejected)
+                    break
+                if is_validation_error(e):
+                    rejected.extend(bucket_items)
+                    break
+                if attempt == MAX_BATCH_ATTEMPTS - 1:
+                    failed.extend(bucket_items)
+                else:
+                    backoff(attempt)
+    return failed, rejected
+
+def update_recent(room_id, items, last_stored=None):
+    """
+    Append readings to the room's ring-buffer item and refresh the current values
+    readings = [[timestamp, temperature, humidity, light], ...]
+    lastStored = bản ghi cuối cùng thực sự được ghi vào log (trạng thái của deadband)
+    """
+    items = sorted(items, key=lambda item: item['timestamp'])
+    newest = items[-1]
+    entries = [[item['timestamp']] + [item.get(metric) for metric in METRICS] for item in items]
+    update_expression = (
+        'SET readings = list_append(if_not_exists(readings, :empty), :entries), '
+        'currentTemperature = :temperature, currentHumidity = :humidity, '
+        'currentLight = :light, lastReadingAt = :timestamp'
+    )
+    values = {
+        ':empty': [],
+        ':entries': entries,
+        ':temperature': newest.get('temperature'),
+        ':humidity': newest.get('humidity'),
+        ':light': newest.get('light'),
+        ':timestamp': newest['timestamp']
+    }
+    if last_stored:
+        update_expression += ', lastStored = :lastStored'
+        values[':lastStored'] = {key: value for key, value in last_stored.items() if key != 'roomId'}
+
+    try:
+        response = latest_table.update_item(
+            Key={'roomId': room_id},
+            UpdateExpression=update_expression,
+            # Bản ghi đến muộn (cũ hơn bản mới nhất) không được ghi đè giá trị hiện tại
+            ConditionExpression='attribute_not_exists(lastReadingAt) OR lastReadingAt < :timestamp',
+            ExpressionAttributeValues=values,
+            ReturnValues='UPDATED_NEW'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Skipping out-of-order readings for {room_id} up to {newest['timestamp']}")
+            return
+        raise
+
+    length = len(response['Attributes']['readings'])
+    if length < RECENT_READINGS_SIZE + RECENT_READINGS_SLACK:
+        return
+
+    # Xoá các phần tử cũ nhất; điều kiện độ dài tránh xoá nhầm khi có lần ghi song song
+    overflow = length - RECENT_READINGS_SIZE
+    try:
+        latest_table.update_item(
+            Key={'roomId': room_id},
+            UpdateExpression='REMOVE ' + ', '.join(f'readings[{index}]' for index in range(overflow)),
+            ConditionExpression='size(readings) = :length',
+            ExpressionAttributeValues={':length': length}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+def parse_messages(event):
+    """
+    Extract (message_id, message) pairs from an SQS batch, a Kinesis batch,
+    a list of messages or a single IoT rule message
+    """
+    if 'Records' in event:
+        entries = []
+        for record in event['Records']:
+            if 'kinesis' in record:
+                message_id = record['kinesis']['sequenceNumber']
+                payload = base64.b64decode(record['kinesis']['data'])
+            else:
+                message_id = record.get('messageId')
+                payload = record.get('body')
+            try:
+                entries.append((message_id, json.loads(payload)))
+            except (TypeError, ValueError):
+                entries.append((message_id, None))
+        messages = entries
+    elif isinstance(event, list):
+        messages = list(enumerate(event))
+    elif isinstance(event.get('messages'), list):
+        messages = list(enumerate(event['messages']))
+    else:
+        body = json.loads(event['body']) if isinstance(event.get('body'), str) else event
+        messages = [(None, body)]
+
+    # Một message có thể chứa nhiều bản ghi (thiết bị gửi theo lô)
+    flattened = []
+    for message_id, message in messages:
+        if isinstance(message, list):
+            flattened.extend((message_id, entry) for entry in message)
+        else:
+            flattened.append((message_id, message))
+    return flattened
+
+def lambda_handler(event, context):
+    """
+    Ghi dữ liệu cảm biến vào SENSOR_LOG_TABLE theo lô
+    - Nhận message từ IoT Rule, SQS hoặc Kinesis
+    - Chuẩn hoá giá trị về dạng số, bỏ trùng theo (roomId, timestamp)
+    - Bỏ qua bản ghi nằm trong deadband của phòng
+    - Báo lỗi từng phần (batchItemFailures) để SQS/Kinesis chỉ retry các message lỗi
+    """
+    messages = parse_messages(event)
+
+    readings = {}
+    sources = {}
+    invalid = 0
+    for message_id, message in messages:
+        try:
+            if not isinstance(message, dict):
+                raise ValueError('Sensor message is not a JSON object')
+            item = normalize_reading(message)
+        except ValueError as e:
+            # Message sai định dạng không retry được, chỉ ghi log
+            print(f"Invalid sensor message {message_id}: {e}")
+            invalid += 1
+            continue
+        key = (item['roomId'], item['timestamp'])
+        readings[key] = item
+        sources.setdefault(key, set()).add(message_id)
+
+    items = list(readings.values())
+    to_store, last_stored = apply_deadband(items)
+    failed, rejected = store_readings(to_store) if to_store else ([], [])
+    failed_keys = {(item['roomId'], item['timestamp']) for item in failed + rejected}
+
+    # Ring buffer vẫn nhận mọi bản ghi (kể cả bản bị deadband bỏ qua) để giá trị hiện tại luôn chính xác
+    if latest_table is not None:
+        by_room = {}
+        for key, item in readings.items():
+            if key not in failed_keys:
+                by_room.setdefault(item['roomId'], []).append(item)
+        for room_id, room_items in by_room.items():
+            stored = last_stored.get(room_id)
+            if stored and (stored['roomId'], stored['timestamp']) in failed_keys:
+                stored = None
+            try:
+                update_recent(room_id, room_items, stored)
+            except ClientError as e:
+                print(f"Could not update recent readings for {room_id}: {e}")
+
+    result = {
+        'received': len(messages),
+        'written': len(to_store) - len(failed) - len(rejected),
+        'duplicates': len(messages) - invalid - len(items),
+        'suppressed': len(items) - len(to_store),
+        'invalid': invalid + len(rejected),
+        'failed': len(failed)
+    }
+    if 'Records' in event:
+        # Bản ghi bị từ chối không retry được: chỉ các bản ghi lỗi tạm thời mới được báo lại
+        retry_keys = {(item['roomId'], item['timestamp']) for item in failed}
+        failed_ids = sorted({message_id for key in retry_keys for message_id in sources[key]})
+        result['batchItemFailures'] = [{'itemIdentifier': message_id} for message_id in failed_ids]
+    print(f"Ingest result: {result}")
+    if failed and 'Records' not in event:
+        # IoT Rule gọi bất đồng bộ: raise để Lambda retry / chuyển sang error action
+        raise RuntimeError(f"Failed to write {len(failed)} sensor readings")
+    return result
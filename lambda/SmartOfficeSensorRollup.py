@@ -0,0 +1,193 @@
+import boto3
+import math
+import os
+import re
+import time
+from decimal import Decimal
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+ROLLUP_TABLE_NAME = os.environ.get('SENSOR_ROLLUP_TABLE')
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT'))
+rollup_table = dynamodb.Table(ROLLUP_TABLE_NAME)
+
+METRICS = ('temperature', 'humidity', 'light')
+# (tên, độ dài bucket tính bằng giây) - rollupKey = "<roomId>#<tên>", bucketStart = đầu bucket (UTC)
+GRANULARITIES = (('1m', 60), ('1h', 3600), ('1d', 86400))
+# Rollup theo phút chỉ cần cho khoảng thời gian ngắn, tự hết hạn qua TTL (0 = giữ mãi)
+MINUTE_ROLLUP_TTL_DAYS = int(os.environ.get('MINUTE_ROLLUP_TTL_DAYS', '14'))
+MAX_WRITE_ATTEMPTS = 5
+# Item coverage của mỗi (phòng, granularity): bucketStart = -1, coverageStart = bucket đầu tiên có đủ dữ liệu
+# Dữ liệu ghi trước khi stream consumer chạy không có trong rollup; SmartOfficeGetData đọc bản ghi gốc cho phần đó
+COVERAGE_BUCKET = -1
+NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+
+deserializer = TypeDeserializer()
+# (roomId, granularity) đã ghi coverage trong container này
+covered = set()
+
+def to_decimal(value):
+    """Numeric reading as Decimal; legacy '25.68 °C' strings are parsed"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (Decimal, int)):
+        return Decimal(value)
+    match = NUMBER_PATTERN.search(str(value))
+    return Decimal(match.group()) if match else None
+
+def stream_readings(record):
+    """
+    New readings carried by one stream record, as (room_id, timestamp, values)
+    Hỗ trợ cả bảng log (INSERT một bản ghi) và bảng bucket (phần tử mới được nối vào cuối list)
+    """
+    data = record.get('dynamodb', {})
+    image = data.get('NewImage')
+    if not image or record.get('eventName') not in ('INSERT', 'MODIFY'):
+        return []
+
+    reading = {key: deserializer.deserialize(value) for key, value in image.items()}
+    room_id = reading.get('roomId')
+    if not room_id:
+        return []
+
+    if 'bucketStart' not in reading:
+        if record['eventName'] != 'INSERT' or reading.get('timestamp') is None:
+            return []
+        values = {metric: to_decimal(reading.get(metric)) for metric in METRICS}
+        return [(room_id, int(reading['timestamp']), values)]
+
+    # Stream của bảng bucket cần StreamViewType NEW_AND_OLD_IMAGES
+    old_offsets = deserializer.deserialize(data['OldImage']['ts']) if 'ts' in data.get('OldImage', {}) else []
+    offsets = reading.get('ts') or []
+    base = int(reading['bucketStart'])
+    readings = []
+    for index in range(len(old_offsets), len(offsets)):
+        values = {}
+        for metric in METRICS:
+            column = reading.get(metric) or []
+            values[metric] = to_decimal(column[index]) if index < len(column) else None
+        readings.append((room_id, base + int(offsets[index]), values))
+    return readings
+
+def aggregate_records(records):
+    """
+    Group stream readings by (room, granularity, bucket)
+    Return ({(room_id, granularity, bucket_start): {'sequence': max SequenceNumber, 'readings': [(sequence, values)]}},
+            {room_id: earliest write time in the batch})
+    """
+    buckets = {}
+    first_writes = {}
+    for record in records:
+        sequence = int(record.get('dynamodb', {}).get('SequenceNumber', 0))
+        written_at = record.get('dynamodb', {}).get('ApproximateCreationDateTime')
+        for room_id, timestamp, values in stream_readings(record):
+            write_time = float(written_at) if written_at is not None else timestamp
+            first_writes[room_id] = min(first_writes.get(room_id, write_time), write_time)
+            for granularity, seconds in GRANULARITIES:
+                key = (room_id, granularity, timestamp - timestamp % seconds)
+                bucket = buckets.setdefault(key, {'sequence': 0, 'readings': []})
+                bucket['sequence'] = max(bucket['sequence'], sequence)
+                bucket['readings'].append((sequence, values))
+    return buckets, first_writes
+
+def merge_into_item(item, bucket):
+    """
+    Apply the bucket's readings to the stored rollup item
+    Readings with a SequenceNumber already applied are skipped so stream retries stay idempotent
+    """
+    applied = int(item.get('lastSequence', 0))
+    changed = False
+    for sequence, values in bucket['readings']:
+        if sequence and sequence <= applied:
+            continue
+        for metric, value in values.items():
+            if value is None:
+                continue
+            if f'{metric}Count' in item:
+                item[f'{metric}Min'] = min(item[f'{metric}Min'], value)
+                item[f'{metric}Max'] = max(item[f'{metric}Max'], value)
+                item[f'{metric}Sum'] += value
+                item[f'{metric}Count'] += 1
+            else:
+                item[f'{metric}Min'] = value
+                item[f'{metric}Max'] = value
+                item[f'{metric}Sum'] = value
+                item[f'{metric}Count'] = 1
+        changed = True
+    if bucket['sequence'] > applied:
+        item['lastSequence'] = bucket['sequence']
+    return changed
+
+def write_bucket(room_id, granularity, bucket_start, bucket):
+    """Read-merge-write one rollup item with optimistic locking on `version`"""
+    key = {'rollupKey': f'{room_id}#{granularity}', 'bucketStart': bucket_start}
+
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        response = rollup_table.get_item(Key=key, ConsistentRead=True)
+        item = response.get('Item') or {
+            **key,
+            'roomId': room_id,
+            'granularity': granularity,
+            'version': 0
+        }
+        if not merge_into_item(item, bucket):
+            return
+
+        version = int(item['version'])
+        item['version'] = version + 1
+        if granularity == '1m' and MINUTE_ROLLUP_TTL_DAYS > 0:
+            item['expiresAt'] = bucket_start + MINUTE_ROLLUP_TTL_DAYS * 86400
+
+        try:
+            rollup_table.put_item(
+                Item=item,
+                ConditionExpression='attribute_not_exists(rollupKey) OR version = :version',
+                ExpressionAttributeValues={':version': version}
+            )
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            if attempt < MAX_WRITE_ATTEMPTS - 1:
+                time.sleep(0.05 * (attempt + 1))
+
+    raise RuntimeError(f"Rollup write conflict for {key['rollupKey']} at {bucket_start}")
+
+def record_coverage(room_id, granularity, seconds, first_write):
+    """
+    Store the first fully rolled-up bucket of a room (earliest one wins)
+    Bucket chứa lần ghi đầu tiên có thể thiếu các bản ghi trước đó nên coverage bắt đầu ở bucket kế tiếp
+    """
+    coverage_start = math.ceil(first_write / seconds) * seconds
+    try:
+        rollup_table.update_item(
+            Key={'rollupKey': f'{room_id}#{granularity}', 'bucketStart': COVERAGE_BUCKET},
+            UpdateExpression='SET coverageStart = :start, roomId = :roomId, granularity = :granularity',
+            ConditionExpression='attribute_not_exists(coverageStart) OR coverageStart > :start',
+            ExpressionAttributeValues={':start': coverage_start, ':roomId': room_id, ':granularity': granularity}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    covered.add((room_id, granularity))
+
+def process_records(records):
+    """Update minute/hour/day rollups for a batch of sensor log stream records"""
+    buckets, first_writes = aggregate_records(records)
+    for room_id, first_write in first_writes.items():
+        for granularity, seconds in GRANULARITIES:
+            if (room_id, granularity) not in covered:
+                record_coverage(room_id, granularity, seconds, first_write)
+    for (room_id, granularity, bucket_start), bucket in buckets.items():
+        write_bucket(room_id, granularity, bucket_start, bucket)
+    return len(buckets)
+
+def lambda_handler(event, context):
+    """
+    DynamoDB Stream consumer cho SENSOR_LOG_TABLE (hoặc SENSOR_BUCKET_TABLE)
+    Mỗi batch được gộp trong bộ nhớ trước, sau đó mỗi rollup item chỉ được ghi một lần
+    """
+    records = event.get('Records', [])
+    updated = process_records(records)
+    print(f"Processed {len(records)} records, updated {updated} rollup items")
+    return {'records': len(records), 'rollupsUpdated': updated}
@@ -2,10 +2,14 @@ import boto3
 import json
 import os
 from decimal import Decimal
+from boto3.dynamodb.conditions import Attr
+from parallel_scan import parallel_scan
 
 dynamodb = boto3.resource('dynamodb')
 USER_TABLE_NAME = os.environ['USER_TABLE_NAME']
 user_table = dynamodb.Table(USER_TABLE_NAME)
+# Số segment quét song song (parallel_scan.py được đóng gói cùng Lambda này)
+SCAN_SEGMENTS = int(os.environ.get('USER_SCAN_SEGMENTS', '4'))
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -38,14 +42,12 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'Missing companyId parameter'})
             }
         
-        response = user_table.scan(
-            FilterExpression='companyId = :cid',
-            ExpressionAttributeValues={
-                ':cid': company_id
-            }
-        )
-        
-        users = response.get('Items', [])
+        # Quét toàn bảng theo segment song song, đọc hết mọi trang thay vì chỉ trang đầu
+        users = list(parallel_scan(
+            user_table,
+            segments=SCAN_SEGMENTS,
+            FilterExpression=Attr('companyId').eq(company_id)
+        ))
         
         return {
             'statusCode': 200,
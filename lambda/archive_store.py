@@ -0,0 +1,45 @@
+"""
+Archive lạnh của dữ liệu cảm biến: mỗi phòng một manifest.json và một segment gzip mỗi ngày
+    <roomId>/manifest.json          {"firstDay", "archivedThrough", "recheckedThrough"}
+    <roomId>/<YYYY-MM-DD>.json.gz   JSON dạng cột: timestamp + từng metric
+SmartOfficeSensorArchive ghi, SmartOfficeGetData đọc
+
+Module dùng chung: đóng gói file này cùng với Lambda sử dụng nó
+"""
+import os
+import boto3
+
+class ArchiveStore:
+    """Object store for archive segments: S3-compatible bucket or a local directory stand-in"""
+
+    def __init__(self, uri):
+        if uri.startswith('file://'):
+            self.root = uri[len('file://'):]
+            self.s3 = None
+        elif uri.startswith('s3://'):
+            self.bucket, _, prefix = uri[len('s3://'):].partition('/')
+            self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+            self.s3 = boto3.client('s3', endpoint_url=os.environ.get('S3_ENDPOINT'))
+        else:
+            raise ValueError(f'Unsupported archive URI: {uri}')
+
+    def get(self, key):
+        if self.s3 is None:
+            path = os.path.join(self.root, key)
+            if not os.path.exists(path):
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        try:
+            return self.s3.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body'].read()
+        except self.s3.exceptions.NoSuchKey:
+            return None
+
+    def put(self, key, data):
+        if self.s3 is None:
+            path = os.path.join(self.root, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            return
+        self.s3.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
@@ -0,0 +1,143 @@
+"""
+Kế thừa cấu hình phòng: mặc định < profile của org < profile của office < field của chính phòng
+Profile nằm trong CONFIG_PROFILE_TABLE (PK = profileId):
+    {"profileId": "ORG#<orgAlias>", "settings": {...}, "lastUpdate": ...}
+    {"profileId": "OFFICE#<officeId>", "orgAlias": "<orgAlias>", "settings": {...}, "lastUpdate": ...}
+Office chưa có profile riêng vẫn kế thừa profile org: orgAlias được tra từ bảng Office
+
+Module dùng chung: đóng gói file này (cùng ttl_cache.py và index_query.py) với Lambda sử dụng nó
+"""
+import os
+import boto3
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+from ttl_cache import TTLCache
+from index_query import query_index
+
+PROFILE_TABLE_NAME = os.environ.get('CONFIG_PROFILE_TABLE')
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT'))
+profile_table = dynamodb.Table(PROFILE_TABLE_NAME) if PROFILE_TABLE_NAME else None
+# Bảng Office (PK orgAlias, SK entityId = OFFICE#<officeId>)
+OFFICE_TABLE_NAME = os.environ.get('OFFICE_TABLE', 'Office')
+office_table = dynamodb.Table(OFFICE_TABLE_NAME)
+# GSI entityId -> orgAlias của bảng Office: tìm org của một office mà không quét cả bảng
+OFFICE_ENTITY_INDEX_NAME = os.environ.get('OFFICE_ENTITY_INDEX', 'entityId-index')
+
+# Cấu hình mặc định mà CreateRoomConfig trước đây chép vào từng phòng
+DEFAULT_CONFIG = {
+    'temperatureMode': 'auto',
+    'targetTemperature': 26,
+    'humidityMode': 'auto',
+    'targetHumidity': 60,
+    'lightMode': 'auto',
+    'targetLight': '300'
+}
+# Các field có thể đặt ở profile, cũng là các field SmartOfficeRoomConfigHandler cho phép cập nhật trên phòng
+INHERITABLE_FIELDS = [
+    "temperatureMode",
+    "humidityMode",
+    "lightMode",
+    "targetTemperature",
+    "targetHumidity",
+    "targetLight",
+    "autoOnTime",
+    "autoOffTime",
+    "deadband"
+]
+# Deadband cho ingestion: ngưỡng thay đổi của từng metric và thời gian im lặng tối đa
+DEADBAND_KEYS = ["temperature", "humidity", "light", "maxSilenceSeconds"]
+
+# Cấu hình kế thừa đã gộp theo officeId; một lần ghi profile có hiệu lực sau tối đa TTL
+inherited_cache = TTLCache('inheritedConfig', ttl_seconds=int(os.environ.get('PROFILE_CACHE_TTL_SECONDS', '60')))
+# Office không đổi org sau khi tạo
+office_org_cache = TTLCache('officeOrg', ttl_seconds=int(os.environ.get('OFFICE_ORG_CACHE_TTL_SECONDS', '3600')))
+
+def normalize_deadband(value):
+    """Validate a deadband policy and convert its thresholds to Decimal"""
+    if not isinstance(value, dict) or not value:
+        raise ValueError('"deadband" must be a non-empty object')
+    policy = {}
+    for key, threshold in value.items():
+        if key not in DEADBAND_KEYS:
+            raise ValueError(f'Unknown deadband key: {key}')
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float, Decimal)) or threshold < 0:
+            raise ValueError(f'Deadband "{key}" must be a non-negative number')
+        policy[key] = Decimal(str(threshold))
+    return policy
+
+def profiles_enabled():
+    return profile_table is not None
+
+def office_profile_id(office_id):
+    return f'OFFICE#{office_id}'
+
+def org_profile_id(org_alias):
+    return f'ORG#{org_alias}'
+
+def load_office_org(office_id):
+    """orgAlias of an office from the Office table, None if the office is unknown"""
+    items = query_index(office_table, OFFICE_ENTITY_INDEX_NAME, 'entityId', f'OFFICE#{office_id}', ['orgAlias'])
+    return items[0]['orgAlias'] if items else None
+
+def get_office_org(office_id):
+    return office_org_cache.get_or_load(office_id, load_office_org)
+
+def list_org_office_ids(org_alias):
+    """Office IDs of an org from the Office table"""
+    office_ids = []
+    query_kwargs = {
+        'KeyConditionExpression': Key('orgAlias').eq(org_alias) & Key('entityId').begins_with('OFFICE#'),
+        'ProjectionExpression': 'entityId'
+    }
+    while True:
+        response = office_table.query(**query_kwargs)
+        office_ids.extend(item['entityId'][len('OFFICE#'):] for item in response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return office_ids
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+def load_inherited_config(office_id):
+    """
+    Defaults merged with the org and office profiles of `office_id`
+    Return {'settings': {...}, 'sources': {field: 'default' | 'org' | 'office'}}
+    """
+    settings = dict(DEFAULT_CONFIG)
+    sources = {field: 'default' for field in DEFAULT_CONFIG}
+    if profile_table is None:
+        return {'settings': settings, 'sources': sources}
+
+    office = profile_table.get_item(Key={'profileId': office_profile_id(office_id)}).get('Item') or {}
+    layers = []
+    org_alias = office.get('orgAlias') or get_office_org(office_id)
+    if org_alias:
+        org = profile_table.get_item(Key={'profileId': org_profile_id(org_alias)}).get('Item') or {}
+        layers.append(('org', org.get('settings') or {}))
+    layers.append(('office', office.get('settings') or {}))
+
+    for source, layer in layers:
+        for field, value in layer.items():
+            if field in INHERITABLE_FIELDS:
+                settings[field] = value
+                sources[field] = source
+    return {'settings': settings, 'sources': sources}
+
+def get_inherited_config(office_id):
+    return inherited_cache.get_or_load(office_id, load_inherited_config)
+
+def resolve_config(room_config, office_id, fields=None):
+    """
+    Effective config of a room: inherited values for every field the room item does not set
+    inheritedFrom cho biết field nào lấy từ đâu; `fields` giới hạn các field được thêm vào
+    """
+    inherited = get_inherited_config(office_id)
+    effective = dict(room_config)
+    inherited_from = {}
+    for field, value in inherited['settings'].items():
+        if field in room_config or (fields is not None and field not in fields):
+            continue
+        effective[field] = value
+        inherited_from[field] = inherited['sources'][field]
+    if inherited_from:
+        effective['inheritedFrom'] = inherited_from
+    return effective
@@ -0,0 +1,57 @@
+"""
+Classic device shadow của Thing: AWS IoT data plane hoặc thư mục giả lập khi test local
+IOT_SHADOW_URI: để trống = AWS IoT (IOT_DATA_ENDPOINT nếu cần), file:///path = shadow giả lập
+
+Module dùng chung: đóng gói file này cùng với Lambda sử dụng nó
+"""
+import json
+import os
+from decimal import Decimal
+
+import boto3
+
+SHADOW_URI = os.environ.get('IOT_SHADOW_URI', '')
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj) if obj % 1 == 0 else float(obj)
+        return super(DecimalEncoder, self).default(obj)
+
+class ShadowClient:
+    """Classic device shadow of a Thing: AWS IoT data plane or a local directory stand-in"""
+
+    def __init__(self, uri):
+        if uri.startswith('file://'):
+            self.root = uri[len('file://'):]
+            self.iot_data = None
+        else:
+            self.iot_data = boto3.client('iot-data', endpoint_url=os.environ.get('IOT_DATA_ENDPOINT'))
+
+    def update_desired(self, thing_name, desired):
+        payload = {'state': {'desired': desired}}
+        if self.iot_data is not None:
+            self.iot_data.update_thing_shadow(
+                thingName=thing_name,
+                payload=json.dumps(payload, cls=DecimalEncoder).encode('utf-8')
+            )
+            return
+
+        # Giả lập ngữ nghĩa của shadow: gộp desired, null xoá key, version tăng dần
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f'{thing_name}.json')
+        shadow = {'state': {'desired': {}}, 'version': 0, 'updates': 0}
+        if os.path.exists(path):
+            with open(path) as f:
+                shadow = json.load(f)
+        for key, value in json.loads(json.dumps(desired, cls=DecimalEncoder)).items():
+            if value is None:
+                shadow['state']['desired'].pop(key, None)
+            else:
+                shadow['state']['desired'][key] = value
+        shadow['version'] += 1
+        shadow['updates'] += 1
+        with open(path, 'w') as f:
+            json.dump(shadow, f)
+
+shadow_client = ShadowClient(SHADOW_URI)
@@ -0,0 +1,81 @@
+"""
+Đọc GSI, quay về scan khi index chưa tạo hoặc đang backfill
+(GSI officeId -> roomId của ROOM_CONFIG_TABLE, GSI lịch autoOn/OffBucket, GSI poolStatus của pool certificate)
+
+Module dùng chung: đóng gói file này cùng với Lambda sử dụng nó
+"""
+import os
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+
+# GSI officeId -> roomId (xem SmartOfficeRoomListHandler)
+OFFICE_INDEX_NAME = os.environ.get('ROOM_CONFIG_OFFICE_INDEX', 'officeId-roomId-index')
+INDEX_UNAVAILABLE_CODES = ('ValidationException', 'ResourceNotFoundException')
+
+def projection_kwargs(fields):
+    """ProjectionExpression with #pN placeholders, since field names may be reserved words"""
+    names = {f'#p{index}': name for index, name in enumerate(fields)}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+
+def read_all(operation, kwargs):
+    """Follow LastEvaluatedKey to the end; a filtered scan may return empty pages"""
+    items = []
+    while True:
+        response = operation(**kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return items
+        kwargs['ExclusiveStartKey'] = last_key
+
+def read_page(operation, kwargs, limit):
+    """
+    Up to `limit` items, following LastEvaluatedKey past short or empty filtered pages
+    Return (items, has_more); items bị cắt đúng `limit` nên cursor phải lấy từ item cuối được trả về
+    """
+    items = []
+    while True:
+        response = operation(**kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if len(items) >= limit or not last_key:
+            return items[:limit], len(items) > limit or bool(last_key)
+        kwargs['ExclusiveStartKey'] = last_key
+
+def query_index_page(table, index_name, key_name, value, limit, start_key=None, fields=None):
+    """One page of query_index: up to `limit` items after `start_key`, return (items, has_more)"""
+    extra = projection_kwargs(fields) if fields else {}
+    if start_key:
+        extra['ExclusiveStartKey'] = start_key
+    try:
+        return read_page(table.query, {
+            'IndexName': index_name,
+            'KeyConditionExpression': Key(key_name).eq(value),
+            'Limit': limit,
+            **extra
+        }, limit)
+    except ClientError as e:
+        if e.response['Error']['Code'] not in INDEX_UNAVAILABLE_CODES:
+            raise
+        print(f"Warning: index {index_name} on {table.name} unavailable, falling back to scan: {e}")
+    return read_page(table.scan, {'FilterExpression': Attr(key_name).eq(value), 'Limit': limit, **extra}, limit)
+
+def query_index(table, index_name, key_name, value, fields=None):
+    """Every item whose `key_name` equals `value`, from the GSI `index_name` or a filtered scan"""
+    extra = projection_kwargs(fields) if fields else {}
+    try:
+        return read_all(table.query, {
+            'IndexName': index_name,
+            'KeyConditionExpression': Key(key_name).eq(value),
+            **extra
+        })
+    except ClientError as e:
+        if e.response['Error']['Code'] not in INDEX_UNAVAILABLE_CODES:
+            raise
+        # Scan đọc cả bảng: cảnh báo để index thiếu không bị che mất
+        print(f"Warning: index {index_name} on {table.name} unavailable, falling back to scan: {e}")
+    return read_all(table.scan, {'FilterExpression': Attr(key_name).eq(value), **extra})
+
+def list_office_rooms(table, office_id, projection):
+    """Room items of an office (only the `projection` attributes) from ROOM_CONFIG_TABLE"""
+    return query_index(table, OFFICE_INDEX_NAME, 'officeId', office_id, projection)
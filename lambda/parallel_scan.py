@@ -0,0 +1,107 @@
+"""
+Parallel segmented scan cho các job cần đọc toàn bộ bảng DynamoDB
+(báo cáo vận hành, migration, danh sách user theo companyId)
+
+Module dùng chung: đóng gói file này cùng với Lambda sử dụng nó (hoặc qua một Lambda layer)
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+DEFAULT_SEGMENTS = 4
+# Số trang tối đa nằm chờ trong hàng đợi; worker bị chặn khi consumer xử lý chậm nên bộ nhớ không tăng theo kích thước bảng
+MAX_BUFFERED_PAGES = 8
+# Giá trị checkpoint của segment đã đọc xong
+SEGMENT_DONE = 'done'
+PUT_TIMEOUT_SECONDS = 0.5
+
+def new_checkpoint(segments):
+    """Checkpoint with every segment not started; JSON-serializable as long as the table keys are"""
+    return {'totalSegments': segments, 'segments': {str(segment): None for segment in range(segments)}}
+
+def is_complete(checkpoint):
+    return all(value == SEGMENT_DONE for value in checkpoint['segments'].values())
+
+def worker_table(table):
+    """
+    Same table on a resource of its own: boto3 resources are not thread-safe
+    Worker dùng session riêng, cùng region/endpoint với `table`
+    """
+    client = table.meta.client
+    resource = boto3.session.Session().resource(
+        'dynamodb',
+        region_name=client.meta.region_name,
+        endpoint_url=client.meta.endpoint_url
+    )
+    return resource.Table(table.name)
+
+def scan_segment(table, segment, total_segments, start_key, scan_kwargs, pages, stop):
+    """Read one segment to completion, handing each page to the consumer through `pages`"""
+    kwargs = {**scan_kwargs, 'Segment': segment, 'TotalSegments': total_segments}
+    if start_key:
+        kwargs['ExclusiveStartKey'] = start_key
+    try:
+        table = worker_table(table)
+        while not stop.is_set():
+            response = table.scan(**kwargs)
+            last_key = response.get('LastEvaluatedKey')
+            put_page(pages, (segment, response.get('Items', []), last_key, None), stop)
+            if not last_key:
+                return
+            kwargs['ExclusiveStartKey'] = last_key
+    except Exception as e:
+        put_page(pages, (segment, [], None, e), stop)
+
+def put_page(pages, page, stop):
+    while not stop.is_set():
+        try:
+            pages.put(page, timeout=PUT_TIMEOUT_SECONDS)
+            return
+        except queue.Full:
+            continue
+
+def parallel_scan(table, segments=DEFAULT_SEGMENTS, checkpoint=None, on_checkpoint=None, **scan_kwargs):
+    """
+    Scan `table` with `segments` concurrent segment workers and yield items as pages arrive
+
+    scan_kwargs được truyền thẳng cho table.scan (FilterExpression, ProjectionExpression, ...)
+    checkpoint: dict từ new_checkpoint() hoặc từ lần chạy trước; được cập nhật tại chỗ sau mỗi trang
+    on_checkpoint(checkpoint): gọi sau khi mọi item của một trang đã được yield, để lưu lại và chạy tiếp khi bị ngắt
+    Trang đang xử lý dở khi bị ngắt sẽ được đọc lại (at-least-once)
+    """
+    if checkpoint is None:
+        checkpoint = new_checkpoint(segments)
+    total_segments = checkpoint['totalSegments']
+    pending = {
+        int(segment): start_key
+        for segment, start_key in checkpoint['segments'].items()
+        if start_key != SEGMENT_DONE
+    }
+    if not pending:
+        return
+
+    pages = queue.Queue(maxsize=MAX_BUFFERED_PAGES)
+    stop = threading.Event()
+    # Mỗi worker tự tạo resource qua worker_table: không dùng chung `table` giữa các thread
+    executor = ThreadPoolExecutor(max_workers=len(pending))
+    try:
+        for segment, start_key in pending.items():
+            executor.submit(scan_segment, table, segment, total_segments, start_key, scan_kwargs, pages, stop)
+
+        remaining = len(pending)
+        while remaining:
+            segment, items, last_key, error = pages.get()
+            if error is not None:
+                raise error
+            yield from items
+            checkpoint['segments'][str(segment)] = last_key or SEGMENT_DONE
+            if not last_key:
+                remaining -= 1
+            if on_checkpoint:
+                on_checkpoint(checkpoint)
+    finally:
+        # Consumer dừng sớm hoặc có lỗi: báo các worker dừng thay vì đọc tiếp cả bảng
+        stop.set()
+        executor.shutdown(wait=True)
@@ -0,0 +1,55 @@
+"""
+Lịch bật/tắt theo phòng: autoOnTime/autoOffTime là giờ địa phương "HH:MM"
+Mỗi lần ghi cấu hình (phòng hoặc profile office/org) cũng ghi bucket tương ứng (phút trong ngày theo UTC, "HH:MM"),
+là partition key của GSI thưa mà SmartOfficeScheduler truy vấn mỗi phút
+
+Module dùng chung: đóng gói file này cùng với Lambda sử dụng nó
+"""
+import os
+import re
+
+# Field lịch -> attribute bucket (partition key của GSI)
+SCHEDULE_FIELDS = {
+    'autoOnTime': 'autoOnBucket',
+    'autoOffTime': 'autoOffBucket'
+}
+# Độ lệch giờ địa phương so với UTC, vd. "+07:00"
+SCHEDULE_UTC_OFFSET = os.environ.get('SCHEDULE_UTC_OFFSET', '+07:00')
+
+TIME_PATTERN = re.compile(r'^(\d{1,2}):(\d{2})(?::00)?$')
+OFFSET_PATTERN = re.compile(r'^([+-])(\d{2}):(\d{2})$')
+
+def offset_minutes(offset=SCHEDULE_UTC_OFFSET):
+    match = OFFSET_PATTERN.match(offset)
+    if not match:
+        raise ValueError(f'Invalid SCHEDULE_UTC_OFFSET: {offset}')
+    sign = -1 if match.group(1) == '-' else 1
+    return sign * (int(match.group(2)) * 60 + int(match.group(3)))
+
+def normalize_time(field, value):
+    """Validate a schedule time and return it as "HH:MM" """
+    match = TIME_PATTERN.match(value) if isinstance(value, str) else None
+    if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+        raise ValueError(f'"{field}" must be a time "HH:MM"')
+    return f'{int(match.group(1)):02d}:{match.group(2)}'
+
+def minute_bucket(minute_of_day):
+    minute_of_day %= 24 * 60
+    return f'{minute_of_day // 60:02d}:{minute_of_day % 60:02d}'
+
+def time_bucket(local_time):
+    """UTC bucket of a local "HH:MM" time"""
+    hours, minutes = local_time.split(':')
+    return minute_bucket(int(hours) * 60 + int(minutes) - offset_minutes())
+
+def current_bucket(now):
+    """Bucket of a UTC datetime"""
+    return minute_bucket(now.hour * 60 + now.minute)
+
+def settings_buckets(settings):
+    """{bucket attribute: bucket} for the schedule times present in `settings`"""
+    return {
+        bucket_attribute: time_bucket(normalize_time(field, settings[field]))
+        for field, bucket_attribute in SCHEDULE_FIELDS.items()
+        if settings.get(field) is not None
+    }
@@ -0,0 +1,62 @@
+import json
+
+import boto3
+import pytest
+
+READY_INDEX = {'poolStatus-createdAt-index': (('poolStatus', 'S'), ('createdAt', 'N'))}
+
+@pytest.fixture
+def pool(create_table, monkeypatch):
+    table = create_table('CertPool', ('certificateId', 'S'), indexes=READY_INDEX)
+    create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'))
+    boto3.client('iot').create_policy(policyName='SmartOffice-DevicePolicy', policyDocument=json.dumps({
+        'Version': '2012-10-17',
+        'Statement': [{'Effect': 'Allow', 'Action': 'iot:Connect', 'Resource': '*'}]
+    }))
+    key_id = boto3.client('kms').create_key()['KeyMetadata']['KeyId']
+    monkeypatch.setenv('CERT_POOL_CREATE_INTERVAL_SECONDS', '0')
+    return table, key_id
+
+def fill_pool(load_lambda, key_id, target_size):
+    job = load_lambda('SmartOfficeCertificatePool', CERT_POOL_TABLE='CertPool', CERT_POOL_KMS_KEY_ID=key_id)
+    return job.lambda_handler({'targetSize': target_size}, None)
+
+def create_room(load_lambda, room_id, **env):
+    handler = load_lambda('CreateRoomConfig', ROOM_CONFIG_TABLE='RoomConfig', **env)
+    response = handler.lambda_handler({'body': json.dumps({'officeId': 'O1', 'roomId': room_id})}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+def test_pool_is_filled_to_target_with_encrypted_keys(load_lambda, pool):
+    table, key_id = pool
+
+    assert fill_pool(load_lambda, key_id, 3) == {'ready': 3, 'target': 3, 'created': 3, 'errors': 0}
+    assert fill_pool(load_lambda, key_id, 3)['created'] == 0
+
+    iot = boto3.client('iot')
+    for item in table.scan()['Items']:
+        assert item['poolStatus'] == 'READY'
+        assert b'PRIVATE KEY' not in bytes(item['encryptedPrivateKey'])
+        assert iot.describe_certificate(certificateId=item['certificateId'])['certificateDescription']['status'] == 'ACTIVE'
+        assert [policy['policyName'] for policy in iot.list_attached_policies(target=item['certificateArn'])['policies']] == \
+            ['SmartOffice-DevicePolicy']
+
+def test_room_creation_claims_a_pooled_certificate(load_lambda, pool):
+    table, key_id = pool
+    fill_pool(load_lambda, key_id, 2)
+    pooled = {item['certificateArn']: item for item in table.scan()['Items']}
+
+    status, body = create_room(load_lambda, 'R1', CERT_POOL_TABLE='CertPool')
+
+    assert status == 200 and body['privateKey'].startswith('-----BEGIN')
+    room = boto3.resource('dynamodb').Table('RoomConfig').get_item(Key={'roomId': 'R1', 'officeId': 'O1'})['Item']
+    claimed = pooled[room['certificateArn']]
+    assert body['certificatePem'] == claimed['certificatePem']
+    # Certificate đã nhận không còn trong pool, và được gắn vào Thing của phòng
+    assert len(table.scan()['Items']) == 1
+    assert boto3.client('iot').list_thing_principals(thingName=body['thingName'])['principals'] == [room['certificateArn']]
+
+def test_room_creation_falls_back_when_the_pool_is_empty(load_lambda, pool):
+    status, body = create_room(load_lambda, 'R1', CERT_POOL_TABLE='CertPool')
+
+    assert status == 200 and body['privateKey'].startswith('-----BEGIN')
+    assert create_room(load_lambda, 'R1', CERT_POOL_TABLE='CertPool')[0] == 409
@@ -0,0 +1,79 @@
+import time
+from decimal import Decimal
+
+OFFICE_INDEX = {'officeId-roomId-index': (('officeId', 'S'), ('roomId', 'S'))}
+DAY = 86400
+# Đủ cũ để SmartOfficeSensorArchive (ARCHIVE_AFTER_DAYS=7) đã archive
+DAY_START = (int(time.time()) // DAY - 9) * DAY
+
+def create_tables(create_table):
+    log = create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'), indexes=OFFICE_INDEX)
+    stats = create_table('ComfortStats', ('roomId', 'S'), ('day', 'S'))
+    return log, rooms, stats
+
+def load_comfort_stats(load_lambda, **env):
+    return load_lambda(
+        'SmartOfficeComfortStats',
+        SENSOR_LOG_TABLE='SensorLog',
+        ROOM_CONFIG_TABLE='RoomConfig',
+        COMFORT_STATS_TABLE='ComfortStats',
+        **env
+    )
+
+def stored_day(stats, room_id):
+    return stats.get_item(Key={'roomId': room_id, 'day': time.strftime('%Y-%m-%d', time.gmtime(DAY_START))}).get('Item')
+
+def test_recompute_merges_archived_and_hot_readings(create_table, load_lambda, tmp_path):
+    log, rooms, stats = create_tables(create_table)
+    rooms.put_item(Item={'roomId': 'R1', 'officeId': 'O1', 'targetTemperature': '24 °C'})
+    # 12 giờ đầu của ngày, mỗi 5 phút: 6 giờ đúng target rồi 6 giờ nóng hơn 3 °C
+    readings = [
+        {'roomId': 'R1', 'timestamp': DAY_START + index * 300, 'temperature': Decimal(24 if index < 72 else 27)}
+        for index in range(144)
+    ]
+    with log.batch_writer() as writer:
+        for item in readings:
+            writer.put_item(Item=item)
+    archive_uri = f'file://{tmp_path}'
+    load_lambda('SmartOfficeSensorArchive', SENSOR_LOG_TABLE='SensorLog', SENSOR_ARCHIVE_URI=archive_uri) \
+        .lambda_handler({'roomIds': ['R1']}, None)
+    # Nửa đầu đã hết TTL trong bảng nóng, chỉ còn trong archive
+    for item in readings[:72]:
+        log.delete_item(Key={'roomId': 'R1', 'timestamp': item['timestamp']})
+    comfort = load_comfort_stats(load_lambda, SENSOR_ARCHIVE_URI=archive_uri)
+
+    result = comfort.lambda_handler({'day': time.strftime('%Y-%m-%d', time.gmtime(DAY_START)), 'roomIds': ['R1']}, None)
+
+    assert result['stored'] == 1 and result['failed'] == {}
+    summary = stored_day(stats, 'R1')
+    assert summary['samples'] == 144 and summary['officeId'] == 'O1'
+    assert summary['dataGapMinutes'] == 720
+    temperature = summary['temperature']
+    assert temperature['minutesCovered'] == 720
+    assert temperature['minutesInBand'] == 360 and temperature['minutesAbove'] == 360
+    assert temperature['percentInBand'] == 50
+    assert temperature['mean'] == Decimal('25.5') and temperature['meanDeviation'] == Decimal('1.5')
+    assert (temperature['min'], temperature['p50'], temperature['max']) == (24, Decimal('25.5'), 27)
+    assert summary['humidity'] == {'samples': 0}
+
+def test_daily_job_lists_rooms_without_a_full_single_threaded_scan(create_table, load_lambda, monkeypatch):
+    log, rooms, stats = create_tables(create_table)
+    for room_id, office_id in (('R1', 'O1'), ('R2', 'O1'), ('R3', 'O2')):
+        rooms.put_item(Item={'roomId': room_id, 'officeId': office_id, 'targetTemperature': 24})
+        log.put_item(Item={'roomId': room_id, 'timestamp': DAY_START + 60, 'temperature': Decimal(24)})
+    comfort = load_comfort_stats(load_lambda)
+
+    def no_scan(**kwargs):
+        raise AssertionError('RoomConfig must not be scanned on the handler resource')
+
+    monkeypatch.setattr(comfort.room_config_table, 'scan', no_scan)
+    day = time.strftime('%Y-%m-%d', time.gmtime(DAY_START))
+
+    # Mọi phòng: parallel_scan trên resource riêng của từng worker
+    assert comfort.lambda_handler({'day': day}, None)['stored'] == 3
+    assert all(stored_day(stats, room_id)['temperature']['percentInBand'] == 100 for room_id in ('R1', 'R2', 'R3'))
+
+    # Một office qua GSI, phòng chỉ định qua partition key
+    assert comfort.lambda_handler({'day': day, 'officeId': 'O1'}, None)['stored'] == 2
+    assert comfort.lambda_handler({'day': day, 'roomIds': ['R3', 'R9']}, None)['stored'] == 1
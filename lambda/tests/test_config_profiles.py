@@ -0,0 +1,84 @@
+import json
+import sys
+from decimal import Decimal
+
+OFFICE_INDEX = {'officeId-roomId-index': (('officeId', 'S'), ('roomId', 'S'))}
+
+def post(handler, body):
+    response = handler.lambda_handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+def load_profile_handler(create_table, load_lambda, **env):
+    profiles = create_table('Profiles', ('profileId', 'S'))
+    create_table('Office', ('orgAlias', 'S'), ('entityId', 'S'))
+    handler = load_lambda('SmartOfficeConfigProfileHandler', CONFIG_PROFILE_TABLE='Profiles', **env)
+    return handler, profiles
+
+def test_reset_on_org_profile_is_rejected_before_saving(create_table, load_lambda):
+    create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'), indexes=OFFICE_INDEX)
+    handler, profiles = load_profile_handler(create_table, load_lambda, ROOM_CONFIG_TABLE='RoomConfig')
+
+    status, body = post(handler, {'orgAlias': 'acme', 'settings': {'targetTemperature': 24}, 'resetRoomOverrides': True})
+
+    assert status == 400 and 'officeId' in body['error']
+    assert 'Item' not in profiles.get_item(Key={'profileId': 'ORG#acme'})
+
+def test_reset_without_room_table_is_rejected_before_saving(create_table, load_lambda):
+    handler, profiles = load_profile_handler(create_table, load_lambda)
+
+    status, body = post(handler, {'officeId': 'O1', 'settings': {'targetTemperature': 24}, 'resetRoomOverrides': True})
+
+    assert status == 400 and 'ROOM_CONFIG_TABLE' in body['error']
+    assert 'Item' not in profiles.get_item(Key={'profileId': 'OFFICE#O1'})
+
+def test_reset_removes_room_overrides_of_profile_fields(create_table, load_lambda):
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'), indexes=OFFICE_INDEX)
+    rooms.put_item(Item={'roomId': 'R1', 'officeId': 'O1', 'targetTemperature': 26, 'targetLight': '300'})
+    rooms.put_item(Item={'roomId': 'R2', 'officeId': 'O2', 'targetTemperature': 26})
+    handler, profiles = load_profile_handler(create_table, load_lambda, ROOM_CONFIG_TABLE='RoomConfig')
+
+    status, body = post(handler, {'officeId': 'O1', 'settings': {'targetTemperature': 24}, 'resetRoomOverrides': True})
+
+    assert status == 200 and body['roomsReset'] == 1
+    assert profiles.get_item(Key={'profileId': 'OFFICE#O1'})['Item']['settings'] == {'targetTemperature': Decimal(24)}
+    room = rooms.get_item(Key={'roomId': 'R1', 'officeId': 'O1'})['Item']
+    assert 'targetTemperature' not in room and room['targetLight'] == '300'
+    assert rooms.get_item(Key={'roomId': 'R2', 'officeId': 'O2'})['Item']['targetTemperature'] == 26
+
+def test_office_without_profile_inherits_its_org_profile_without_scanning(create_table, load_lambda, monkeypatch):
+    profiles = create_table('Profiles', ('profileId', 'S'))
+    offices = create_table('Office', ('orgAlias', 'S'), ('entityId', 'S'), indexes={'entityId-index': (('entityId', 'S'), None)})
+    offices.put_item(Item={'orgAlias': 'acme', 'entityId': 'OFFICE#O1'})
+    offices.put_item(Item={'orgAlias': 'acme', 'entityId': 'MANAGER#M1'})
+    profiles.put_item(Item={'profileId': 'ORG#acme', 'settings': {'targetTemperature': Decimal(23)}})
+    handler = load_lambda('SmartOfficeConfigProfileHandler', CONFIG_PROFILE_TABLE='Profiles')
+
+    def no_scan(**kwargs):
+        raise AssertionError('Office table must not be scanned')
+
+    monkeypatch.setattr(sys.modules['config_profiles'].office_table, 'scan', no_scan)
+    response = handler.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {'officeId': 'O1'}}, None)
+
+    effective = json.loads(response['body'])['effective']
+    assert effective['settings']['targetTemperature'] == 23
+    assert effective['sources']['targetTemperature'] == 'org'
+    assert effective['sources']['targetLight'] == 'default'
+
+def test_room_reads_resolve_room_then_office_then_org_then_defaults(create_table, load_lambda):
+    profiles = create_table('Profiles', ('profileId', 'S'))
+    create_table('Office', ('orgAlias', 'S'), ('entityId', 'S'), indexes={'entityId-index': (('entityId', 'S'), None)})
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'))
+    profiles.put_item(Item={'profileId': 'ORG#acme', 'settings': {'targetTemperature': 23, 'targetHumidity': 55}})
+    profiles.put_item(Item={'profileId': 'OFFICE#O1', 'orgAlias': 'acme', 'settings': {'targetHumidity': 45}})
+    rooms.put_item(Item={'roomId': 'R1', 'officeId': 'O1', 'targetLight': '500'})
+    handler = load_lambda('SmartOfficeRoomConfigGetHandler', ROOM_CONFIG_TABLE='RoomConfig', CONFIG_PROFILE_TABLE='Profiles')
+
+    response = handler.lambda_handler({'queryStringParameters': {'officeId': 'O1', 'roomId': 'R1'}}, None)
+
+    room = json.loads(response['body'])
+    assert (room['targetLight'], room['targetHumidity'], room['targetTemperature']) == ('500', 45, 23)
+    assert room['temperatureMode'] == 'auto'
+    assert room['inheritedFrom']['targetHumidity'] == 'office'
+    assert room['inheritedFrom']['targetTemperature'] == 'org'
+    assert room['inheritedFrom']['temperatureMode'] == 'default'
+    assert 'targetLight' not in room['inheritedFrom']
@@ -0,0 +1,108 @@
+import json
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeSerializer
+
+serializer = TypeSerializer()
+OFFICE_INDEX = {'officeId-roomId-index': (('officeId', 'S'), ('roomId', 'S'))}
+
+def serialize(item):
+    return {key: serializer.serialize(value) for key, value in item.items()} if item else None
+
+def modify_record(sequence, keys, old, new):
+    data = {'Keys': serialize(keys), 'SequenceNumber': str(sequence)}
+    if old:
+        data['OldImage'] = serialize(old)
+    if new:
+        data['NewImage'] = serialize(new)
+    event_name = 'MODIFY' if old and new else ('INSERT' if new else 'REMOVE')
+    return {'eventName': event_name, 'dynamodb': data}
+
+def room(**fields):
+    return {'roomId': 'R1', 'officeId': 'O1', 'thingName': 'T1', **fields}
+
+def room_record(sequence, old_temperature, new_temperature):
+    return modify_record(
+        sequence,
+        {'roomId': 'R1', 'officeId': 'O1'},
+        room(targetTemperature=Decimal(old_temperature)),
+        room(targetTemperature=Decimal(new_temperature))
+    )
+
+def read_shadow(shadow_dir, thing_name):
+    path = shadow_dir / f'{thing_name}.json'
+    return json.loads(path.read_text()) if path.exists() else None
+
+def load_push(load_lambda, shadow_dir, **env):
+    return load_lambda('SmartOfficeConfigShadowPush', IOT_SHADOW_URI=f'file://{shadow_dir}', **env)
+
+def test_slider_changes_are_coalesced_into_one_shadow_update(load_lambda, tmp_path):
+    push = load_push(load_lambda, tmp_path)
+    # Kéo slider 24 -> 25 -> 26 -> 25.5; stream có thể giao các record không theo thứ tự trong batch
+    records = [room_record(3, '26', '25.5'), room_record(1, '24', '25'), room_record(2, '25', '26')]
+
+    result = push.lambda_handler({'Records': records}, None)
+
+    assert result == {'records': 3, 'shadowUpdates': 1}
+    shadow = read_shadow(tmp_path, 'T1')
+    assert shadow['updates'] == 1
+    assert shadow['state']['desired'] == {'targetTemperature': 25.5}
+
+def test_changes_that_cancel_out_push_nothing(load_lambda, tmp_path):
+    push = load_push(load_lambda, tmp_path)
+    records = [room_record(1, '24', '25'), room_record(2, '25', '24')]
+
+    result = push.lambda_handler({'Records': records}, None)
+
+    assert result['shadowUpdates'] == 0
+    assert read_shadow(tmp_path, 'T1') is None
+
+def test_removed_field_is_cleared_and_rooms_without_thing_are_skipped(load_lambda, tmp_path):
+    push = load_push(load_lambda, tmp_path)
+    records = [
+        modify_record(1, {'roomId': 'R1', 'officeId': 'O1'}, room(autoOnTime='07:30'), room()),
+        modify_record(
+            2,
+            {'roomId': 'R2', 'officeId': 'O1'},
+            {'roomId': 'R2', 'officeId': 'O1', 'targetLight': '300'},
+            {'roomId': 'R2', 'officeId': 'O1', 'targetLight': '400'}
+        ),
+        modify_record(3, {'roomId': 'R3', 'officeId': 'O1'}, {'roomId': 'R3', 'officeId': 'O1', 'thingName': 'T3'}, None)
+    ]
+    push.lambda_handler({'Records': records}, None)
+
+    assert read_shadow(tmp_path, 'T1')['state']['desired'] == {}
+    assert read_shadow(tmp_path, 'T1')['updates'] == 1
+    assert read_shadow(tmp_path, 'T2') is None and read_shadow(tmp_path, 'T3') is None
+
+def test_profile_change_reaches_inheriting_rooms_only(create_table, load_lambda, tmp_path):
+    profiles = create_table('Profiles', ('profileId', 'S'))
+    profiles.put_item(Item={'profileId': 'ORG#acme', 'settings': {'targetLight': '500'}})
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'), indexes=OFFICE_INDEX)
+    offices = create_table('Office', ('orgAlias', 'S'), ('entityId', 'S'))
+    offices.put_item(Item={'orgAlias': 'acme', 'entityId': 'OFFICE#O1'})
+    rooms.put_item(Item={'roomId': 'R1', 'officeId': 'O1', 'thingName': 'T1'})
+    rooms.put_item(Item={'roomId': 'R2', 'officeId': 'O1', 'thingName': 'T2', 'targetLight': '250'})
+    rooms.put_item(Item={'roomId': 'R3', 'officeId': 'O1', 'thingName': 'T3'})
+    push = load_push(load_lambda, tmp_path, CONFIG_PROFILE_TABLE='Profiles', ROOM_CONFIG_TABLE='RoomConfig')
+
+    records = [
+        modify_record(
+            1,
+            {'profileId': 'ORG#acme'},
+            {'profileId': 'ORG#acme', 'settings': {'targetLight': '300'}},
+            {'profileId': 'ORG#acme', 'settings': {'targetLight': '500'}}
+        ),
+        # R3 tự đặt targetLight trong cùng batch: giá trị của phòng thắng giá trị kế thừa
+        modify_record(
+            2,
+            {'roomId': 'R3', 'officeId': 'O1'},
+            {'roomId': 'R3', 'officeId': 'O1', 'thingName': 'T3'},
+            {'roomId': 'R3', 'officeId': 'O1', 'thingName': 'T3', 'targetLight': '150'}
+        )
+    ]
+    push.lambda_handler({'Records': records}, None)
+
+    assert read_shadow(tmp_path, 'T1')['state']['desired'] == {'targetLight': '500'}
+    assert read_shadow(tmp_path, 'T2') is None
+    assert read_shadow(tmp_path, 'T3')['state']['desired'] == {'targetLight': '150'}
@@ -0,0 +1,67 @@
+import base64
+import gzip
+import json
+
+OFFICE_INDEX = {'officeId-roomId-index': (('officeId', 'S'), ('roomId', 'S'))}
+
+def load_snapshot(create_table, load_lambda, room_count=2):
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'), indexes=OFFICE_INDEX)
+    for index in range(room_count):
+        rooms.put_item(Item={
+            'roomId': f'R{index}', 'officeId': 'O1', 'thingName': f'T{index}',
+            'targetTemperature': 24, 'certificateArn': 'arn:aws:iot:cert/secret'
+        })
+    rooms.put_item(Item={'roomId': 'X1', 'officeId': 'O2', 'targetTemperature': 20})
+    return load_lambda('SmartOfficeConfigSnapshot', ROOM_CONFIG_TABLE='RoomConfig'), rooms
+
+def get(handler, **headers):
+    return handler.lambda_handler({'queryStringParameters': {'officeId': 'O1'}, 'headers': headers}, None)
+
+def test_snapshot_carries_only_control_fields_and_an_etag(create_table, load_lambda):
+    handler, _ = load_snapshot(create_table, load_lambda)
+
+    response = get(handler)
+
+    assert response['statusCode'] == 200
+    assert response['headers']['ETag'].startswith('"')
+    body = json.loads(response['body'])
+    assert body['roomCount'] == 2
+    assert body['rooms']['R0'] == {'thingName': 'T0', 'targetTemperature': 24}
+
+def test_matching_if_none_match_returns_304_without_body(create_table, load_lambda):
+    handler, _ = load_snapshot(create_table, load_lambda)
+    etag = get(handler)['headers']['ETag']
+
+    for value in (etag, f'W/{etag}', f'"other", {etag}'):
+        response = get(handler, **{'If-None-Match': value})
+        assert response['statusCode'] == 304 and response['body'] == ''
+        assert response['headers']['ETag'] == etag
+    assert get(handler, **{'if-none-match': '"stale"'})['statusCode'] == 200
+
+def test_etag_changes_when_a_room_changes(create_table, load_lambda):
+    handler, rooms = load_snapshot(create_table, load_lambda)
+    etag = get(handler)['headers']['ETag']
+
+    rooms.update_item(
+        Key={'roomId': 'R1', 'officeId': 'O1'},
+        UpdateExpression='SET targetTemperature = :value',
+        ExpressionAttributeValues={':value': 22}
+    )
+    # Trong TTL của cache container vẫn trả snapshot cũ; sau TTL thì đọc lại
+    assert get(handler, **{'If-None-Match': etag})['statusCode'] == 304
+    handler.snapshot_cache.clear()
+    response = get(handler, **{'If-None-Match': etag})
+
+    assert response['statusCode'] == 200 and response['headers']['ETag'] != etag
+    assert json.loads(response['body'])['rooms']['R1']['targetTemperature'] == 22
+
+def test_large_snapshot_is_gzipped_when_accepted(create_table, load_lambda):
+    handler, _ = load_snapshot(create_table, load_lambda, room_count=40)
+
+    plain = get(handler)
+    compressed = get(handler, **{'Accept-Encoding': 'gzip, deflate'})
+
+    assert 'Content-Encoding' not in plain['headers']
+    assert compressed['headers']['Content-Encoding'] == 'gzip' and compressed['isBase64Encoded']
+    assert gzip.decompress(base64.b64decode(compressed['body'])).decode('utf-8') == plain['body']
+    assert compressed['headers']['ETag'] == plain['headers']['ETag']
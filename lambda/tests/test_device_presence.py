@@ -0,0 +1,65 @@
+import json
+
+THING_INDEX = {'thingName-index': (('thingName', 'S'), None)}
+
+def lifecycle(event_type, timestamp, thing_name='T1'):
+    return {'eventType': event_type, 'clientId': thing_name, 'timestamp': timestamp}
+
+def sqs_event(messages):
+    return {'Records': [
+        {'messageId': f'm{index}', 'body': json.dumps(message)}
+        for index, message in enumerate(messages)
+    ]}
+
+def load_presence(create_table, load_lambda):
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'), indexes=THING_INDEX)
+    rooms.put_item(Item={'roomId': 'R1', 'officeId': 'O1', 'thingName': 'T1', 'connectionStatus': 'OFFLINE'})
+    presence = load_lambda('SmartOfficeDevicePresence', ROOM_CONFIG_TABLE='RoomConfig')
+    return presence, rooms
+
+def handle(presence, *messages):
+    # Mỗi lần gọi như một container khác: không dựa vào watermark trong bộ nhớ
+    presence.presence_cache.clear()
+    return presence.lambda_handler(sqs_event(messages), None)
+
+def stored_room(rooms):
+    return rooms.get_item(Key={'roomId': 'R1', 'officeId': 'O1'})['Item']
+
+def test_only_status_changes_touch_last_seen(create_table, load_lambda):
+    presence, rooms = load_presence(create_table, load_lambda)
+
+    assert handle(presence, lifecycle('connected', 1000))['transitions'] == 1
+    # Kết nối lại cùng trạng thái: chỉ watermark tiến lên, lastSeen (phiên bản cache của phòng) giữ nguyên
+    result = handle(presence, lifecycle('connected', 2000))
+
+    assert result['transitions'] == 0 and result['written'] == 1
+    room = stored_room(rooms)
+    assert room['connectionStatus'] == 'ONLINE'
+    assert room['lastSeen'] == 1000 and room['lastEventAt'] == 2000
+
+def test_late_event_cannot_flip_the_status(create_table, load_lambda):
+    presence, rooms = load_presence(create_table, load_lambda)
+    handle(presence, lifecycle('connected', 1000))
+    handle(presence, lifecycle('connected', 2000))
+
+    # disconnected cũ hơn watermark (đến sau khi thiết bị đã kết nối lại)
+    result = handle(presence, lifecycle('disconnected', 1500))
+
+    assert result['written'] == 0 and result['transitions'] == 0
+    assert stored_room(rooms)['connectionStatus'] == 'ONLINE'
+
+def test_flapping_device_is_coalesced_to_its_latest_event(create_table, load_lambda):
+    presence, rooms = load_presence(create_table, load_lambda)
+
+    result = handle(
+        presence,
+        lifecycle('connected', 1000),
+        lifecycle('disconnected', 3000),
+        lifecycle('connected', 2000),
+        {**lifecycle('disconnected', 4000), 'disconnectReason': 'DUPLICATE_CLIENTID'}
+    )
+
+    assert result == {'events': 4, 'things': 1, 'written': 1, 'transitions': 0, 'batchItemFailures': []}
+    room = stored_room(rooms)
+    assert room['connectionStatus'] == 'OFFLINE' and room['lastEventAt'] == 3000
+    assert 'lastSeen' not in room
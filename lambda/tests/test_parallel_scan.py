@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from boto3.dynamodb.conditions import Attr
+
+ROOM_IDS = {f'R{index:03d}' for index in range(60)}
+
+@pytest.fixture
+def rooms(create_table):
+    table = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'))
+    with table.batch_writer() as writer:
+        for room_id in ROOM_IDS:
+            writer.put_item(Item={'roomId': room_id, 'officeId': 'O1' if int(room_id[1:]) % 2 else 'O2'})
+    return table
+
+def test_every_item_is_read_exactly_once(rooms, load_lambda):
+    scanner = load_lambda('parallel_scan')
+    checkpoints = []
+
+    items = list(scanner.parallel_scan(rooms, segments=4, on_checkpoint=lambda c: checkpoints.append(json.dumps(c)), Limit=5))
+
+    assert sorted(item['roomId'] for item in items) == sorted(ROOM_IDS)
+    assert scanner.is_complete(json.loads(checkpoints[-1]))
+
+def test_scan_kwargs_are_passed_through(rooms, load_lambda):
+    scanner = load_lambda('parallel_scan')
+
+    items = list(scanner.parallel_scan(rooms, segments=3, FilterExpression=Attr('officeId').eq('O1'), ProjectionExpression='roomId'))
+
+    assert {item['roomId'] for item in items} == {room_id for room_id in ROOM_IDS if int(room_id[1:]) % 2}
+    assert all(set(item) == {'roomId'} for item in items)
+
+def test_interrupted_scan_resumes_from_its_checkpoint(rooms, load_lambda):
+    scanner = load_lambda('parallel_scan')
+    saved = []
+    read = []
+    committed = 0
+
+    def save(checkpoint):
+        nonlocal committed
+        # Lưu như một job thật: bản sao JSON, cùng số item đã xử lý xong tính tới checkpoint này
+        saved.append(json.loads(json.dumps(checkpoint)))
+        committed = len(read)
+
+    for item in scanner.parallel_scan(rooms, segments=4, on_checkpoint=save, Limit=5):
+        read.append(item['roomId'])
+        if len(saved) == 3:
+            break
+    checkpoint = saved[-1]
+    assert not scanner.is_complete(checkpoint)
+
+    resumed = [item['roomId'] for item in scanner.parallel_scan(rooms, checkpoint=checkpoint)]
+
+    # At-least-once: không mất item nào, và các trang đã checkpoint không bị đọc lại
+    assert set(read[:committed]) | set(resumed) == ROOM_IDS
+    assert len(resumed) == len(ROOM_IDS) - committed
+    assert scanner.is_complete(checkpoint)
+    assert list(scanner.parallel_scan(rooms, checkpoint=checkpoint)) == []
+
+def test_segment_errors_reach_the_consumer(rooms, load_lambda):
+    scanner = load_lambda('parallel_scan')
+
+    with pytest.raises(Exception, match='ValidationException'):
+        list(scanner.parallel_scan(rooms, segments=2, ProjectionExpression=''))
+
+def test_user_list_reads_every_page_of_the_company(create_table, load_lambda):
+    users = create_table('Users', ('userId', 'S'))
+    with users.batch_writer() as writer:
+        for index in range(40):
+            writer.put_item(Item={'userId': f'U{index}', 'companyId': 'C1' if index % 4 else 'C2'})
+    handler = load_lambda('SmartOfficeUserListHandler', USER_TABLE_NAME='Users')
+
+    response = handler.lambda_handler({'queryStringParameters': {'companyId': 'C2'}}, None)
+
+    body = json.loads(response['body'])
+    assert body['userCount'] == 10
+    assert sorted(user['userId'] for user in body['users']) == sorted(f'U{index}' for index in range(0, 40, 4))
@@ -0,0 +1,99 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+CACHE_MODES = pytest.mark.parametrize('cache_ttl', ['0', '30'], ids=['no-cache', 'cache'])
+
+def load_handler(create_table, load_lambda, cache_ttl):
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'))
+    latest = create_table('SensorLatest', ('roomId', 'S'))
+    for room_id, office_id in (('R1', 'O1'), ('R2', 'O1'), ('R3', 'O2')):
+        rooms.put_item(Item={
+            'roomId': room_id, 'officeId': office_id, 'targetTemperature': 24,
+            'temperatureMode': 'auto', 'lastUpdate': '2026-10-01T00:00:00+00:00'
+        })
+        latest.put_item(Item={'roomId': room_id, 'currentTemperature': Decimal('25.5'), 'currentHumidity': 60, 'lastReadingAt': 1000})
+    handler = load_lambda(
+        'SmartOfficeRoomConfigGetHandler',
+        ROOM_CONFIG_TABLE='RoomConfig',
+        SENSOR_LATEST_TABLE='SensorLatest',
+        CONFIG_CACHE_TTL_SECONDS=cache_ttl
+    )
+    return handler
+
+def call(handler, event):
+    response = handler.lambda_handler(event, None)
+    return response['statusCode'], json.loads(response['body'])
+
+@CACHE_MODES
+def test_batch_get_with_fields_returns_only_those_fields(create_table, load_lambda, cache_ttl):
+    handler = load_handler(create_table, load_lambda, cache_ttl)
+    params = {'officeId': 'O1', 'roomIds': 'R1,R2,R9,R1', 'fields': 'targetTemperature,currentTemperature'}
+
+    # Gọi hai lần: lần hai (khi bật cache) đọc từ cache container
+    for _ in range(2):
+        status, body = call(handler, {'queryStringParameters': params})
+        assert status == 200
+        assert body['rooms'] == {
+            'R1': {'targetTemperature': 24, 'currentTemperature': 25.5},
+            'R2': {'targetTemperature': 24, 'currentTemperature': 25.5}
+        }
+        assert body['notFound'] == ['R9'] and body['unprocessed'] == []
+
+@CACHE_MODES
+def test_batch_get_by_body_keys_across_offices(create_table, load_lambda, cache_ttl):
+    handler = load_handler(create_table, load_lambda, cache_ttl)
+    keys = [{'roomId': 'R1', 'officeId': 'O1'}, {'roomId': 'R3', 'officeId': 'O2'}, {'roomId': 'R3', 'officeId': 'O1'}]
+
+    status, body = call(handler, {'httpMethod': 'POST', 'body': json.dumps({'keys': keys})})
+
+    assert status == 200 and body['roomCount'] == 2
+    assert body['rooms']['R3']['officeId'] == 'O2'
+    assert body['rooms']['R1']['lastReadingAt'] == 1000 and body['rooms']['R1']['temperatureMode'] == 'auto'
+
+def test_unprocessed_keys_are_retried_then_reported(create_table, load_lambda, monkeypatch):
+    handler = load_handler(create_table, load_lambda, '0')
+    real_batch_get = handler.dynamodb.batch_get_item
+    calls = []
+    backoffs = []
+
+    def throttled(RequestItems):
+        calls.append(RequestItems)
+        request = RequestItems.get('RoomConfig')
+        if request and any(key['roomId'] == 'R2' for key in request['Keys']):
+            # R2 luôn bị throttle, các key khác được trả về ở lần gọi đầu
+            keys = [key for key in request['Keys'] if key['roomId'] != 'R2']
+            response = real_batch_get(RequestItems={'RoomConfig': {**request, 'Keys': keys}}) if keys else {'Responses': {}}
+            response['UnprocessedKeys'] = {'RoomConfig': {**request, 'Keys': [{'roomId': 'R2', 'officeId': 'O1'}]}}
+            return response
+        return real_batch_get(RequestItems=RequestItems)
+
+    monkeypatch.setattr(handler.dynamodb, 'batch_get_item', throttled)
+    monkeypatch.setattr(handler, 'backoff', backoffs.append)
+
+    status, body = call(handler, {'queryStringParameters': {'officeId': 'O1', 'roomIds': 'R1,R2', 'fields': 'targetTemperature'}})
+
+    assert status == 200
+    assert body['rooms'] == {'R1': {'targetTemperature': 24}}
+    assert body['unprocessed'] == ['R2'] and body['notFound'] == []
+    # Không chờ sau lần thử cuối
+    assert backoffs == list(range(handler.MAX_BATCH_ATTEMPTS - 1))
+
+def test_batch_get_rejects_too_many_keys_and_bad_fields(create_table, load_lambda):
+    handler = load_handler(create_table, load_lambda, '0')
+    room_ids = ','.join(f'R{index}' for index in range(501))
+
+    assert call(handler, {'queryStringParameters': {'officeId': 'O1', 'roomIds': room_ids}})[0] == 400
+    assert call(handler, {'queryStringParameters': {'officeId': 'O1', 'roomIds': 'R1', 'fields': 'a-b'}})[0] == 400
+    assert call(handler, {'queryStringParameters': {'roomIds': 'R1'}})[0] == 400
+
+@CACHE_MODES
+def test_single_room_fields_mix_config_and_current_readings(create_table, load_lambda, cache_ttl):
+    handler = load_handler(create_table, load_lambda, cache_ttl)
+    params = {'officeId': 'O1', 'roomId': 'R1', 'fields': 'temperatureMode,currentHumidity'}
+
+    status, body = call(handler, {'queryStringParameters': params})
+
+    assert status == 200 and body == {'temperatureMode': 'auto', 'currentHumidity': 60}
+    assert call(handler, {'queryStringParameters': {**params, 'roomId': 'R9'}})[0] == 404
@@ -0,0 +1,73 @@
+import json
+from decimal import Decimal
+
+OFFICE_INDEX = {'officeId-roomId-index': (('officeId', 'S'), ('roomId', 'S'))}
+
+def load_handler(create_table, load_lambda):
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'), indexes=OFFICE_INDEX)
+    for room_id, office_id in (('R1', 'O1'), ('R2', 'O1'), ('R3', 'O1'), ('R4', 'O2')):
+        rooms.put_item(Item={'roomId': room_id, 'officeId': office_id, 'targetTemperature': 26})
+    return load_lambda('SmartOfficeRoomConfigHandler', ROOM_CONFIG_TABLE='RoomConfig'), rooms
+
+def post(handler, body):
+    response = handler.lambda_handler({'body': json.dumps(body)}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+def target(rooms, room_id, office_id='O1'):
+    return rooms.get_item(Key={'roomId': room_id, 'officeId': office_id})['Item']['targetTemperature']
+
+def test_atomic_update_rolls_back_every_room_when_one_is_missing(create_table, load_lambda):
+    handler, rooms = load_handler(create_table, load_lambda)
+
+    status, body = post(handler, {
+        'officeId': 'O1', 'roomIds': ['R1', 'R9', 'R2'], 'updates': {'targetTemperature': 22}, 'atomic': True
+    })
+
+    assert status == 200 and body['updated'] == 0 and body['failed'] == 3
+    assert body['results']['R9']['status'] == 'not_found'
+    assert body['results']['R1']['status'] == 'rolled_back' and body['results']['R2']['status'] == 'rolled_back'
+    assert target(rooms, 'R1') == 26 and target(rooms, 'R2') == 26
+    # Điều kiện attribute_exists: phòng thiếu không bị tạo ra
+    assert 'Item' not in rooms.get_item(Key={'roomId': 'R9', 'officeId': 'O1'})
+
+def test_atomic_update_applies_to_every_room(create_table, load_lambda):
+    handler, rooms = load_handler(create_table, load_lambda)
+
+    status, body = post(handler, {
+        'officeId': 'O1', 'roomIds': ['R1', 'R2'], 'updates': {'targetTemperature': 22}, 'atomic': True
+    })
+
+    assert status == 200 and body['updated'] == 2
+    assert target(rooms, 'R1') == 22 and target(rooms, 'R2') == 22
+
+def test_best_effort_update_of_all_rooms_reports_per_room_results(create_table, load_lambda):
+    handler, rooms = load_handler(create_table, load_lambda)
+
+    status, body = post(handler, {'officeId': 'O1', 'allRooms': True, 'updates': {'targetTemperature': '23.5', 'autoOnTime': '07:30'}})
+
+    assert status == 200 and body['requested'] == 3 and body['updated'] == 3
+    assert body['results']['R1']['updatedAttributes']['targetTemperature'] == '23.5'
+    for room_id in ('R1', 'R2', 'R3'):
+        room = rooms.get_item(Key={'roomId': room_id, 'officeId': 'O1'})['Item']
+        assert room['targetTemperature'] == '23.5' and room['autoOnTime'] == '07:30'
+        assert 'autoOnBucket' in room
+    # Phòng của office khác không bị đụng tới
+    assert target(rooms, 'R4', 'O2') == Decimal(26)
+
+def test_best_effort_update_keeps_going_past_missing_rooms(create_table, load_lambda):
+    handler, rooms = load_handler(create_table, load_lambda)
+
+    status, body = post(handler, {'officeId': 'O1', 'roomIds': ['R1', 'R9'], 'updates': {'targetTemperature': 21}})
+
+    assert status == 200 and body['updated'] == 1 and body['failed'] == 1
+    assert body['results']['R9']['status'] == 'not_found'
+    assert target(rooms, 'R1') == 21
+
+def test_bulk_update_rejects_unknown_fields_and_oversized_transactions(create_table, load_lambda):
+    handler, _ = load_handler(create_table, load_lambda)
+
+    assert post(handler, {'officeId': 'O1', 'roomIds': ['R1'], 'updates': {'owner': 'x'}})[0] == 400
+    status, body = post(handler, {
+        'officeId': 'O1', 'roomIds': [f'R{index}' for index in range(101)], 'updates': {'targetTemperature': 22}, 'atomic': True
+    })
+    assert status == 400 and 'max 100' in body['error']
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+OFFICE_INDEX = {'officeId-roomId-index': (('officeId', 'S'), ('roomId', 'S'))}
+
+def load_room_list(create_table, load_lambda, indexes):
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'), indexes=indexes)
+    with rooms.batch_writer() as writer:
+        for index in range(23):
+            writer.put_item(Item={'roomId': f'R{index:02d}', 'officeId': 'O1' if index % 3 else 'O2', 'roomName': f'Room {index}'})
+    return load_lambda('SmartOfficeRoomListHandler', ROOM_CONFIG_TABLE='RoomConfig')
+
+def list_rooms(handler, **params):
+    response = handler.lambda_handler({'queryStringParameters': {'officeId': 'O1', **params}}, None)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+def read_all_pages(handler, limit, **params):
+    pages = []
+    cursor = None
+    while True:
+        body = list_rooms(handler, limit=str(limit), **({'cursor': cursor} if cursor else {}), **params)
+        pages.append([room['roomId'] for room in body['rooms']])
+        cursor = body['nextCursor']
+        if not cursor:
+            return pages
+
+EXPECTED = sorted(f'R{index:02d}' for index in range(23) if index % 3)
+
+@pytest.mark.parametrize('indexes', [OFFICE_INDEX, None], ids=['index', 'scan-fallback'])
+def test_pages_never_exceed_limit_and_resume_after_the_last_room(create_table, load_lambda, indexes):
+    handler = load_room_list(create_table, load_lambda, indexes)
+
+    pages = read_all_pages(handler, 4)
+
+    assert all(len(page) <= 4 for page in pages)
+    assert sorted(room_id for page in pages for room_id in page) == EXPECTED
+    assert len({room_id for page in pages for room_id in page}) == len(EXPECTED)
+
+@pytest.mark.parametrize('indexes', [OFFICE_INDEX, None], ids=['index', 'scan-fallback'])
+def test_unpaged_listing_returns_every_room_with_sparse_fields(create_table, load_lambda, indexes):
+    handler = load_room_list(create_table, load_lambda, indexes)
+
+    body = list_rooms(handler, fields='roomName')
+
+    assert body['nextCursor'] is None
+    assert sorted(room['roomId'] for room in body['rooms']) == EXPECTED
+    assert all(set(room) == {'roomId', 'roomName'} for room in body['rooms'])
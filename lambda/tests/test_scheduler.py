@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+# SCHEDULE_UTC_OFFSET mặc định +07:00: 07:30 giờ địa phương nằm trong bucket 00:30 UTC
+TICK = {'time': '2026-10-18T00:30:00Z'}
+ROOM_INDEXES = {
+    'officeId-roomId-index': (('officeId', 'S'), ('roomId', 'S')),
+    'autoOnBucket-index': (('autoOnBucket', 'S'), None),
+    'autoOffBucket-index': (('autoOffBucket', 'S'), None)
+}
+PROFILE_INDEXES = {
+    'autoOnBucket-index': (('autoOnBucket', 'S'), None),
+    'autoOffBucket-index': (('autoOffBucket', 'S'), None)
+}
+
+def read_desired(shadow_dir, thing_name):
+    path = shadow_dir / f'{thing_name}.json'
+    return json.loads(path.read_text())['state']['desired'] if path.exists() else None
+
+def put_room(rooms, room_id, office_id='O1', **fields):
+    rooms.put_item(Item={'roomId': room_id, 'officeId': office_id, **fields})
+
+def load_scheduler(create_table, load_lambda, shadow_dir, **env):
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'), indexes=ROOM_INDEXES)
+
+    def scheduler():
+        return load_lambda('SmartOfficeScheduler', ROOM_CONFIG_TABLE='RoomConfig', IOT_SHADOW_URI=f'file://{shadow_dir}', **env)
+    return scheduler, rooms
+
+def test_rooms_in_the_current_bucket_get_their_shadow_command(create_table, load_lambda, tmp_path):
+    scheduler, rooms = load_scheduler(create_table, load_lambda, tmp_path)
+    put_room(rooms, 'R1', thingName='T1', autoOnTime='07:30', autoOnBucket='00:30')
+    put_room(rooms, 'R2', thingName='T2', autoOffTime='07:30', autoOffBucket='00:30')
+    put_room(rooms, 'R3', thingName='T3', autoOnTime='08:00', autoOnBucket='01:00')
+    # Cùng phút bật và tắt: tắt thắng
+    put_room(rooms, 'R4', thingName='T4', autoOnTime='07:30', autoOnBucket='00:30', autoOffTime='07:30', autoOffBucket='00:30')
+    put_room(rooms, 'R5', autoOnTime='07:30', autoOnBucket='00:30')
+
+    result = scheduler().lambda_handler(TICK, None)
+
+    assert result == {'bucket': '00:30', 'commands': 3}
+    assert read_desired(tmp_path, 'T1') == {'power': 'on'}
+    assert read_desired(tmp_path, 'T2') == {'power': 'off'}
+    assert read_desired(tmp_path, 'T3') is None
+    assert read_desired(tmp_path, 'T4') == {'power': 'off'}
+
+def test_rooms_follow_their_office_profile_schedule_unless_they_override_it(create_table, load_lambda, tmp_path):
+    profiles = create_table('Profiles', ('profileId', 'S'), indexes=PROFILE_INDEXES)
+    create_table('Office', ('orgAlias', 'S'), ('entityId', 'S'), indexes={'entityId-index': (('entityId', 'S'), None)})
+    profiles.put_item(Item={'profileId': 'OFFICE#O2', 'settings': {'autoOnTime': '07:30'}, 'autoOnBucket': '00:30'})
+    scheduler, rooms = load_scheduler(create_table, load_lambda, tmp_path, CONFIG_PROFILE_TABLE='Profiles')
+    put_room(rooms, 'R6', 'O2', thingName='T6')
+    put_room(rooms, 'R7', 'O2', thingName='T7', autoOnTime='09:00', autoOnBucket='02:00')
+    put_room(rooms, 'R8', 'O3', thingName='T8')
+
+    result = scheduler().lambda_handler(TICK, None)
+
+    assert result['commands'] == 1
+    assert read_desired(tmp_path, 'T6') == {'power': 'on'}
+    assert read_desired(tmp_path, 'T7') is None and read_desired(tmp_path, 'T8') is None
+
+def test_backfill_writes_missing_buckets(create_table, load_lambda, tmp_path):
+    scheduler, rooms = load_scheduler(create_table, load_lambda, tmp_path)
+    put_room(rooms, 'R1', thingName='T1', autoOnTime='07:30')
+    put_room(rooms, 'R2', thingName='T2', autoOffTime='7:45', autoOffBucket='00:45')
+    put_room(rooms, 'R3', thingName='T3')
+    module = scheduler()
+
+    assert module.lambda_handler({'backfill': True}, None)['backfilled'] == 1
+    assert rooms.get_item(Key={'roomId': 'R1', 'officeId': 'O1'})['Item']['autoOnBucket'] == '00:30'
+    # Sau backfill phòng R1 đã nằm trong GSI và được bật đúng giờ
+    assert module.lambda_handler(TICK, None)['commands'] == 1
+    assert read_desired(tmp_path, 'T1') == {'power': 'on'}
+
+@pytest.mark.parametrize('value', ['25:00', '7h30'])
+def test_room_config_rejects_invalid_schedule_times(create_table, load_lambda, tmp_path, value):
+    _, rooms = load_scheduler(create_table, load_lambda, tmp_path)
+    put_room(rooms, 'R1')
+    handler = load_lambda('SmartOfficeRoomConfigHandler', ROOM_CONFIG_TABLE='RoomConfig')
+
+    response = handler.lambda_handler({'body': json.dumps({'officeId': 'O1', 'roomId': 'R1', 'updates': {'autoOnTime': value}})}, None)
+
+    assert response['statusCode'] == 400
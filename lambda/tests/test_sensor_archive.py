@@ -0,0 +1,118 @@
+import gzip
+import json
+import time
+from decimal import Decimal
+
+DAY = 86400
+TODAY = int(time.time()) // DAY * DAY
+
+def day_start(days_ago):
+    return TODAY - days_ago * DAY
+
+def reading(timestamp, temperature):
+    return {'roomId': 'R1', 'timestamp': timestamp, 'temperature': Decimal(temperature)}
+
+def write_rows(log, readings):
+    with log.batch_writer() as writer:
+        for item in readings:
+            writer.put_item(Item=item)
+
+def day_key(timestamp):
+    return time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+
+def read_segment(archive_dir, timestamp):
+    path = archive_dir / 'R1' / f'{day_key(timestamp)}.json.gz'
+    return json.loads(gzip.decompress(path.read_bytes()))
+
+def load_archive(load_lambda, archive_dir, **env):
+    return load_lambda(
+        'SmartOfficeSensorArchive',
+        SENSOR_LOG_TABLE='SensorLog',
+        SENSOR_ARCHIVE_URI=f'file://{archive_dir}',
+        ARCHIVE_AFTER_DAYS='7',
+        **env
+    )
+
+def query_range(get_data, start, end, limit=None, cursor=None):
+    params = {'roomId': 'R1', 'from': str(start), 'to': str(end), 'metrics': 'temperature'}
+    if limit:
+        params['limit'] = str(limit)
+    if cursor:
+        params['cursor'] = cursor
+    response = get_data.lambda_handler({'queryStringParameters': params}, None)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+def test_complete_days_are_archived_once_and_resumed(create_table, load_lambda, tmp_path):
+    log = create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+    write_rows(log, [reading(day_start(10) + hour * 3600, 20 + hour % 3) for hour in range(24)])
+    write_rows(log, [reading(day_start(9) + 600, '21.5'), reading(day_start(6), 25)])
+    archive = load_archive(load_lambda, tmp_path)
+
+    result = archive.lambda_handler({'roomIds': ['R1']}, None)
+
+    # Ngày 10..7 trước đã đủ tuổi; ngày 6 trước còn nóng
+    assert result['rooms'] == {'R1': {'archivedDays': 4, 'lateReadings': 0}}
+    manifest = json.loads((tmp_path / 'R1' / 'manifest.json').read_text())
+    assert manifest == {'firstDay': day_key(day_start(10)), 'archivedThrough': day_key(day_start(7))}
+    segment = read_segment(tmp_path, day_start(10))
+    assert segment['timestamp'] == [day_start(10) + hour * 3600 for hour in range(24)]
+    assert segment['temperature'] == [20 + hour % 3 for hour in range(24)]
+    assert read_segment(tmp_path, day_start(9))['temperature'] == [21.5]
+    assert not (tmp_path / 'R1' / f'{day_key(day_start(8))}.json.gz').exists()
+
+    assert archive.lambda_handler({'roomIds': ['R1']}, None)['rooms']['R1']['archivedDays'] == 0
+
+def test_reads_merge_archive_and_hot_rows_without_duplicates(create_table, load_lambda, tmp_path):
+    log = create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+    archived_day = [reading(day_start(9) + hour * 3600, 20) for hour in range(6)]
+    write_rows(log, archived_day)
+    load_archive(load_lambda, tmp_path).lambda_handler({'roomIds': ['R1']}, None)
+
+    # Nửa đầu ngày đã hết TTL trong bảng nóng, nửa sau vẫn còn (có cả trong archive), cộng bản ghi mới
+    for item in archived_day[:3]:
+        log.delete_item(Key={'roomId': 'R1', 'timestamp': item['timestamp']})
+    write_rows(log, [reading(day_start(5) + hour * 3600, 22) for hour in range(3)])
+    get_data = load_lambda('SmartOfficeGetData', SENSOR_LOG_TABLE='SensorLog', SENSOR_ARCHIVE_URI=f'file://{tmp_path}')
+
+    expected = [item['timestamp'] for item in archived_day] + [day_start(5) + hour * 3600 for hour in range(3)]
+    body = query_range(get_data, day_start(10), day_start(4))
+    assert [item['timestamp'] for item in body['data']] == expected
+    assert body['nextCursor'] is None
+
+    # Phân trang qua ranh giới archive / bảng nóng
+    pages = []
+    cursor = None
+    while True:
+        body = query_range(get_data, day_start(10), day_start(4), limit=4, cursor=cursor)
+        pages.append([item['timestamp'] for item in body['data']])
+        cursor = body['nextCursor']
+        if not cursor:
+            break
+    assert [timestamp for page in pages for timestamp in page] == expected
+    assert all(len(page) <= 4 for page in pages)
+
+def test_late_readings_are_folded_into_the_segment_before_expiry(create_table, load_lambda, tmp_path):
+    log = create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+    write_rows(log, [reading(day_start(10), 20), reading(day_start(8) + 3600, 21)])
+    load_archive(load_lambda, tmp_path, SENSOR_HOT_RETENTION_DAYS='10').lambda_handler({'roomIds': ['R1']}, None)
+
+    # Bản ghi đến muộn của một ngày đã archive nhưng chưa tới hạn đọc lại
+    write_rows(log, [reading(day_start(8) + 60, 19)])
+    # Một ngày sau (so với TTL): ngày 8 trước chỉ còn một ngày nóng và được đọc lại lần cuối
+    archive = load_archive(load_lambda, tmp_path, SENSOR_HOT_RETENTION_DAYS='9')
+    result = archive.lambda_handler({'roomIds': ['R1']}, None)
+
+    assert result['rooms']['R1'] == {'archivedDays': 0, 'lateReadings': 1}
+    segment = read_segment(tmp_path, day_start(8))
+    assert segment['timestamp'] == [day_start(8) + 60, day_start(8) + 3600]
+    assert segment['temperature'] == [19, 21]
+    manifest = json.loads((tmp_path / 'R1' / 'manifest.json').read_text())
+    assert manifest['recheckedThrough'] == day_key(day_start(8))
+
+    # Dòng nóng hết hạn: GetData vẫn trả về bản ghi đến muộn từ archive
+    for item in log.scan()['Items']:
+        log.delete_item(Key={'roomId': 'R1', 'timestamp': item['timestamp']})
+    get_data = load_lambda('SmartOfficeGetData', SENSOR_LOG_TABLE='SensorLog', SENSOR_ARCHIVE_URI=f'file://{tmp_path}')
+    body = query_range(get_data, day_start(8), day_start(7))
+    assert [item['temperature'] for item in body['data']] == [19, 21]
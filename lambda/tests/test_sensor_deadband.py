@@ -0,0 +1,83 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+BUCKET_START = 1700006400
+
+def sqs_event(messages):
+    return {'Records': [
+        {'messageId': f'm{index}', 'body': json.dumps(message)}
+        for index, message in enumerate(messages)
+    ]}
+
+def reading(offset, temperature=21, room_id='R1'):
+    return {'roomId': room_id, 'timestamp': BUCKET_START + offset, 'temperature': temperature}
+
+def load_deadband_ingest(create_table, load_lambda, **env):
+    log = create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+    create_table('SensorLatest', ('roomId', 'S'))
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'))
+    ingest = load_lambda(
+        'SmartOfficeSensorIngest',
+        SENSOR_LOG_TABLE='SensorLog',
+        SENSOR_LATEST_TABLE='SensorLatest',
+        ROOM_CONFIG_TABLE='RoomConfig',
+        **env
+    )
+    return ingest, log, rooms
+
+def stored_offsets(log, room_id='R1'):
+    return sorted(int(item['timestamp']) - BUCKET_START for item in log.scan()['Items'] if item['roomId'] == room_id)
+
+def test_readings_inside_the_deadband_are_suppressed(create_table, load_lambda):
+    ingest, log, rooms = load_deadband_ingest(create_table, load_lambda)
+    rooms.put_item(Item={'roomId': 'R1', 'officeId': 'O1', 'deadband': {'temperature': Decimal('0.5')}})
+
+    result = ingest.lambda_handler(sqs_event([reading(offset) for offset in range(0, 300, 60)]), None)
+    assert result['written'] == 1 and result['suppressed'] == 4
+
+    # Lần gọi sau so với bản ghi đã lưu trên item ring buffer, không phải với bản ghi trước đó
+    ingest.lambda_handler(sqs_event([reading(300, 21.3), reading(360, 21.4), reading(420, 21.5)]), None)
+
+    assert stored_offsets(log) == [0, 420]
+
+def test_silent_room_stores_a_heartbeat_after_max_silence(create_table, load_lambda):
+    ingest, log, rooms = load_deadband_ingest(create_table, load_lambda)
+    rooms.put_item(Item={
+        'roomId': 'R1',
+        'officeId': 'O1',
+        'deadband': {'temperature': Decimal('0.5'), 'maxSilenceSeconds': 900}
+    })
+
+    for offset in range(0, 2100, 300):
+        ingest.lambda_handler(sqs_event([reading(offset)]), None)
+
+    assert stored_offsets(log) == [0, 900, 1800]
+
+def test_room_deadband_overrides_the_office_profile(create_table, load_lambda):
+    profiles = create_table('Profiles', ('profileId', 'S'))
+    create_table('Office', ('orgAlias', 'S'), ('entityId', 'S'))
+    ingest, log, rooms = load_deadband_ingest(create_table, load_lambda, CONFIG_PROFILE_TABLE='Profiles')
+    profiles.put_item(Item={'profileId': 'OFFICE#O1', 'settings': {'deadband': {'temperature': Decimal(1)}}})
+    rooms.put_item(Item={'roomId': 'R1', 'officeId': 'O1'})
+    rooms.put_item(Item={'roomId': 'R2', 'officeId': 'O1', 'deadband': {'temperature': Decimal(5)}})
+    rooms.put_item(Item={'roomId': 'R3', 'officeId': 'O2'})
+
+    messages = [
+        reading(offset, temperature, room_id)
+        for room_id in ('R1', 'R2', 'R3')
+        for offset, temperature in ((0, 20), (60, 20.5), (120, 22), (180, 24))
+    ]
+    ingest.lambda_handler(sqs_event(messages), None)
+
+    # R1 kế thừa ngưỡng 1 °C của office, R2 dùng ngưỡng riêng 5 °C, R3 không có deadband
+    assert stored_offsets(log, 'R1') == [0, 120, 180]
+    assert stored_offsets(log, 'R2') == [0]
+    assert stored_offsets(log, 'R3') == [0, 60, 120, 180]
+
+def test_deadband_without_latest_table_fails_at_startup(create_table, load_lambda):
+    create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+
+    with pytest.raises(RuntimeError, match='SENSOR_LATEST_TABLE'):
+        load_lambda('SmartOfficeSensorIngest', SENSOR_LOG_TABLE='SensorLog', ROOM_CONFIG_TABLE='RoomConfig')
@@ -0,0 +1,39 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+START = 1700006400
+
+def load_get_data(create_table, load_lambda, count):
+    log = create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+    with log.batch_writer() as writer:
+        for index in range(count):
+            writer.put_item(Item={'roomId': 'R1', 'timestamp': START + index * 60, 'temperature': Decimal(20 + index % 7)})
+    return load_lambda('SmartOfficeGetData', SENSOR_LOG_TABLE='SensorLog')
+
+def lttb_series(get_data, points):
+    params = {
+        'roomId': 'R1',
+        'from': str(START),
+        'to': str(START + 3600),
+        'mode': 'lttb',
+        'points': str(points),
+        'metrics': 'temperature'
+    }
+    response = get_data.lambda_handler({'queryStringParameters': params}, None)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])['series']['temperature']
+
+@pytest.mark.parametrize('points', [1, 2, 10, 30, 500])
+def test_lttb_returns_the_stored_timestamps_whatever_the_series_length(create_table, load_lambda, points):
+    get_data = load_get_data(create_table, load_lambda, 30)
+
+    series = lttb_series(get_data, points)
+
+    assert len(series['timestamp']) == min(points, 30)
+    # Cùng kiểu JSON (số nguyên) dù series có được lấy mẫu hay không
+    assert all(type(timestamp) is int for timestamp in series['timestamp'])
+    assert series['timestamp'][0] == START
+    if points > 1:
+        assert series['timestamp'][-1] == START + 29 * 60
@@ -0,0 +1,196 @@
+import json
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+BUCKET_START = 1700006400
+
+def sqs_event(messages):
+    return {'Records': [
+        {'messageId': f'm{index}', 'body': json.dumps(message)}
+        for index, message in enumerate(messages)
+    ]}
+
+def reading(offset, temperature=21):
+    return {'roomId': 'R1', 'timestamp': BUCKET_START + offset, 'temperature': temperature}
+
+def load_bucket_ingest(create_table, load_lambda):
+    buckets = create_table('SensorBucket', ('roomId', 'S'), ('bucketStart', 'N'))
+    ingest = load_lambda(
+        'SmartOfficeSensorIngest',
+        SENSOR_LOG_TABLE='SensorLog',
+        SENSOR_BUCKET_TABLE='SensorBucket',
+        SENSOR_STORAGE_MODE='bucket'
+    )
+    return ingest, buckets
+
+def stored_bucket(buckets):
+    return buckets.get_item(Key={'roomId': 'R1', 'bucketStart': BUCKET_START})['Item']
+
+def test_redelivered_batch_is_not_appended_twice(create_table, load_lambda):
+    ingest, buckets = load_bucket_ingest(create_table, load_lambda)
+    event = sqs_event([reading(offset) for offset in (0, 60, 120)])
+
+    ingest.lambda_handler(event, None)
+    # SQS gửi lại cùng batch (Lambda timeout sau khi đã ghi)
+    result = ingest.lambda_handler(event, None)
+
+    assert result['batchItemFailures'] == []
+    bucket = stored_bucket(buckets)
+    assert bucket['ts'] == [0, 60, 120]
+    assert bucket['readingCount'] == 3
+    assert bucket['lastOffset'] == 120
+
+def test_late_readings_are_appended_once(create_table, load_lambda):
+    ingest, buckets = load_bucket_ingest(create_table, load_lambda)
+    ingest.lambda_handler(sqs_event([reading(0), reading(120)]), None)
+
+    # Bản ghi đến muộn (offset 60) đi cùng một bản ghi đã có
+    ingest.lambda_handler(sqs_event([reading(60, 22), reading(120)]), None)
+    ingest.lambda_handler(sqs_event([reading(60, 22), reading(180)]), None)
+
+    bucket = stored_bucket(buckets)
+    assert bucket['ts'] == [0, 120, 60, 180]
+    assert bucket['temperature'] == [21, 21, 22, 21]
+    assert bucket['readingCount'] == 4
+    assert bucket['lastOffset'] == 180
+    assert all(isinstance(value, Decimal) for value in bucket['temperature'])
+
+def load_row_ingest(create_table, load_lambda, monkeypatch):
+    log = create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+    ingest = load_lambda('SmartOfficeSensorIngest', SENSOR_LOG_TABLE='SensorLog')
+    monkeypatch.setattr(ingest, 'backoff', lambda attempt: None)
+    return ingest, log
+
+def stored_timestamps(log):
+    return sorted(int(item['timestamp']) for item in log.scan()['Items'])
+
+def validation_error(operation):
+    return ClientError({'Error': {'Code': 'ValidationException', 'Message': 'invalid item'}}, operation)
+
+def test_rows_are_written_in_chunks_of_25(create_table, load_lambda, monkeypatch):
+    ingest, log = load_row_ingest(create_table, load_lambda, monkeypatch)
+    chunk_sizes = []
+    batch_write_item = ingest.dynamodb.batch_write_item
+
+    def counting_batch_write_item(RequestItems):
+        chunk_sizes.append(len(RequestItems['SensorLog']))
+        return batch_write_item(RequestItems=RequestItems)
+
+    monkeypatch.setattr(ingest.dynamodb, 'batch_write_item', counting_batch_write_item)
+    result = ingest.lambda_handler(sqs_event([reading(offset) for offset in range(60)]), None)
+
+    assert chunk_sizes == [25, 25, 10]
+    assert result['written'] == 60 and result['batchItemFailures'] == []
+    assert stored_timestamps(log) == [BUCKET_START + offset for offset in range(60)]
+
+def test_unprocessed_items_are_retried(create_table, load_lambda, monkeypatch):
+    ingest, log = load_row_ingest(create_table, load_lambda, monkeypatch)
+    calls = []
+    batch_write_item = ingest.dynamodb.batch_write_item
+
+    def throttled_batch_write_item(RequestItems):
+        requests = RequestItems['SensorLog']
+        calls.append(len(requests))
+        if len(calls) > 1:
+            return batch_write_item(RequestItems=RequestItems)
+        # Lần đầu: DynamoDB chỉ nhận nửa đầu, nửa sau trả về UnprocessedItems
+        batch_write_item(RequestItems={'SensorLog': requests[:5]})
+        return {'UnprocessedItems': {'SensorLog': requests[5:]}}
+
+    monkeypatch.setattr(ingest.dynamodb, 'batch_write_item', throttled_batch_write_item)
+    result = ingest.lambda_handler(sqs_event([reading(offset) for offset in range(10)]), None)
+
+    assert calls == [10, 5]
+    assert result['written'] == 10 and result['batchItemFailures'] == []
+    assert len(stored_timestamps(log)) == 10
+
+def test_items_still_unprocessed_are_reported_for_retry(create_table, load_lambda, monkeypatch):
+    ingest, log = load_row_ingest(create_table, load_lambda, monkeypatch)
+    backoffs = []
+    monkeypatch.setattr(ingest, 'backoff', backoffs.append)
+    monkeypatch.setattr(
+        ingest.dynamodb, 'batch_write_item',
+        lambda RequestItems: {'UnprocessedItems': RequestItems}
+    )
+    result = ingest.lambda_handler(sqs_event([reading(0), reading(60)]), None)
+
+    # Không chờ sau lần thử cuối cùng
+    assert backoffs == list(range(ingest.MAX_BATCH_ATTEMPTS - 1))
+    assert result['failed'] == 2
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'm0'}, {'itemIdentifier': 'm1'}]
+    assert stored_timestamps(log) == []
+
+def test_unstorable_numbers_are_rejected_without_retry(create_table, load_lambda, monkeypatch):
+    ingest, log = load_row_ingest(create_table, load_lambda, monkeypatch)
+    messages = [
+        reading(0),
+        {**reading(60), 'temperature': '1e400'},
+        {**reading(120), 'humidity': 'NaN'},
+        {**reading(180), 'light': 'Infinity'},
+        {**reading(240), 'temperature': '1.' + '1' * 38},
+        reading(300)
+    ]
+    result = ingest.lambda_handler(sqs_event(messages), None)
+
+    assert result['invalid'] == 4 and result['written'] == 2
+    assert result['batchItemFailures'] == []
+    assert stored_timestamps(log) == [BUCKET_START, BUCKET_START + 300]
+
+def test_chunk_rejected_as_a_whole_is_split_per_item(create_table, load_lambda, monkeypatch):
+    ingest, log = load_row_ingest(create_table, load_lambda, monkeypatch)
+    bad_timestamp = BUCKET_START + 60
+    batch_write_item = ingest.dynamodb.batch_write_item
+    put_item = ingest.table.put_item
+
+    def rejecting_batch_write_item(RequestItems):
+        if any(request['PutRequest']['Item']['timestamp'] == bad_timestamp for request in RequestItems['SensorLog']):
+            raise validation_error('BatchWriteItem')
+        return batch_write_item(RequestItems=RequestItems)
+
+    def rejecting_put_item(Item):
+        if Item['timestamp'] == bad_timestamp:
+            raise validation_error('PutItem')
+        return put_item(Item=Item)
+
+    monkeypatch.setattr(ingest.dynamodb, 'batch_write_item', rejecting_batch_write_item)
+    monkeypatch.setattr(ingest.table, 'put_item', rejecting_put_item)
+    result = ingest.lambda_handler(sqs_event([reading(offset) for offset in range(0, 180, 60)]), None)
+
+    # Bản ghi sai không retry được; hai bản ghi còn lại của chunk vẫn được ghi
+    assert result['invalid'] == 1 and result['written'] == 2
+    assert result['batchItemFailures'] == []
+    assert stored_timestamps(log) == [BUCKET_START, BUCKET_START + 120]
+
+def test_non_finite_timestamps_are_rejected_without_retry(create_table, load_lambda, monkeypatch):
+    ingest, log = load_row_ingest(create_table, load_lambda, monkeypatch)
+    messages = [
+        reading(0),
+        {**reading(60), 'timestamp': 'Infinity'},
+        {**reading(120), 'timestamp': float('inf')},
+        {**reading(180), 'timestamp': 'NaN'},
+        {**reading(240), 'timestamp': '1e999'},
+        reading(300)
+    ]
+    result = ingest.lambda_handler(sqs_event(messages), None)
+
+    assert result['invalid'] == 4 and result['written'] == 2
+    assert result['batchItemFailures'] == []
+    assert stored_timestamps(log) == [BUCKET_START, BUCKET_START + 300]
+
+def test_readings_are_stored_as_numbers_in_the_series_unit(create_table, load_lambda, monkeypatch):
+    ingest, log = load_row_ingest(create_table, load_lambda, monkeypatch)
+    messages = [
+        {**reading(0), 'temperature': '25.68 °C', 'humidity': '16.6 %', 'light': 300},
+        {**reading(60), 'temperature': '77 °F', 'humidity': 40.5},
+        {**reading(120), 'temperature': 'hot'}
+    ]
+
+    result = ingest.lambda_handler(sqs_event(messages), None)
+
+    assert result['written'] == 2 and result['invalid'] == 1 and result['batchItemFailures'] == []
+    items = sorted(log.scan()['Items'], key=lambda item: item['timestamp'])
+    assert items[0]['temperature'] == Decimal('25.68') and items[0]['humidity'] == Decimal('16.6')
+    assert items[0]['light'] == 300
+    assert items[1]['temperature'] == Decimal('25.00') and items[1]['humidity'] == Decimal('40.5')
+    assert 'light' not in items[1]
@@ -0,0 +1,225 @@
+import base64
+import gzip
+import json
+from decimal import Decimal
+
+START = 1700006400
+
+def write_readings(log, room_id, count, step=60, **fields):
+    with log.batch_writer() as writer:
+        for index in range(count):
+            writer.put_item(Item={
+                'roomId': room_id,
+                'timestamp': START + index * step,
+                'temperature': Decimal(20 + index % 5),
+                'humidity': 50 + index,
+                **fields
+            })
+
+def load_get_data(create_table, load_lambda, rooms=('R1',), count=25, **env):
+    log = create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+    for room_id in rooms:
+        write_readings(log, room_id, count)
+    return load_lambda('SmartOfficeGetData', SENSOR_LOG_TABLE='SensorLog', **env), log
+
+def get(get_data, **params):
+    response = get_data.lambda_handler({'queryStringParameters': params}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+def test_range_pages_follow_the_cursor_in_time_order(create_table, load_lambda):
+    get_data, _ = load_get_data(create_table, load_lambda)
+    timestamps = []
+    cursor = None
+    while True:
+        params = {'roomId': 'R1', 'from': str(START + 60), 'to': str(START + 1200), 'limit': '7'}
+        if cursor:
+            params['cursor'] = cursor
+        status, body = get(get_data, **params)
+        assert status == 200 and body['data_count'] <= 7
+        timestamps.extend(item['timestamp'] for item in body['data'])
+        cursor = body['nextCursor']
+        if not cursor:
+            break
+
+    # from/to đều tính cả hai đầu
+    assert timestamps == [START + index * 60 for index in range(1, 21)]
+
+def test_without_range_the_newest_readings_are_returned_oldest_first(create_table, load_lambda):
+    get_data, _ = load_get_data(create_table, load_lambda)
+
+    status, body = get(get_data, roomId='R1', limit='5')
+
+    assert status == 200
+    assert [item['timestamp'] for item in body['data']] == [START + index * 60 for index in range(20, 25)]
+
+def test_invalid_range_and_foreign_cursor_are_rejected(create_table, load_lambda):
+    get_data, _ = load_get_data(create_table, load_lambda, rooms=('R1', 'R2'))
+    _, body = get(get_data, roomId='R2', **{'from': str(START), 'to': str(START + 1200), 'limit': '3'})
+
+    assert get(get_data, roomId='R1', cursor=body['nextCursor'])[0] == 400
+    assert get(get_data, roomId='R1', cursor='not-a-cursor')[0] == 400
+    assert get(get_data, roomId='R1', **{'from': str(START + 60), 'to': str(START)})[0] == 400
+    assert get(get_data, roomId='R1', **{'from': 'yesterday'})[0] == 400
+
+def test_legacy_string_readings_are_served_as_numbers(create_table, load_lambda):
+    get_data, log = load_get_data(create_table, load_lambda, count=0)
+    log.put_item(Item={'roomId': 'R1', 'timestamp': START, 'temperature': '25.68 °C', 'humidity': '16.6 %'})
+    log.put_item(Item={'roomId': 'R1', 'timestamp': START + 60, 'temperature': Decimal('26.5'), 'humidity': 'n/a'})
+
+    _, body = get(get_data, roomId='R1')
+    _, chart = get(get_data, roomId='R1', points='1', **{'from': str(START), 'to': str(START + 60)})
+
+    assert body['units'] == {'temperature': '°C', 'humidity': '%', 'light': 'lux'}
+    assert [(item['temperature'], item['humidity']) for item in body['data']] == [(25.68, 16.6), (26.5, None)]
+    temperature = chart['series']['temperature']
+    assert (temperature['min'], temperature['max'], temperature['count']) == ([25.68], [26.5], [2])
+    assert chart['series']['humidity']['count'] == [1]
+
+OFFICE_INDEX = {'officeId-roomId-index': (('officeId', 'S'), ('roomId', 'S'))}
+
+def test_batch_request_fans_out_over_rooms_and_isolates_failures(create_table, load_lambda, monkeypatch):
+    get_data, _ = load_get_data(create_table, load_lambda, rooms=('R1', 'R2', 'R3'))
+    query_room_data = get_data.query_room_data
+
+    def failing_query(room_id, options):
+        if room_id == 'R3':
+            raise RuntimeError('throttled')
+        return query_room_data(room_id, options)
+
+    monkeypatch.setattr(get_data, 'query_room_data', failing_query)
+    status, body = get(get_data, roomIds='R1,R2,R3,R1', limit='4')
+
+    assert status == 200 and body['roomCount'] == 3
+    assert set(body['rooms']) == {'R1', 'R2'} and body['errors'] == {'R3': 'throttled'}
+    assert [item['timestamp'] for item in body['rooms']['R2']['data']] == [START + index * 60 for index in range(21, 25)]
+    assert 'nextCursor' in body['rooms']['R1']
+
+def test_office_request_reads_the_rooms_of_the_office(create_table, load_lambda):
+    rooms = create_table('RoomConfig', ('roomId', 'S'), ('officeId', 'S'), indexes=OFFICE_INDEX)
+    for room_id, office_id in (('R1', 'O1'), ('R2', 'O1'), ('R3', 'O2')):
+        rooms.put_item(Item={'roomId': room_id, 'officeId': office_id})
+    get_data, _ = load_get_data(create_table, load_lambda, rooms=('R1', 'R2', 'R3'), ROOM_CONFIG_TABLE='RoomConfig')
+
+    status, body = get(get_data, officeId='O1', limit='2', metrics='temperature')
+
+    assert status == 200 and body['officeId'] == 'O1'
+    assert sorted(body['rooms']) == ['R1', 'R2'] and body['errors'] == {}
+    assert all(set(item) == {'roomId', 'timestamp', 'temperature'} for room in body['rooms'].values() for item in room['data'])
+
+def test_batch_request_is_bounded(create_table, load_lambda):
+    get_data, _ = load_get_data(create_table, load_lambda)
+
+    status, body = get(get_data, roomIds=','.join(f'R{index}' for index in range(101)))
+
+    assert status == 400 and 'max 100' in body['message']
+    # Không có ROOM_CONFIG_TABLE thì không tra được phòng của office
+    assert get(get_data, officeId='O1')[0] == 400
+
+def ingest_batches(ingest, batches):
+    for batch in batches:
+        ingest.lambda_handler({'Records': [
+            {'messageId': f'm{index}', 'body': json.dumps(message)} for index, message in enumerate(batch)
+        ]}, None)
+
+def test_recent_readings_come_from_the_ring_buffer_with_one_get_item(create_table, load_lambda, monkeypatch):
+    create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+    latest = create_table('SensorLatest', ('roomId', 'S'))
+    ingest = load_lambda('SmartOfficeSensorIngest', SENSOR_LOG_TABLE='SensorLog', SENSOR_LATEST_TABLE='SensorLatest', RECENT_READINGS_SIZE='20')
+    readings = [{'roomId': 'R1', 'timestamp': START + index * 60, 'temperature': 20 + index % 5} for index in range(72)]
+    ingest_batches(ingest, [readings[index:index + 12] for index in range(0, 72, 12)])
+    # Bản ghi đến muộn không ghi đè giá trị hiện tại
+    ingest_batches(ingest, [[{'roomId': 'R1', 'timestamp': START + 30, 'temperature': 99}]])
+
+    buffer = latest.get_item(Key={'roomId': 'R1'})['Item']
+    assert 20 <= len(buffer['readings']) < 30
+    assert buffer['lastReadingAt'] == START + 71 * 60 and buffer['currentTemperature'] == 20 + 71 % 5
+
+    get_data = load_lambda('SmartOfficeGetData', SENSOR_LOG_TABLE='SensorLog', SENSOR_LATEST_TABLE='SensorLatest')
+    log_query = get_data.tables.table.query
+
+    def no_query(**kwargs):
+        raise AssertionError('SensorLog must not be queried')
+
+    monkeypatch.setattr(get_data.tables.table, 'query', no_query)
+    _, body = get(get_data, roomId='R1', limit='10')
+    assert [item['timestamp'] for item in body['data']] == [START + index * 60 for index in range(62, 72)]
+    assert body['data'][-1]['temperature'] == 20 + 71 % 5
+
+    # Trang tiếp theo và limit lớn hơn buffer: đọc bảng log
+    monkeypatch.setattr(get_data.tables.table, 'query', log_query)
+    _, older = get(get_data, roomId='R1', limit='10', cursor=body['nextCursor'])
+    assert [item['timestamp'] for item in older['data']] == [START + index * 60 for index in range(52, 62)]
+    _, longer = get(get_data, roomId='R1', limit='40')
+    assert longer['data_count'] == 40 and longer['data'][0]['timestamp'] == START + 32 * 60
+
+def test_columnar_format_sends_parallel_arrays_with_timestamp_deltas(create_table, load_lambda):
+    get_data, _ = load_get_data(create_table, load_lambda)
+
+    _, body = get(get_data, roomId='R1', format='columnar', metrics='temperature', **{'from': str(START), 'to': str(START + 240)})
+
+    assert body['format'] == 'columnar' and 'data' not in body
+    assert body['columns'] == {
+        'timestamp': {'start': START, 'deltas': [60, 60, 60, 60]},
+        'temperature': [20, 21, 22, 23, 24]
+    }
+    assert get(get_data, roomId='R1', format='csv')[0] == 400
+
+def test_large_responses_are_compressed_for_clients_that_accept_it(create_table, load_lambda):
+    get_data, _ = load_get_data(create_table, load_lambda)
+
+    def fetch(accept_encoding, limit):
+        event = {'queryStringParameters': {'roomId': 'R1', 'limit': str(limit)}, 'headers': {'Accept-Encoding': accept_encoding}}
+        return get_data.lambda_handler(event, None)
+
+    plain = fetch('', 25)
+    compressed = fetch('gzip, br;q=0', 25)
+
+    assert compressed['headers']['Content-Encoding'] == 'gzip' and compressed['isBase64Encoded']
+    assert len(compressed['body']) < len(plain['body'])
+    assert json.loads(gzip.decompress(base64.b64decode(compressed['body']))) == json.loads(plain['body'])
+    # Response nhỏ không đáng nén
+    assert 'Content-Encoding' not in fetch('gzip', 1)['headers']
+
+def test_since_polling_returns_only_newer_readings_until_caught_up(create_table, load_lambda):
+    get_data, log = load_get_data(create_table, load_lambda)
+    polled = []
+    since = START + 600
+    while True:
+        _, body = get(get_data, roomId='R1', since=str(since), limit='6')
+        polled.extend(item['timestamp'] for item in body['data'])
+        since = body['watermark']
+        if not body['hasMore']:
+            break
+        assert body['nextPollSeconds'] == 0
+
+    # `since` là mốc loại trừ: bản ghi tại đúng watermark không bị trả lại
+    assert polled == [START + index * 60 for index in range(11, 25)]
+    assert since == START + 24 * 60
+    assert get_data.MIN_POLL_SECONDS <= body['nextPollSeconds'] <= get_data.MAX_POLL_SECONDS
+
+    _, idle = get(get_data, roomId='R1', since=str(since))
+    assert idle['data'] == [] and idle['watermark'] == since and not idle['hasMore']
+
+    log.put_item(Item={'roomId': 'R1', 'timestamp': START + 25 * 60, 'temperature': 22})
+    _, fresh = get(get_data, roomId='R1', since=str(since))
+    assert [item['timestamp'] for item in fresh['data']] == [START + 25 * 60]
+
+def test_metrics_projection_limits_rows_units_and_series(create_table, load_lambda, monkeypatch):
+    get_data, _ = load_get_data(create_table, load_lambda)
+    queries = []
+    query = get_data.tables.table.query
+
+    def recording_query(**kwargs):
+        queries.append(kwargs)
+        return query(**kwargs)
+
+    monkeypatch.setattr(get_data.tables.table, 'query', recording_query)
+    _, rows = get(get_data, roomId='R1', limit='3', metrics='humidity')
+    _, chart = get(get_data, roomId='R1', fields='temperature', points='2', **{'from': str(START), 'to': str(START + 1440)})
+
+    assert rows['units'] == {'humidity': '%'}
+    assert all(set(item) == {'roomId', 'timestamp', 'humidity'} for item in rows['data'])
+    # Chỉ đọc các attribute cần thiết từ DynamoDB
+    assert set(queries[0]['ExpressionAttributeNames'].values()) == {'roomId', 'timestamp', 'humidity'}
+    assert set(chart['series']) == {'temperature'}
+    assert get(get_data, roomId='R1', metrics='temperature,co2')[0] == 400
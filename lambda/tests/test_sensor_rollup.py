@@ -0,0 +1,130 @@
+import json
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeSerializer
+
+DAY_START = 1700006400
+serializer = TypeSerializer()
+
+def insert_record(sequence, item):
+    return {
+        'eventName': 'INSERT',
+        'dynamodb': {
+            'Keys': {'roomId': {'S': item['roomId']}, 'timestamp': {'N': str(item['timestamp'])}},
+            'NewImage': {key: serializer.serialize(value) for key, value in item.items()},
+            'SequenceNumber': str(sequence),
+            'ApproximateCreationDateTime': item['timestamp']
+        }
+    }
+
+def reading(index):
+    return {'roomId': 'R1', 'timestamp': DAY_START + index * 60, 'temperature': Decimal(20 + index % 5)}
+
+def setup_tables(create_table):
+    log = create_table('SensorLog', ('roomId', 'S'), ('timestamp', 'N'))
+    create_table('SensorRollup', ('rollupKey', 'S'), ('bucketStart', 'N'))
+    return log
+
+def query_hours(get_data, hours, source=None):
+    params = {
+        'roomId': 'R1',
+        'from': str(DAY_START),
+        'to': str(DAY_START + hours * 3600),
+        'points': str(hours),
+        'metrics': 'temperature'
+    }
+    if source:
+        params['source'] = source
+    response = get_data.lambda_handler({'queryStringParameters': params}, None)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+def test_window_before_rollup_coverage_is_served_from_raw_rows(create_table, load_lambda):
+    log = setup_tables(create_table)
+    env = {'SENSOR_LOG_TABLE': 'SensorLog', 'SENSOR_ROLLUP_TABLE': 'SensorRollup'}
+    rollup = load_lambda('SmartOfficeSensorRollup', **env)
+
+    # 6 giờ đầu được ghi trước khi stream consumer chạy, 6 giờ sau đi qua stream
+    readings = [reading(index) for index in range(12 * 60)]
+    with log.batch_writer() as writer:
+        for item in readings:
+            writer.put_item(Item=item)
+    streamed = readings[6 * 60:]
+    records = [insert_record(sequence, item) for sequence, item in enumerate(streamed, start=1)]
+    rollup.lambda_handler({'Records': records}, None)
+    # Stream gửi lại cùng batch: không được cộng hai lần
+    rollup.lambda_handler({'Records': records}, None)
+
+    get_data = load_lambda('SmartOfficeGetData', **env)
+    body = query_hours(get_data, 12)
+
+    assert body['source'] == 'rollup:1h+raw'
+    series = body['series']['temperature']
+    assert series['timestamp'] == [DAY_START + hour * 3600 for hour in range(12)]
+    assert series['count'] == [60] * 12
+    assert series['min'] == [20] * 12 and series['max'] == [24] * 12
+    assert series == query_hours(get_data, 12, source='raw')['series']['temperature']
+
+def test_room_without_rollups_reads_raw_rows(create_table, load_lambda):
+    log = setup_tables(create_table)
+    with log.batch_writer() as writer:
+        for index in range(120):
+            writer.put_item(Item=reading(index))
+
+    get_data = load_lambda('SmartOfficeGetData', SENSOR_LOG_TABLE='SensorLog', SENSOR_ROLLUP_TABLE='SensorRollup')
+    body = query_hours(get_data, 2)
+
+    assert body['source'] == 'raw'
+    assert body['series']['temperature']['count'] == [60, 60]
+
+def load_rolled_up_days(create_table, load_lambda, window_start, window_end):
+    """Half-hourly readings from the day before the window to the day after, all fed through the stream"""
+    log = setup_tables(create_table)
+    env = {'SENSOR_LOG_TABLE': 'SensorLog', 'SENSOR_ROLLUP_TABLE': 'SensorRollup'}
+    rollup = load_lambda('SmartOfficeSensorRollup', **env)
+    readings = []
+    for timestamp in range(DAY_START - 86400, DAY_START + 4 * 86400, 1800):
+        inside = window_start <= timestamp <= window_end
+        # Bản ghi ngoài cửa sổ mang giá trị 40 để lộ ra nếu bị gộp vào điểm đầu/cuối
+        value = 20 + (timestamp - DAY_START) // 86400 if inside else 40
+        readings.append({'roomId': 'R1', 'timestamp': timestamp, 'temperature': Decimal(value)})
+    with log.batch_writer() as writer:
+        for item in readings:
+            writer.put_item(Item=item)
+    records = [insert_record(sequence, item) for sequence, item in enumerate(readings, start=1)]
+    rollup.lambda_handler({'Records': records}, None)
+    return load_lambda('SmartOfficeGetData', **env)
+
+def query_window_points(get_data, start, end, points, source=None):
+    params = {'roomId': 'R1', 'from': str(start), 'to': str(end), 'points': str(points), 'metrics': 'temperature'}
+    if source:
+        params['source'] = source
+    response = get_data.lambda_handler({'queryStringParameters': params}, None)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+def test_rollup_window_matches_raw_rows(create_table, load_lambda):
+    end = DAY_START + 3 * 86400
+    get_data = load_rolled_up_days(create_table, load_lambda, DAY_START, end)
+
+    body = query_window_points(get_data, DAY_START, end, 3)
+    raw = query_window_points(get_data, DAY_START, end, 3, source='raw')
+
+    assert body['source'].startswith('rollup:1d')
+    # Bucket rollup bắt đầu đúng tại `end` không được gộp vào điểm cuối
+    assert body['series'] == raw['series']
+    assert body['series']['temperature']['max'] == [20, 21, 23]
+    assert body['series']['temperature']['count'] == [48, 48, 49]
+
+def test_partial_rollup_buckets_at_both_ends_are_read_from_raw_rows(create_table, load_lambda):
+    start = DAY_START + 6 * 3600
+    end = start + 2 * 86400
+    get_data = load_rolled_up_days(create_table, load_lambda, start, end)
+
+    body = query_window_points(get_data, start, end, 2)
+    raw = query_window_points(get_data, start, end, 2, source='raw')
+
+    assert body['source'] == 'rollup:1d+raw'
+    series = body['series']['temperature']
+    assert sum(series['count']) == raw['data_count'] == 97
+    assert max(series['max']) == 22
@@ -0,0 +1,126 @@
+"""
+Read-through cache TTL + LRU sống trong container Lambda ấm
+Dùng cho các item ít thay đổi (room config, tên office, danh sách phòng)
+
+Module dùng chung: đóng gói file này cùng với Lambda sử dụng nó (hoặc qua một Lambda layer)
+CONFIG_CACHE_TTL_SECONDS=0 hoặc CONFIG_CACHE_MAX_ITEMS=0 để tắt cache
+"""
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = int(os.environ.get('CONFIG_CACHE_TTL_SECONDS', '30'))
+DEFAULT_MAX_ITEMS = int(os.environ.get('CONFIG_CACHE_MAX_ITEMS', '512'))
+
+class TTLCache:
+    """
+    Thread-safe TTL cache with LRU eviction and hit/miss counters
+
+    version_of(value): phiên bản của giá trị (vd. lastUpdate); khi entry hết hạn, get_or_load gọi
+    check_version(key) - một lần đọc nhỏ chỉ lấy thuộc tính phiên bản - và giữ lại entry nếu chưa đổi
+    """
+
+    def __init__(self, name, ttl_seconds=DEFAULT_TTL_SECONDS, max_items=DEFAULT_MAX_ITEMS, version_of=None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self.version_of = version_of
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0 and self.max_items > 0
+
+    def lookup(self, key):
+        """Return (value, fresh, version); value is None when the key is not cached"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None, False, None
+            self.entries.move_to_end(key)
+            value, expires_at, version = entry
+            return value, expires_at > time.time(), version
+
+    def get(self, key):
+        """Fresh cached value (a copy) or None"""
+        if not self.enabled:
+            return None
+        value, fresh, _ = self.lookup(key)
+        with self.lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return copy.deepcopy(value) if fresh else None
+
+    def put(self, key, value):
+        if not self.enabled or value is None:
+            return
+        version = self.version_of(value) if self.version_of else None
+        with self.lock:
+            self.entries[key] = (copy.deepcopy(value), time.time() + self.ttl_seconds, version)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_items:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, check_version=None):
+        """
+        Cached value for `key`, calling loader(key) on a miss
+        None từ loader (item không tồn tại) không được cache
+        """
+        if not self.enabled:
+            return loader(key)
+
+        value, fresh, version = self.lookup(key)
+        if value is not None and not fresh and check_version is not None and version is not None:
+            if check_version(key) == version:
+                with self.lock:
+                    if key in self.entries:
+                        self.entries[key] = (value, time.time() + self.ttl_seconds, version)
+                    self.revalidations += 1
+                fresh = True
+
+        with self.lock:
+            if value is not None and fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is not None and fresh:
+            return copy.deepcopy(value)
+
+        # Loader chạy ngoài lock: hai lần miss đồng thời có thể cùng đọc DynamoDB, chấp nhận được
+        value = loader(key)
+        if value is None:
+            # Item đã bị xoá: bỏ entry cũ để nó không được xác nhận lại theo phiên bản
+            self.invalidate(key)
+        else:
+            self.put(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'name': self.name,
+                'size': len(self.entries),
+                'maxItems': self.max_items,
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'evictions': self.evictions
+            }
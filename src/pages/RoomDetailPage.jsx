@@ -113,12 +113,10 @@ const RoomDetailPage = () => {
           // Parse timestamp - Unix timestamp in seconds
           const date = new Date(item.timestamp * 1000);
 
-          // Parse values with units (remove units and convert to numbers)
-          const parseValue = (str) => {
-            if (!str) return 0;
-            // Extract number from string like '25.68 °C' or '16.6 %' or '24.9 cd'
-            const match = str.toString().match(/[\d.]+/);
-            return match ? parseFloat(match[0]) : 0;
+          // Backend returns numeric readings (units are in sensorResponse.units)
+          const parseValue = (value) => {
+            const number = Number(value);
+            return Number.isFinite(number) ? number : 0;
           };
 
           return {
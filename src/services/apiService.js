@@ -527,11 +527,18 @@ const apiService = {
     }
   },
 
-  getSensorData: async (roomId, limit = 50) => {
+  // options: { from, to, cursor } - Unix timestamps (seconds) and nextCursor from previous page
+  getSensorData: async (roomId, limit = 50, options = {}) => {
     try {
       const token = apiService.getAuthToken();
+      const query = new URLSearchParams({ roomId, limit });
+      Object.entries(options).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== "") {
+          query.set(key, value);
+        }
+      });
       const response = await fetch(
-        `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.SENSOR_DATA}?roomId=${roomId}&limit=${limit}`,
+        `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.SENSOR_DATA}?${query.toString()}`,
         {
           method: "GET",
           headers: {